@@ -0,0 +1,98 @@
+"""
+Import time of the entry points, fails when the time spent in stocra's own modules regresses against the SDK 1.0.2.
+Times are relative to the import of pydantic measured in the same round, so the thresholds hold on slower machines too.
+Modules are imported from cached bytecode, compiling them would be measured otherwise.
+
+    python benchmarks/import_time.py
+"""
+
+import os
+import subprocess
+import sys
+from statistics import median
+from tempfile import TemporaryDirectory
+from typing import Dict, List, Tuple
+
+ROUNDS = 10
+REFERENCE_MODULE = "pydantic"
+# time spent in stocra's own modules as a fraction of the reference import measured with the SDK 1.0.2,
+# dependencies like pydantic, requests and aiohttp are excluded
+BASELINES: Dict[str, float] = {
+    "stocra.models": 0.12,
+    "stocra.synchronous.client": 0.14,
+    "stocra.asynchronous.client": 0.14,
+}
+# allowed regression against the baseline, a millisecond or two, leaves room for noise
+TOLERANCE = 0.4
+
+
+def import_time(module: str, environment: Dict[str, str]) -> Tuple[float, float]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=environment,
+    )
+    total_us = own_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if name.strip().startswith("stocra"):
+            own_us += int(self_us)
+
+        if name.strip() == module:
+            total_us = int(cumulative_us)
+
+    return total_us / 1_000, own_us / 1_000
+
+
+def fastest_import_times(environment: Dict[str, str]) -> Dict[str, Tuple[float, float, float]]:
+    modules = [REFERENCE_MODULE, *BASELINES]
+    # the first round writes the bytecode
+    for module in modules:
+        import_time(module, environment)
+
+    rounds: Dict[str, List[Tuple[float, float, float]]] = {module: [] for module in modules}
+    for _ in range(ROUNDS):
+        reference_ms, _ = import_time(REFERENCE_MODULE, environment)
+        rounds[REFERENCE_MODULE].append((reference_ms, 0.0, 0.0))
+        for module in BASELINES:
+            total_ms, own_ms = import_time(module, environment)
+            rounds[module].append((total_ms, own_ms, own_ms / reference_ms))
+
+    # the fastest round is the least affected by noise, the median ratio of rounds cancels out the load of the machine
+    return {
+        module: (
+            min(total for total, _, _ in times),
+            min(own for _, own, _ in times),
+            median(ratio for _, _, ratio in times),
+        )
+        for module, times in rounds.items()
+    }
+
+
+def main() -> None:
+    exceeded = []
+    with TemporaryDirectory() as pycache:
+        environment = {key: value for key, value in os.environ.items() if key != "PYTHONDONTWRITEBYTECODE"}
+        environment["PYTHONPYCACHEPREFIX"] = pycache
+        times = fastest_import_times(environment)
+
+    print(f"{'module':<30}{'total ms':>10}{'stocra ms':>11}{'ratio':>8}{'baseline':>10}{'threshold':>11}")
+    print(f"{REFERENCE_MODULE:<30}{times[REFERENCE_MODULE][0]:>10.1f}")
+    for module, baseline in BASELINES.items():
+        total_ms, own_ms, ratio = times[module]
+        threshold = baseline * (1 + TOLERANCE)
+        print(f"{module:<30}{total_ms:>10.1f}{own_ms:>11.1f}{ratio:>8.2f}{baseline:>10.2f}{threshold:>11.2f}")
+        if ratio > threshold:
+            exceeded.append(module)
+
+    if exceeded:
+        sys.exit(f"Import time regressed against the SDK 1.0.2: {', '.join(exceeded)}")
+
+
+if __name__ == "__main__":
+    main()
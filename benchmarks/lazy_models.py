@@ -0,0 +1,61 @@
+"""
+CPU time and allocations of eager and lazy transaction models for workloads reading only some fields.
+
+    python benchmarks/lazy_models.py
+"""
+
+import json
+import tracemalloc
+from timeit import timeit
+from typing import Callable, List, Tuple
+
+from stocra.lazy import LazyTransaction
+from stocra.models import Transaction
+
+ROUNDS = 1_000
+INPUTS = OUTPUTS = 20
+
+
+def transaction_body() -> bytes:
+    def amount(value: str) -> dict:
+        return dict(value=value, currency_symbol="BTC")
+
+    transaction = dict(
+        hash="a" * 64,
+        inputs=[
+            dict(address=f"input_{index}", amount=amount("0.1"), transaction_pointer=None) for index in range(INPUTS)
+        ],
+        outputs=[dict(address=f"output_{index}", amount=amount("0.09")) for index in range(OUTPUTS)],
+        fee=amount("0.2"),
+    )
+    return json.dumps(transaction).encode()
+
+
+def peak_allocated_bytes(workload: Callable[[], object]) -> int:
+    tracemalloc.start()
+    workload()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main() -> None:
+    body = transaction_body()
+    workloads: List[Tuple[str, Callable[[], object]]] = [
+        ("eager hash", lambda: Transaction.parse_raw(body).hash),
+        ("lazy hash", lambda: LazyTransaction.parse_raw(body).hash),
+        ("eager fee", lambda: Transaction.parse_raw(body).fee),
+        ("lazy fee", lambda: LazyTransaction.parse_raw(body).fee),
+        ("eager all fields", lambda: Transaction.parse_raw(body).outputs),
+        ("lazy all fields", lambda: LazyTransaction.parse_raw(body).to_model()),
+    ]
+
+    print(f"transaction with {INPUTS} inputs and {OUTPUTS} outputs, {len(body)} bytes, {ROUNDS} rounds")
+    print(f"{'workload':<20}{'us per call':>14}{'peak bytes':>14}")
+    for name, workload in workloads:
+        seconds = timeit(workload, number=ROUNDS)
+        print(f"{name:<20}{seconds / ROUNDS * 1_000_000:>14.1f}{peak_allocated_bytes(workload):>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Time and peak memory of decoding transaction hashes of large blocks at once and incrementally.
+
+    python benchmarks/streaming_json.py
+"""
+
+import json
+import tracemalloc
+from time import perf_counter
+from typing import Callable, Iterable, List, Tuple
+
+from stocra.defaults import DEFAULT_CHUNK_SIZE
+from stocra.streaming_json import iter_block_transaction_hashes
+
+TRANSACTIONS = [10_000, 100_000]
+
+
+def block_body(transactions: int) -> bytes:
+    block = dict(
+        height=700_000,
+        hash="b" * 64,
+        timestamp_ms=1_600_000_000_000,
+        transactions=[f"{index:064x}" for index in range(transactions)],
+    )
+    return json.dumps(block).encode()
+
+
+def chunks(body: bytes) -> Iterable[bytes]:
+    for start in range(0, len(body), DEFAULT_CHUNK_SIZE):
+        yield body[start : start + DEFAULT_CHUNK_SIZE]
+
+
+def count_at_once(body: bytes) -> int:
+    return sum(1 for _ in json.loads(b"".join(chunks(body)))["transactions"])
+
+
+def count_incrementally(body: bytes) -> int:
+    return sum(1 for _ in iter_block_transaction_hashes(chunks(body)))
+
+
+def measure(workload: Callable[[], object]) -> Tuple[float, int]:
+    started_at = perf_counter()
+    workload()
+    seconds = perf_counter() - started_at
+    tracemalloc.start()
+    workload()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main() -> None:
+    print(f"{'transactions':<14}{'workload':<16}{'ms':>10}{'peak bytes':>14}")
+    for transactions in TRANSACTIONS:
+        body = block_body(transactions)
+        workloads: List[Tuple[str, Callable[[], object]]] = [
+            ("at once", lambda: count_at_once(body)),
+            ("incrementally", lambda: count_incrementally(body)),
+        ]
+        for name, workload in workloads:
+            seconds, peak = measure(workload)
+            print(f"{transactions:<14}{name:<16}{seconds * 1_000:>10.1f}{peak:>14}")
+
+
+if __name__ == "__main__":
+    main()
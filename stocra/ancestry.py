@@ -0,0 +1,50 @@
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+from stocra.models import OutputIndex, Transaction, TransactionHash
+
+
+@dataclass(frozen=True)
+class AncestryEdge:
+    child_hash: TransactionHash
+    parent_hash: TransactionHash
+    output_index: OutputIndex
+    hop: int
+
+
+class AncestryWalk:
+    """
+    Breadth-first walk over the inputs of a transaction, every ancestor is visited at most once.
+    """
+
+    def __init__(self, transaction_hash: TransactionHash, max_nodes: Optional[int]) -> None:
+        self.max_nodes = max_nodes
+        self.hop = 0
+        self._visited = {transaction_hash}
+        self._next_frontier = [transaction_hash]
+
+    def next_hop(self) -> List[TransactionHash]:
+        # transactions to fetch in the next hop, all of them can be fetched in parallel
+        frontier, self._next_frontier = self._next_frontier, []
+        self.hop += 1
+        return frontier
+
+    def edges(self, transaction: Transaction) -> Iterable[AncestryEdge]:
+        for transaction_input in transaction.inputs:
+            pointer = transaction_input.transaction_pointer
+            if pointer is None:
+                continue
+
+            yield AncestryEdge(
+                child_hash=transaction.hash,
+                parent_hash=pointer.transaction_hash,
+                output_index=pointer.output_index,
+                hop=self.hop,
+            )
+            if pointer.transaction_hash in self._visited or (
+                self.max_nodes is not None and len(self._visited) >= self.max_nodes
+            ):
+                continue
+
+            self._visited.add(pointer.transaction_hash)
+            self._next_frontier.append(pointer.transaction_hash)
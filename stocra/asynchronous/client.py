@@ -1,14 +1,23 @@
+from __future__ import annotations
+
 import asyncio
 import logging
 from asyncio import Semaphore
+from collections import deque
 from contextlib import asynccontextmanager
 from decimal import Decimal
 from itertools import count
 from typing import (
+    TYPE_CHECKING,
+    Any,
     AsyncGenerator,
     AsyncIterable,
     Awaitable,
+    Callable,
+    Coroutine,
+    Deque,
     Dict,
+    Iterable,
     List,
     Optional,
     Tuple,
@@ -16,131 +25,719 @@ from typing import (
     cast,
 )
 
-from aiohttp import ClientError, ClientResponseError, ClientSession
+from aiohttp import (
+    ClientError,
+    ClientResponse,
+    ClientResponseError,
+    ClientSession,
+    ClientTimeout,
+)
 
-from stocra.base_client import StocraBase
-from stocra.models import Block, ErrorHandler, StocraHTTPError, Token, Transaction
+from stocra.asynchronous.session import create_session
+from stocra.base_client import MUTABLE_ENDPOINTS, BlockT, StocraBase, T, TransactionT
+from stocra.deadline import DEFAULT_REQUEST_TIMEOUT, Deadline, DeadlineExceeded
+from stocra.defaults import (
+    DEFAULT_BASE_URL,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_DNS_CACHE_SECONDS,
+    DEFAULT_KEEPALIVE_SECONDS,
+    DEFAULT_MAX_PENDING_TRANSACTIONS,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_REORG_DEPTH,
+)
+from stocra.models import (
+    Block,
+    ErrorHandler,
+    StocraHTTPError,
+    Transaction,
+)
+from stocra.utils import limit_sleep
+
+# optional features are imported only when used to keep the import of the client fast
+if TYPE_CHECKING:
+    from stocra.ancestry import AncestryEdge
+    from stocra.checkpoint import CheckpointStore, CheckpointTracker
+    from stocra.endpoints import EndpointStats
+    from stocra.monitoring import StreamMonitor
+    from stocra.profiling import Profiler
+    from stocra.rate_limit import RateLimiter
+    from stocra.raw import RawBlock, RawTransaction
+    from stocra.reorg import BlockRollback, ReorgTracker
+    from stocra.tokens import Token
+    from stocra.utxo import UtxoIndex
+    from stocra.watchlist import Watchlist
 
 logger = logging.getLogger("stocra")
+GetBlock = Callable[[str, Union[str, int], Optional[Deadline]], Coroutine[Any, Any, BlockT]]
 
 
-class Stocra(StocraBase):
+class Stocra(StocraBase):  # pylint: disable=too-many-public-methods
     _session: ClientSession
     _semaphore: Optional[Semaphore]
     _error_handlers: List[ErrorHandler]
+    _request_errors = (ClientError, asyncio.TimeoutError)
 
-    def __init__(
+    def __init__(  # pylint: disable=too-many-arguments
         self,
         api_key: Optional[str] = None,
         session: Optional[ClientSession] = None,
         semaphore: Optional[Semaphore] = None,
         error_handlers: Optional[List[ErrorHandler]] = None,
+        *,
+        base_url: str = DEFAULT_BASE_URL,
+        endpoints: Optional[Dict[str, List[str]]] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        keepalive_seconds: float = DEFAULT_KEEPALIVE_SECONDS,
+        dns_cache_seconds: int = DEFAULT_DNS_CACHE_SECONDS,
+        request_timeout: Optional[float] = DEFAULT_REQUEST_TIMEOUT,
+        rate_limiter: Optional[RateLimiter] = None,
+        profiler: Optional[Profiler] = None,
     ):
         super().__init__(
             api_key=api_key,
             error_handlers=error_handlers,
+            base_url=base_url,
+            endpoints=endpoints,
+            pool_size=pool_size,
+            request_timeout=request_timeout,
+            rate_limiter=rate_limiter,
+            profiler=profiler,
         )
 
-        self._session = session or ClientSession()
+        self._session = session or create_session(
+            pool_size=pool_size,
+            keepalive_seconds=keepalive_seconds,
+            dns_cache_seconds=dns_cache_seconds,
+        )
         self._semaphore = semaphore
 
     async def close(self) -> None:
         await self._session.close()
 
-    async def get_block(self, blockchain: str, hash_or_height: Union[str, int] = "latest") -> Block:
-        logger.debug("%s: get_block %s", blockchain, hash_or_height)
-        async with self._with_semaphore():
-            block_json = await self._get(blockchain=blockchain, endpoint=f"blocks/{hash_or_height}")
-            return Block(**block_json)
-
-    async def get_transaction(self, blockchain: str, transaction_hash: str) -> Transaction:
-        logger.debug("%s: get_transaction %s", blockchain, transaction_hash)
-        async with self._with_semaphore():
-            transaction_json = await self._get(blockchain=blockchain, endpoint=f"transactions/{transaction_hash}")
-            return Transaction(**transaction_json)
+    async def warm_up(self, blockchains: Iterable[str], connections: int = 1) -> None:
+        warm_ups = [
+            self._warm_up_endpoint(endpoint.url, min(connections, self._pool_size))
+            for blockchain in blockchains
+            for endpoint in self._get_endpoint_pool(blockchain).candidates()
+        ]
+        await asyncio.gather(*warm_ups)
+
+    async def get_block(
+        self, blockchain: str, hash_or_height: Union[str, int] = "latest", timeout: Optional[float] = None
+    ) -> Block:
+        return await self._get_block(blockchain, hash_or_height, Deadline.after(timeout))
+
+    async def get_block_raw(
+        self, blockchain: str, hash_or_height: Union[str, int] = "latest", timeout: Optional[float] = None
+    ) -> RawBlock:
+        return await self._get_raw_block(blockchain, hash_or_height, Deadline.after(timeout))
+
+    async def get_transaction(
+        self, blockchain: str, transaction_hash: str, timeout: Optional[float] = None
+    ) -> Transaction:
+        return await self._get_transaction(blockchain, transaction_hash, Deadline.after(timeout))
+
+    async def get_transaction_raw(
+        self, blockchain: str, transaction_hash: str, timeout: Optional[float] = None
+    ) -> RawTransaction:
+        return await self._get_raw_transaction(blockchain, transaction_hash, Deadline.after(timeout))
+
+    def get_all_transactions_of_block(
+        self, blockchain: str, block: Union[Block, RawBlock], timeout: Optional[float] = None
+    ) -> AsyncIterable[Transaction]:
+        logger.debug("%s: get_all_transactions %s", blockchain, block.height)
+        return self._get_all_transactions(
+            blockchain, block.transactions, self._get_transaction, Deadline.after(timeout)
+        )
 
-    async def get_all_transactions_of_block(self, blockchain: str, block: Block) -> AsyncIterable[Transaction]:
+    def get_all_transactions_of_block_raw(
+        self, blockchain: str, block: Union[Block, RawBlock], timeout: Optional[float] = None
+    ) -> AsyncIterable[RawTransaction]:
         logger.debug("%s: get_all_transactions %s", blockchain, block.height)
-        transaction_tasks = []
+        return self._get_all_transactions(
+            blockchain, block.transactions, self._get_raw_transaction, Deadline.after(timeout)
+        )
+
+    async def get_transaction_streaming(
+        self, blockchain: str, transaction_hash: str, timeout: Optional[float] = None
+    ) -> Transaction:
+        return await self._get_transaction_streaming(blockchain, transaction_hash, Deadline.after(timeout))
 
-        for transaction_hash in block.transactions:
-            task = asyncio.create_task(self.get_transaction(blockchain=blockchain, transaction_hash=transaction_hash))
-            transaction_tasks.append(task)
+    def get_all_transactions_of_block_streaming(
+        self,
+        blockchain: str,
+        hash_or_height: Union[str, int] = "latest",
+        max_pending: int = DEFAULT_MAX_PENDING_TRANSACTIONS,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterable[Transaction]:
+        if max_pending < 1:
+            raise ValueError(f"`max_pending` must be greater than 0. Got `{max_pending}`")
 
-        for completed_task in asyncio.as_completed(transaction_tasks):
-            yield await completed_task
+        return self._get_all_transactions_streaming(blockchain, hash_or_height, max_pending, Deadline.after(timeout))
 
-    async def stream_new_blocks(
+    def stream_new_blocks(
         self,
         blockchain: str,
         start_block_hash_or_height: Union[int, str] = "latest",
         sleep_interval_seconds: float = 10,
         n_blocks_ahead: int = 1,
+        monitor: Optional[StreamMonitor] = None,
     ) -> AsyncIterable[Block]:
+        return self._profile_consumer(
+            self._deliver_blocks(
+                self._stream_blocks(
+                    blockchain,
+                    start_block_hash_or_height,
+                    sleep_interval_seconds,
+                    n_blocks_ahead,
+                    self._get_block,
+                    monitor,
+                ),
+                monitor,
+            )
+        )
+
+    def stream_new_blocks_raw(
+        self,
+        blockchain: str,
+        start_block_hash_or_height: Union[int, str] = "latest",
+        sleep_interval_seconds: float = 10,
+        n_blocks_ahead: int = 1,
+        monitor: Optional[StreamMonitor] = None,
+    ) -> AsyncIterable[RawBlock]:
+        return self._profile_consumer(
+            self._deliver_blocks(
+                self._stream_blocks(
+                    blockchain,
+                    start_block_hash_or_height,
+                    sleep_interval_seconds,
+                    n_blocks_ahead,
+                    self._get_raw_block,
+                    monitor,
+                ),
+                monitor,
+            )
+        )
+
+    def stream_new_transactions(  # pylint: disable=too-many-arguments
+        self,
+        blockchain: str,
+        start_block_hash_or_height: Union[int, str] = "latest",
+        sleep_interval_seconds: float = 10,
+        load_n_blocks_ahead: int = 1,
+        *,
+        checkpoint_store: Optional[CheckpointStore] = None,
+        checkpoint_key: Optional[str] = None,
+        monitor: Optional[StreamMonitor] = None,
+    ) -> AsyncIterable[Tuple[Block, Transaction]]:
+        return self._profile_consumer(
+            self._stream_transactions(
+                blockchain,
+                start_block_hash_or_height,
+                sleep_interval_seconds,
+                load_n_blocks_ahead,
+                self._get_block,
+                self._get_transaction,
+                self._checkpoint_tracker(checkpoint_store, checkpoint_key, blockchain),
+                monitor,
+            )
+        )
+
+    def stream_new_transactions_raw(  # pylint: disable=too-many-arguments
+        self,
+        blockchain: str,
+        start_block_hash_or_height: Union[int, str] = "latest",
+        sleep_interval_seconds: float = 10,
+        load_n_blocks_ahead: int = 1,
+        *,
+        checkpoint_store: Optional[CheckpointStore] = None,
+        checkpoint_key: Optional[str] = None,
+        monitor: Optional[StreamMonitor] = None,
+    ) -> AsyncIterable[Tuple[RawBlock, RawTransaction]]:
+        return self._profile_consumer(
+            self._stream_transactions(
+                blockchain,
+                start_block_hash_or_height,
+                sleep_interval_seconds,
+                load_n_blocks_ahead,
+                self._get_raw_block,
+                self._get_raw_transaction,
+                self._checkpoint_tracker(checkpoint_store, checkpoint_key, blockchain),
+                monitor,
+            )
+        )
+
+    def stream_new_transactions_filtered(  # pylint: disable=too-many-arguments
+        self,
+        blockchain: str,
+        watchlist: Watchlist,
+        start_block_hash_or_height: Union[int, str] = "latest",
+        sleep_interval_seconds: float = 10,
+        load_n_blocks_ahead: int = 1,
+        *,
+        checkpoint_store: Optional[CheckpointStore] = None,
+        checkpoint_key: Optional[str] = None,
+        monitor: Optional[StreamMonitor] = None,
+    ) -> AsyncIterable[Tuple[Block, Transaction]]:
+        return self._profile_consumer(
+            self._filter_transactions(
+                watchlist,
+                self._stream_transactions(
+                    blockchain,
+                    start_block_hash_or_height,
+                    sleep_interval_seconds,
+                    load_n_blocks_ahead,
+                    self._get_block,
+                    self._get_raw_transaction,
+                    self._checkpoint_tracker(checkpoint_store, checkpoint_key, blockchain),
+                    monitor,
+                ),
+            )
+        )
+
+    def stream_new_blocks_reorg_aware(
+        self,
+        blockchain: str,
+        start_block_hash_or_height: Union[int, str] = "latest",
+        sleep_interval_seconds: float = 10,
+        reorg_depth: int = DEFAULT_REORG_DEPTH,
+    ) -> AsyncIterable[Union[Block, BlockRollback]]:
+        return self._profile_consumer(
+            self._stream_blocks_reorg_aware(
+                blockchain, start_block_hash_or_height, sleep_interval_seconds, self._reorg_tracker(reorg_depth)
+            )
+        )
+
+    def stream_new_transactions_reorg_aware(
+        self,
+        blockchain: str,
+        start_block_hash_or_height: Union[int, str] = "latest",
+        sleep_interval_seconds: float = 10,
+        reorg_depth: int = DEFAULT_REORG_DEPTH,
+    ) -> AsyncIterable[Union[Tuple[Block, Transaction], BlockRollback]]:
+        return self._profile_consumer(
+            self._stream_transactions_reorg_aware(
+                blockchain, start_block_hash_or_height, sleep_interval_seconds, self._reorg_tracker(reorg_depth)
+            )
+        )
+
+    async def get_tokens(
+        self, blockchain: str, timeout: Optional[float] = None, refresh: bool = False
+    ) -> Dict[str, Token]:
+        if refresh or self._tokens.get(blockchain) is None:
+            await self._refresh_tokens(blockchain, Deadline.after(timeout))
+
+        return self._tokens[blockchain]
+
+    async def scale_token_value(
+        self, blockchain: str, contract_address: str, value: Decimal, timeout: Optional[float] = None
+    ) -> Decimal:
+        tokens = await self.get_tokens(blockchain, timeout=timeout)
+        token = tokens[contract_address]
+        return value * token.scaling
+
+    async def resolve_inputs(
+        self,
+        blockchain: str,
+        transactions: Iterable[Transaction],
+        utxo_index: UtxoIndex,
+        timeout: Optional[float] = None,
+    ) -> List[Transaction]:
+        transactions = list(transactions)
+        for transaction in transactions:
+            utxo_index.add_transaction(transaction)
+
+        missing_parents = utxo_index.missing_parents(transactions)
+        logger.debug("%s: resolve_inputs, fetching %d parent transactions", blockchain, len(missing_parents))
+        parents = self._get_all_transactions(
+            blockchain, missing_parents, self._get_transaction, Deadline.after(timeout)
+        )
+        async for parent in parents:
+            utxo_index.add_transaction(parent)
+
+        return [utxo_index.resolve(transaction) for transaction in transactions]
+
+    def trace_ancestry(
+        self,
+        blockchain: str,
+        transaction_hash: str,
+        max_hops: int,
+        max_nodes: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterable[AncestryEdge]:
+        if max_hops < 1:
+            raise ValueError(f"`max_hops` must be greater than 0. Got `{max_hops}`")
+
+        return self._trace_ancestry(blockchain, transaction_hash, max_hops, max_nodes, Deadline.after(timeout))
+
+    async def _get_block(self, blockchain: str, hash_or_height: Union[str, int], deadline: Optional[Deadline]) -> Block:
+        logger.debug("%s: get_block %s", blockchain, hash_or_height)
+        async with self._with_semaphore():
+            return await self._get_parsed(blockchain, f"blocks/{hash_or_height}", Block.parse_obj, deadline)
+
+    async def _get_transaction(
+        self, blockchain: str, transaction_hash: str, deadline: Optional[Deadline]
+    ) -> Transaction:
+        logger.debug("%s: get_transaction %s", blockchain, transaction_hash)
+        async with self._with_semaphore():
+            transaction_json = await self._get(
+                blockchain=blockchain, endpoint=f"transactions/{transaction_hash}", deadline=deadline
+            )
+            with self._profile("validation"):
+                return Transaction(**transaction_json)
+
+    async def _get_raw_block(
+        self, blockchain: str, hash_or_height: Union[str, int], deadline: Optional[Deadline]
+    ) -> RawBlock:
+        # pylint: disable-next=import-outside-toplevel
+        from stocra.raw import RawBlock
+
+        logger.debug("%s: get_block_raw %s", blockchain, hash_or_height)
+        async with self._with_semaphore():
+            response = await self._request(blockchain, f"blocks/{hash_or_height}", deadline)
+            body = await response.read()
+            with self._profile("decode"):
+                return RawBlock.from_body(body)
+
+    async def _get_raw_transaction(
+        self, blockchain: str, transaction_hash: str, deadline: Optional[Deadline]
+    ) -> RawTransaction:
+        # pylint: disable-next=import-outside-toplevel
+        from stocra.raw import RawTransaction
+
+        logger.debug("%s: get_transaction_raw %s", blockchain, transaction_hash)
+        async with self._with_semaphore():
+            response = await self._request(blockchain, f"transactions/{transaction_hash}", deadline)
+            return RawTransaction(hash=transaction_hash, body=await response.read())
+
+    async def _get_transaction_streaming(
+        self, blockchain: str, transaction_hash: str, deadline: Optional[Deadline]
+    ) -> Transaction:
+        logger.debug("%s: get_transaction_streaming %s", blockchain, transaction_hash)
+        # pylint: disable-next=import-outside-toplevel
+        from stocra.streaming_json import TransactionParser
+
+        parser = TransactionParser()
+        async with self._with_semaphore():
+            endpoint = f"transactions/{transaction_hash}"
+            response = await self._request(blockchain, endpoint, deadline, stream=True)
+            try:
+                async for chunk in response.content.iter_chunked(DEFAULT_CHUNK_SIZE):
+                    if deadline:
+                        deadline.check(endpoint)
+
+                    parser.feed(chunk)
+            finally:
+                response.release()
+
+        with self._profile("validation"):
+            return parser.close()
+
+    async def _get_all_transactions_streaming(
+        self, blockchain: str, hash_or_height: Union[str, int], max_pending: int, deadline: Optional[Deadline]
+    ) -> AsyncIterable[Transaction]:
+        logger.debug("%s: get_all_transactions_streaming %s", blockchain, hash_or_height)
+        # the block is read while its transactions are fetched, so it does not hold a slot of the semaphore
+        endpoint = f"blocks/{hash_or_height}"
+        response = await self._request(blockchain, endpoint, deadline, stream=True)
+        # pylint: disable-next=import-outside-toplevel
+        from stocra.streaming_json import IncrementalObjectParser
+
+        parser = IncrementalObjectParser(["transactions"])
+        # hashes are fetched as they are parsed, at most `max_pending` transactions are held at once
+        transaction_tasks: Deque["asyncio.Task[Transaction]"] = deque()
+        try:
+            async for chunk in response.content.iter_chunked(DEFAULT_CHUNK_SIZE):
+                if deadline:
+                    deadline.check(endpoint)
+
+                for _, transaction_hash in parser.feed(chunk):
+                    transaction_tasks.append(
+                        asyncio.create_task(self._get_transaction_streaming(blockchain, transaction_hash, deadline))
+                    )
+                    if len(transaction_tasks) >= max_pending:
+                        yield await self._result(transaction_tasks.popleft(), deadline)
+
+            parser.close()
+            while transaction_tasks:
+                yield await self._result(transaction_tasks.popleft(), deadline)
+        finally:
+            response.release()
+            for transaction_task in transaction_tasks:
+                transaction_task.cancel()
+
+    @classmethod
+    async def _result(cls, task: "asyncio.Task[T]", deadline: Optional[Deadline]) -> T:
+        # timeout of the request itself is raised by the task, only waiting past the deadline is DeadlineExceeded
+        done, _ = await asyncio.wait({task}, timeout=deadline.remaining() if deadline else None)
+        if not done:
+            task.cancel()
+            raise DeadlineExceeded("Deadline exceeded while waiting for results")
+
+        return task.result()
+
+    async def _get_all_transactions(
+        self,
+        blockchain: str,
+        transaction_hashes: Iterable[str],
+        get_transaction: Callable[[str, str, Optional[Deadline]], Coroutine[Any, Any, T]],
+        deadline: Optional[Deadline],
+    ) -> AsyncIterable[T]:
+        transaction_tasks = [
+            asyncio.create_task(get_transaction(blockchain, transaction_hash, deadline))
+            for transaction_hash in transaction_hashes
+        ]
+
+        # failure of one task, deadline or consumer leaving early cancels all the outstanding tasks
+        try:
+            for completed_task in asyncio.as_completed(
+                transaction_tasks, timeout=deadline.remaining() if deadline else None
+            ):
+                try:
+                    transaction = await completed_task
+                except DeadlineExceeded:
+                    raise
+                except asyncio.TimeoutError as exception:
+                    if deadline is None or not deadline.expired:
+                        raise
+
+                    raise DeadlineExceeded("Deadline exceeded while waiting for transactions") from exception
+
+                yield transaction
+        finally:
+            for task in transaction_tasks:
+                task.cancel()
+
+    async def _trace_ancestry(
+        self,
+        blockchain: str,
+        transaction_hash: str,
+        max_hops: int,
+        max_nodes: Optional[int],
+        deadline: Optional[Deadline],
+    ) -> AsyncIterable[AncestryEdge]:
+        # pylint: disable-next=import-outside-toplevel
+        from stocra.ancestry import AncestryWalk
+
+        # every hop is fetched in parallel
+        walk = AncestryWalk(transaction_hash, max_nodes)
+        while walk.hop < max_hops:
+            frontier = walk.next_hop()
+            if not frontier:
+                return
+
+            logger.debug(
+                "%s: trace_ancestry %s, hop %d, %d transactions", blockchain, transaction_hash, walk.hop, len(frontier)
+            )
+            async for transaction in self._get_all_transactions(blockchain, frontier, self._get_transaction, deadline):
+                for edge in walk.edges(transaction):
+                    yield edge
+
+    async def _stream_blocks(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        blockchain: str,
+        start_block_hash_or_height: Union[int, str],
+        sleep_interval_seconds: float,
+        n_blocks_ahead: int,
+        get_block: GetBlock[BlockT],
+        monitor: Optional[StreamMonitor],
+    ) -> AsyncIterable[BlockT]:
         if n_blocks_ahead < 1:
             raise ValueError(f"`n_blocks_ahead` must be greater than 0. Got `{n_blocks_ahead}`")
 
-        block = await self.get_block(blockchain=blockchain, hash_or_height=start_block_hash_or_height)
+        if monitor:
+            get_block = self._record_fetches(get_block, monitor)
+
+        block = await get_block(blockchain, start_block_hash_or_height, None)
         first_block_to_load_height = block.height + 1
         last_block_to_load_height = first_block_to_load_height + n_blocks_ahead + 1
         yield block
 
         block_tasks = [
-            asyncio.create_task(self.get_block(blockchain, height))
+            asyncio.create_task(get_block(blockchain, height, None))
             for height in range(first_block_to_load_height, last_block_to_load_height)
         ]
 
+        try:
+            while True:
+                block_task = block_tasks.pop(0)
+                try:
+                    await asyncio.wait_for(block_task, timeout=None)
+                    block = block_task.result()
+                except ClientResponseError as exception:
+                    if exception.status == 404:
+                        logger.debug(
+                            "%s: stream_new_blocks_ahead %s: 404, sleeping for %d seconds",
+                            blockchain,
+                            first_block_to_load_height,
+                            sleep_interval_seconds,
+                        )
+                        await asyncio.sleep(sleep_interval_seconds)
+                        block_tasks.insert(
+                            0, asyncio.create_task(get_block(blockchain, first_block_to_load_height, None))
+                        )
+                        continue
+
+                    raise
+
+                if monitor:
+                    monitor.prefetch_occupancy(sum(task.done() for task in block_tasks), len(block_tasks))
+
+                yield block
+                block_tasks.append(asyncio.create_task(get_block(blockchain, last_block_to_load_height, None)))
+                first_block_to_load_height += 1
+                last_block_to_load_height += 1
+        finally:
+            for block_task in block_tasks:
+                block_task.cancel()
+
+    async def _stream_transactions(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        blockchain: str,
+        start_block_hash_or_height: Union[int, str],
+        sleep_interval_seconds: float,
+        load_n_blocks_ahead: int,
+        get_block: GetBlock[BlockT],
+        get_transaction: Callable[[str, str, Optional[Deadline]], Coroutine[Any, Any, TransactionT]],
+        checkpoint: Optional[CheckpointTracker],
+        monitor: Optional[StreamMonitor],
+    ) -> AsyncIterable[Tuple[BlockT, TransactionT]]:
+        # pylint: disable-next=import-outside-toplevel
+        from stocra.monitoring import BlockDelivery
+
+        if checkpoint:
+            start_block_hash_or_height = checkpoint.resume_from(start_block_hash_or_height)
+
+        try:
+            async for block in self._stream_blocks(
+                blockchain, start_block_hash_or_height, sleep_interval_seconds, load_n_blocks_ahead, get_block, monitor
+            ):
+                delivery = BlockDelivery(block, checkpoint, monitor)
+                logger.debug("%s: get_all_transactions %s", blockchain, block.height)
+                transactions = self._get_all_transactions(blockchain, delivery.pending(), get_transaction, None)
+                async for transaction in transactions:
+                    with delivery.consumed(transaction.hash):
+                        yield block, transaction
+
+                delivery.finished()
+        finally:
+            # transactions processed since the last batch are not processed again after a restart
+            if checkpoint:
+                checkpoint.flush()
+
+    async def _stream_blocks_reorg_aware(
+        self,
+        blockchain: str,
+        start_block_hash_or_height: Union[int, str],
+        sleep_interval_seconds: float,
+        reorg: ReorgTracker,
+    ) -> AsyncIterable[Union[Block, BlockRollback]]:
+        block = await self._get_block(blockchain, start_block_hash_or_height, None)
+        reorg.delivered(block.height, block.hash)
+        yield block
+
         while True:
-            block_task = block_tasks.pop(0)
             try:
-                await asyncio.wait_for(block_task, timeout=None)
-                yield block_task.result()
+                block = await self._get_block(blockchain, reorg.next_height, None)
             except ClientResponseError as exception:
-                if exception.status == 404:
+                if exception.status != 404:
+                    raise
+
+                rollback = await self._verify_recent_blocks(blockchain, reorg)
+                if rollback is None:
                     logger.debug(
-                        "%s: stream_new_blocks_ahead %s: 404, sleeping for %d seconds",
+                        "%s: stream_new_blocks_reorg_aware %s: 404, sleeping for %d seconds",
                         blockchain,
-                        first_block_to_load_height,
+                        reorg.next_height,
                         sleep_interval_seconds,
                     )
                     await asyncio.sleep(sleep_interval_seconds)
-                    block_tasks.insert(0, asyncio.create_task(self.get_block(blockchain, first_block_to_load_height)))
                     continue
 
-                raise
+                logger.info("%s: reorg, rolling back blocks %s", blockchain, rollback.blocks)
+                yield rollback
+                continue
 
-            block_tasks.append(asyncio.create_task(self.get_block(blockchain, last_block_to_load_height)))
-            first_block_to_load_height += 1
-            last_block_to_load_height += 1
+            reorg.delivered(block.height, block.hash)
+            yield block
 
-    async def stream_new_transactions(
+    async def _stream_transactions_reorg_aware(
         self,
         blockchain: str,
-        start_block_hash_or_height: Union[int, str] = "latest",
-        sleep_interval_seconds: float = 10,
-        load_n_blocks_ahead: int = 1,
-    ) -> AsyncIterable[Tuple[Block, Transaction]]:
-        new_blocks = self.stream_new_blocks(
-            blockchain=blockchain,
-            start_block_hash_or_height=start_block_hash_or_height,
-            sleep_interval_seconds=sleep_interval_seconds,
-            n_blocks_ahead=load_n_blocks_ahead,
-        )
-        async for block in new_blocks:
-            block_transactions = self.get_all_transactions_of_block(blockchain=blockchain, block=block)
-            async for transaction in block_transactions:
-                yield block, transaction
+        start_block_hash_or_height: Union[int, str],
+        sleep_interval_seconds: float,
+        reorg: ReorgTracker,
+    ) -> AsyncIterable[Union[Tuple[Block, Transaction], BlockRollback]]:
+        # pylint: disable-next=import-outside-toplevel
+        from stocra.reorg import BlockRollback
+
+        events = self._stream_blocks_reorg_aware(blockchain, start_block_hash_or_height, sleep_interval_seconds, reorg)
+        async for event in events:
+            if isinstance(event, BlockRollback):
+                yield event
+                continue
+
+            logger.debug("%s: get_all_transactions %s", blockchain, event.height)
+            transactions = self._get_all_transactions(blockchain, event.transactions, self._get_transaction, None)
+            async for transaction in transactions:
+                yield event, transaction
+
+    async def _verify_recent_blocks(self, blockchain: str, reorg: ReorgTracker) -> Optional[BlockRollback]:
+        hashes = await self._get_block_hashes(blockchain, reorg.heights_to_verify())
+        heights = reorg.heights_to_roll_back(hashes)
+        if heights:
+            hashes.update(await self._get_block_hashes(blockchain, heights))
+
+        return reorg.verified(hashes)
+
+    async def _get_block_hashes(self, blockchain: str, heights: List[int]) -> Dict[int, Optional[str]]:
+        async def get_block_hash(height: int) -> Optional[str]:
+            try:
+                # raw block is enough to compare hashes and skips validation of the whole block
+                return (await self._get_raw_block(blockchain, height, None)).hash
+            except ClientResponseError as exception:
+                if exception.status == 404:
+                    return None
 
-    async def get_tokens(self, blockchain: str) -> Dict[str, Token]:
-        if self._tokens.get(blockchain) is None:
-            await self._refresh_tokens(blockchain)
+                raise
 
-        return self._tokens[blockchain]
+        block_hashes = await asyncio.gather(*[get_block_hash(height) for height in heights])
+        return dict(zip(heights, block_hashes))
 
-    async def scale_token_value(self, blockchain: str, contract_address: str, value: Decimal) -> Decimal:
-        tokens = await self.get_tokens(blockchain)
-        token = tokens[contract_address]
-        return value * token.scaling
+    def _profile_consumer(self, items: AsyncIterable[T]) -> AsyncIterable[T]:
+        if self._profiler:
+            return self._profiler.profile_async_consumer(items)
+
+        return items
+
+    @classmethod
+    def _record_fetches(cls, get_block: GetBlock[BlockT], monitor: StreamMonitor) -> GetBlock[BlockT]:
+        async def get_and_record_block(
+            blockchain: str, hash_or_height: Union[str, int], deadline: Optional[Deadline]
+        ) -> BlockT:
+            block = await get_block(blockchain, hash_or_height, deadline)
+            monitor.block_fetched(block.height)
+            return block
+
+        return get_and_record_block
+
+    @classmethod
+    async def _deliver_blocks(
+        cls, blocks: AsyncIterable[BlockT], monitor: Optional[StreamMonitor]
+    ) -> AsyncIterable[BlockT]:
+        async for block in blocks:
+            if monitor:
+                monitor.block_delivered(block)
+
+            yield block
+
+    @classmethod
+    async def _filter_transactions(
+        cls, watchlist: Watchlist, transactions: AsyncIterable[Tuple[Block, RawTransaction]]
+    ) -> AsyncIterable[Tuple[Block, Transaction]]:
+        async for block, transaction in transactions:
+            if watchlist.matches(transaction.body):
+                yield block, Transaction.parse_raw(transaction.body)
 
     async def _acquire(self) -> None:
         if self._semaphore:
@@ -158,22 +755,136 @@ class Stocra(StocraBase):
         finally:
             self._release()
 
-    async def _get(self, blockchain: str, endpoint: str) -> dict:  # type: ignore[return]
+    async def _get(self, blockchain: str, endpoint: str, deadline: Optional[Deadline] = None) -> dict:
+        response = await self._request(blockchain, endpoint, deadline)
+        return await self._decode(response)
+
+    async def _decode(self, response: ClientResponse) -> dict:
+        # the body was already read by `_request`
+        with self._profile("decode"):
+            return cast(dict, await response.json())
+
+    async def _get_parsed(
+        self, blockchain: str, endpoint: str, parse: Callable[[dict], T], deadline: Optional[Deadline]
+    ) -> T:
+        if endpoint not in MUTABLE_ENDPOINTS:
+            decoded = await self._get(blockchain, endpoint, deadline)
+            with self._profile("validation"):
+                return parse(decoded)
+
+        cached = self._conditional_cache.get(blockchain, endpoint)
+        response = await self._request(blockchain, endpoint, deadline, headers=cached.headers if cached else None)
+        if cached and response.status == 304:
+            logger.debug("%s: %s not modified", blockchain, endpoint)
+            return cast(T, cached.value)
+
+        return self._store_parsed(blockchain, endpoint, response.headers, await self._decode(response), parse)
+
+    async def _request(  # type: ignore[return]
+        self,
+        blockchain: str,
+        endpoint: str,
+        deadline: Optional[Deadline] = None,
+        headers: Optional[Dict[str, str]] = None,
+        stream: bool = False,
+    ) -> ClientResponse:
         for iteration in count(start=1):
             try:
+                return await self._get_from_any_endpoint(blockchain, endpoint, deadline, headers, stream)
+            except DeadlineExceeded:
+                raise
+            except (ClientError, asyncio.TimeoutError) as exception:
+                error = StocraHTTPError(endpoint=endpoint, iteration=iteration, exception=exception, deadline=deadline)
+                with self._profile("retry"):
+                    retry = await self._should_continue(error)
+
+                if retry:
+                    continue
+
+                raise
+
+    async def _get_from_any_endpoint(
+        self,
+        blockchain: str,
+        endpoint: str,
+        deadline: Optional[Deadline],
+        headers: Optional[Dict[str, str]],
+        stream: bool,
+    ) -> ClientResponse:
+        *fallbacks, last_resort = self._get_endpoint_pool(blockchain).candidates()
+        for candidate in fallbacks:
+            try:
+                return await self._get_from_endpoint(blockchain, candidate, endpoint, deadline, headers, stream)
+            except DeadlineExceeded:
+                raise
+            except (ClientError, asyncio.TimeoutError) as exception:
+                if not self._is_endpoint_failure(exception):
+                    raise
+
+                logger.debug("%s: %s failed on %s, failing over", blockchain, endpoint, candidate.url)
+
+        return await self._get_from_endpoint(blockchain, last_resort, endpoint, deadline, headers, stream)
+
+    async def _get_from_endpoint(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        blockchain: str,
+        candidate: EndpointStats,
+        endpoint: str,
+        deadline: Optional[Deadline],
+        headers: Optional[Dict[str, str]],
+        stream: bool,
+    ) -> ClientResponse:
+        if self._rate_limiter:
+            with self._profile("rate_limit"):
+                await asyncio.sleep(limit_sleep(self._rate_limiter.reserve(), deadline))
+
+        timeout = self._get_request_timeout(endpoint, deadline)
+        with self._attempt(blockchain, candidate):
+            with self._profile("network"):
                 response = await self._session.get(
-                    f"https://{blockchain}.stocra.com/v1.0/{endpoint}",
+                    f"{candidate.url}/{endpoint}",
                     raise_for_status=True,
                     allow_redirects=False,
-                    headers=self.headers,
+                    headers={**self.headers, **(headers or dict())},
+                    timeout=self._client_timeout(timeout, stream),
                 )
-                return cast(dict, await response.json())
-            except (ClientError, asyncio.TimeoutError) as exception:
-                error = StocraHTTPError(endpoint=endpoint, iteration=iteration, exception=exception)
-                if await self._should_continue(error):
-                    continue
+                # headers and body are one network span, streamed body is read by the caller
+                if not stream:
+                    await response.read()
 
-                raise
+        return response
+
+    @classmethod
+    def _client_timeout(cls, timeout: Optional[float], stream: bool) -> ClientTimeout:
+        if stream:
+            # streamed body is read at the pace of the consumer, so only a stalled socket times out
+            # and the whole read is bounded just by the deadline of the caller
+            return ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+
+        return ClientTimeout(total=timeout)
+
+    async def _warm_up_endpoint(self, url: str, connections: int) -> None:
+        # aiohttp has no public API for opening connections ahead of requests,
+        # concurrent HEAD requests open the connections and leave them in the pool
+        async def head() -> None:
+            async with self._session.head(f"{url}/", allow_redirects=False):
+                pass
+
+        try:
+            await asyncio.gather(*[head() for _ in range(connections)])
+            self._pool_tracker.warmed_up(url, connections)
+        except (ClientError, asyncio.TimeoutError):
+            logger.warning("Warm-up of %s failed", url, exc_info=True)
+
+    @classmethod
+    def _is_endpoint_failure(cls, exception: BaseException) -> bool:
+        if isinstance(exception, ClientResponseError):
+            # pylint: disable-next=import-outside-toplevel
+            from stocra.endpoints import is_failover_status
+
+            return is_failover_status(exception.status)
+
+        return True
 
     async def _should_continue(self, error: StocraHTTPError) -> bool:
         if not self._error_handlers:
@@ -182,10 +893,12 @@ class Stocra(StocraBase):
         for error_handler in self._error_handlers:
             retry = await cast(Awaitable[bool], error_handler(error))
             if retry:
+                if error.deadline:
+                    error.deadline.check(error.endpoint)
+
                 return True
 
         return False
 
-    async def _refresh_tokens(self, blockchain: str) -> None:
-        tokens = await self._get(blockchain, "tokens")
-        self._tokens[blockchain] = {contract_address: Token(**token) for contract_address, token in tokens.items()}
+    async def _refresh_tokens(self, blockchain: str, deadline: Optional[Deadline] = None) -> None:
+        self._tokens[blockchain] = await self._get_parsed(blockchain, "tokens", self._parse_tokens, deadline)
@@ -3,7 +3,7 @@ import asyncio
 from aiohttp import ClientConnectionError, ClientResponseError
 
 from stocra.models import StocraHTTPError
-from stocra.utils import calculate_sleep
+from stocra.utils import calculate_sleep, limit_sleep
 
 
 async def retry_on_service_unavailable(error: StocraHTTPError) -> bool:
@@ -16,7 +16,7 @@ async def retry_on_service_unavailable(error: StocraHTTPError) -> bool:
     if error.iteration > 10:
         return False
 
-    await asyncio.sleep(calculate_sleep(error.iteration))
+    await asyncio.sleep(limit_sleep(calculate_sleep(error.iteration), error.deadline))
     return True
 
 
@@ -27,7 +27,7 @@ async def retry_on_connection_error(error: StocraHTTPError) -> bool:
     if error.iteration > 10:
         return False
 
-    await asyncio.sleep(calculate_sleep(error.iteration))
+    await asyncio.sleep(limit_sleep(calculate_sleep(error.iteration), error.deadline))
     return True
 
 
@@ -47,7 +47,7 @@ async def retry_on_too_many_requests(error: StocraHTTPError) -> bool:
         return False
 
     retry_after = headers.get("Retry-After", 0)
-    await asyncio.sleep(int(retry_after))
+    await asyncio.sleep(limit_sleep(int(retry_after), error.deadline))
     return True
 
 
@@ -61,7 +61,7 @@ async def retry_on_bad_gateway(error: StocraHTTPError) -> bool:
     if error.iteration > 10:
         return False
 
-    await asyncio.sleep(calculate_sleep(error.iteration))
+    await asyncio.sleep(limit_sleep(calculate_sleep(error.iteration), error.deadline))
     return True
 
 
@@ -72,5 +72,5 @@ async def retry_on_timeout_error(error: StocraHTTPError) -> bool:
     if error.iteration > 10:
         return False
 
-    await asyncio.sleep(calculate_sleep(error.iteration))
+    await asyncio.sleep(limit_sleep(calculate_sleep(error.iteration), error.deadline))
     return True
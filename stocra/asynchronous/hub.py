@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from functools import partial
+from typing import AsyncIterable, Callable, Generic, Optional, TypeVar
+
+from stocra.hub import (
+    DEFAULT_BUFFER_SIZE,
+    HubState,
+    SlowConsumerPolicy,
+    SubscriptionBase,
+)
+
+logger = logging.getLogger("stocra")
+T = TypeVar("T")
+
+
+class Subscription(SubscriptionBase[T]):
+    def __init__(self, buffer_size: int, policy: SlowConsumerPolicy, on_close: Callable[["Subscription"], None]):
+        super().__init__(buffer_size, policy, on_close)
+        self._condition = asyncio.Condition()
+
+    def __aiter__(self) -> "Subscription[T]":
+        return self
+
+    async def __anext__(self) -> T:
+        async with self._condition:
+            await self._condition.wait_for(self._buffer.readable)
+            self._condition.notify_all()
+            return self._buffer.get(StopAsyncIteration)
+
+    async def close(self) -> None:
+        self._on_close(self)
+        await self._finish(None)
+
+    async def _put(self, item: T) -> bool:
+        async with self._condition:
+            await self._condition.wait_for(self._buffer.writable)
+            delivered = self._buffer.put(item)
+            self._condition.notify_all()
+            return delivered
+
+    async def _finish(self, error: Optional[BaseException]) -> None:
+        async with self._condition:
+            self._buffer.finish(error)
+            self._condition.notify_all()
+
+
+class StreamHub(Generic[T]):
+    """
+    Runs one `stream(blockchain)` pipeline per blockchain in a background task and delivers every item
+    to all subscribers of that blockchain. Every subscriber has its own bounded buffer and slow consumer policy.
+    Subscribers get items produced after they subscribed. Pipeline runs until its stream ends, its last subscriber
+    leaves or the hub is closed, an error of the stream is raised to every subscriber after it drains its buffer.
+    """
+
+    def __init__(self, stream: Callable[[str], AsyncIterable[T]]) -> None:
+        self._stream = stream
+        self._state: HubState[Subscription[T], "asyncio.Task[None]"] = HubState()
+
+    def subscribe(
+        self,
+        blockchain: str,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        policy: SlowConsumerPolicy = SlowConsumerPolicy.BLOCK,
+    ) -> Subscription[T]:
+        subscription: Subscription[T] = Subscription(buffer_size, policy, partial(self._unsubscribe, blockchain))
+        if self._state.subscribe(blockchain, subscription):
+            self._state.started(blockchain, asyncio.create_task(self._run(blockchain)))
+
+        return subscription
+
+    async def close(self) -> None:
+        subscriptions, pipelines = self._state.close()
+        for pipeline in pipelines:
+            pipeline.cancel()
+
+        await asyncio.gather(*pipelines, return_exceptions=True)
+        for subscription in subscriptions:
+            await subscription._finish(None)  # pylint: disable=protected-access
+
+    def _unsubscribe(self, blockchain: str, subscription: Subscription[T]) -> None:
+        pipeline = self._state.unsubscribe(blockchain, subscription)
+        if pipeline and pipeline is not asyncio.current_task():
+            pipeline.cancel()
+
+    async def _run(self, blockchain: str) -> None:
+        # pylint: disable=protected-access
+        pipeline = asyncio.current_task()
+        error: Optional[BaseException] = None
+        try:
+            async for item in self._stream(blockchain):
+                for subscription in self._state.subscriptions(blockchain):
+                    if not await subscription._put(item):
+                        self._unsubscribe(blockchain, subscription)
+
+                if not self._state.is_current(blockchain, pipeline):
+                    break
+        except Exception as exception:  # pylint: disable=broad-except
+            logger.exception("%s: hub pipeline failed", blockchain)
+            error = exception
+        finally:
+            for subscription in self._state.stopped(blockchain, pipeline):
+                await subscription._finish(error)
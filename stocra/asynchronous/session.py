@@ -0,0 +1,22 @@
+from aiohttp import ClientSession, TCPConnector
+
+from stocra.defaults import (
+    DEFAULT_DNS_CACHE_SECONDS,
+    DEFAULT_KEEPALIVE_SECONDS,
+    DEFAULT_POOL_SIZE,
+)
+
+
+def create_session(
+    pool_size: int = DEFAULT_POOL_SIZE,
+    keepalive_seconds: float = DEFAULT_KEEPALIVE_SECONDS,
+    dns_cache_seconds: int = DEFAULT_DNS_CACHE_SECONDS,
+) -> ClientSession:
+    connector = TCPConnector(
+        limit=0,
+        limit_per_host=pool_size,
+        use_dns_cache=True,
+        ttl_dns_cache=dns_cache_seconds,
+        keepalive_timeout=keepalive_seconds,
+    )
+    return ClientSession(connector=connector)
@@ -0,0 +1,191 @@
+import logging
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from time import monotonic
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from stocra.checkpoint import CheckpointStore, CheckpointTracker
+from stocra.models import Block, Transaction
+from stocra.rate_limit import RateLimiter
+from stocra.synchronous.client import Stocra
+
+logger = logging.getLogger("stocra")
+Sink = Callable[[Block, List[Transaction]], None]
+BlockTransactions = Tuple[Block, List[Transaction]]
+
+# client of the worker process, created once by the process pool initializer
+_worker_client: Optional[Stocra] = None  # pylint: disable=invalid-name
+
+
+@dataclass(frozen=True)
+class Shard:
+    start: int
+    stop: int
+
+    def checkpoint_key(self, blockchain: str) -> str:
+        return f"{blockchain}-{self.start}-{self.stop}"
+
+
+@dataclass(frozen=True)
+class ShardResult:
+    shard: Shard
+    transactions: int
+    items: List[BlockTransactions]
+
+
+@dataclass(frozen=True)
+class BackfillProgress:
+    shards_done: int
+    shards_total: int
+    blocks_done: int
+    blocks_total: int
+    transactions: int
+    elapsed_seconds: float
+
+    @property
+    def blocks_per_second(self) -> float:
+        return self.blocks_done / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+class Backfill:  # pylint: disable=too-many-instance-attributes
+    """
+    Fetches blocks `start_height` (inclusive) to `stop_height` (exclusive) with their transactions
+    in `workers` processes, each with its own client, connection pool and `threads_per_worker` threads.
+    The range is split into shards of `shard_size` blocks, `requests_per_second` is split evenly among workers.
+
+    `stream` yields blocks with their transactions in height order, a shard is checkpointed once all of its blocks
+    were consumed. `run` hands every block to `sink` in the worker processes and checkpoints each block
+    once the sink returned, `sink` has to be picklable.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        blockchain: str,
+        start_height: int,
+        stop_height: int,
+        *,
+        shard_size: int = 100,
+        workers: Optional[int] = None,
+        threads_per_worker: int = 8,
+        requests_per_second: Optional[float] = None,
+        checkpoint_store: Optional[CheckpointStore] = None,
+        progress: Optional[Callable[[BackfillProgress], None]] = None,
+        client_options: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        if stop_height <= start_height:
+            raise ValueError(f"`stop_height` must be greater than `start_height`. Got `{start_height}-{stop_height}`")
+
+        if shard_size < 1:
+            raise ValueError(f"`shard_size` must be greater than 0. Got `{shard_size}`")
+
+        self.blockchain = blockchain
+        self.shards = [
+            Shard(start=start, stop=min(start + shard_size, stop_height))
+            for start in range(start_height, stop_height, shard_size)
+        ]
+        self._workers = workers or os.cpu_count() or 1
+        self._threads_per_worker = threads_per_worker
+        self._requests_per_second = requests_per_second
+        self._checkpoint_store = checkpoint_store
+        self._progress = progress
+        self._client_options = client_options or dict()
+
+    def stream(self) -> Iterable[BlockTransactions]:
+        for result in self._run_shards(sink=None):
+            yield from result.items
+            if self._checkpoint_store:
+                self._checkpoint_store.commit(result.shard.checkpoint_key(self.blockchain), result.shard.stop - 1)
+
+    def run(self, sink: Sink) -> None:
+        for _ in self._run_shards(sink=sink):
+            pass
+
+    def _run_shards(self, sink: Optional[Sink]) -> Iterable[ShardResult]:
+        requests_per_second = self._requests_per_second / self._workers if self._requests_per_second else None
+        started_at = monotonic()
+        shards = deque(self.shards)
+        futures: Deque["Future[ShardResult]"] = deque()
+        shards_done = blocks_done = transactions = 0
+        with ProcessPoolExecutor(
+            max_workers=self._workers,
+            initializer=_init_worker,
+            initargs=(self._client_options, self._threads_per_worker, requests_per_second),
+        ) as executor:
+            try:
+                while shards or futures:
+                    # keep every worker busy while holding results of only a few shards in memory
+                    while shards and len(futures) < 2 * self._workers:
+                        shard = shards.popleft()
+                        futures.append(
+                            executor.submit(_backfill_shard, self.blockchain, shard, sink, self._checkpoint_store)
+                        )
+
+                    result = futures.popleft().result()
+                    shards_done += 1
+                    blocks_done += result.shard.stop - result.shard.start
+                    transactions += result.transactions
+                    logger.debug("%s: backfill shard %s done", self.blockchain, result.shard)
+                    if self._progress:
+                        self._progress(
+                            BackfillProgress(
+                                shards_done=shards_done,
+                                shards_total=len(self.shards),
+                                blocks_done=blocks_done,
+                                blocks_total=self.shards[-1].stop - self.shards[0].start,
+                                transactions=transactions,
+                                elapsed_seconds=monotonic() - started_at,
+                            )
+                        )
+
+                    yield result
+            finally:
+                for future in futures:
+                    future.cancel()
+
+
+def _init_worker(client_options: Dict[str, Any], threads: int, requests_per_second: Optional[float]) -> None:
+    global _worker_client  # pylint: disable=global-statement
+    _worker_client = Stocra(
+        executor=ThreadPoolExecutor(max_workers=threads),
+        rate_limiter=RateLimiter(requests_per_second) if requests_per_second else None,
+        **client_options,
+    )
+
+
+def _backfill_shard(
+    blockchain: str, shard: Shard, sink: Optional[Sink], checkpoint_store: Optional[CheckpointStore]
+) -> ShardResult:
+    if _worker_client is None:
+        raise RuntimeError("Worker client is not initialized")
+
+    start = shard.start
+    checkpoint = CheckpointTracker(checkpoint_store, shard.checkpoint_key(blockchain)) if checkpoint_store else None
+    if checkpoint:
+        if checkpoint.is_committed(shard.stop - 1):
+            return ShardResult(shard=shard, transactions=0, items=[])
+
+        start = int(checkpoint.resume_from(shard.start))
+        if checkpoint.is_committed(start):
+            start += 1
+
+    items: List[BlockTransactions] = []
+    transactions_count = 0
+    for height in range(start, shard.stop):
+        block = _worker_client.get_block(blockchain, height)
+        by_hash = {
+            transaction.hash: transaction
+            for transaction in _worker_client.get_all_transactions_of_block(blockchain, block)
+        }
+        transactions = [by_hash[transaction_hash] for transaction_hash in block.transactions]
+        transactions_count += len(transactions)
+        if sink is None:
+            items.append((block, transactions))
+            continue
+
+        sink(block, transactions)
+        if checkpoint:
+            checkpoint.committed(height)
+
+    return ShardResult(shard=shard, transactions=transactions_count, items=items)
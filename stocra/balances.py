@@ -0,0 +1,214 @@
+import json
+import os
+from collections import deque
+from dataclasses import dataclass
+from decimal import (
+    MAX_EMAX,
+    MAX_PREC,
+    MIN_EMIN,
+    Context,
+    Decimal,
+    Inexact,
+    InvalidOperation,
+    Overflow,
+)
+from pathlib import Path
+from threading import Lock
+from typing import Deque, Dict, Iterable, List, Optional, Tuple, Union, cast
+
+from stocra.models import Address, Block, Transaction
+
+DEFAULT_DECIMALS = 18
+DEFAULT_ROLLBACK_DEPTH = 10
+# default decimal context rounds to 28 significant digits, amounts of 18-decimal tokens need more
+EXACT = Context(prec=MAX_PREC, Emax=MAX_EMAX, Emin=MIN_EMIN, traps=[Inexact, InvalidOperation, Overflow])
+
+BalanceKey = Tuple[Address, str]
+# received, sent, received count, sent count; received and sent are in the smallest units of the currency
+Totals = List[int]
+RECEIVED, SENT, RECEIVED_COUNT, SENT_COUNT = range(4)
+
+
+@dataclass(frozen=True)
+class AddressBalance:
+    address: Address
+    currency_symbol: str
+    received: Decimal
+    sent: Decimal
+    received_count: int
+    sent_count: int
+
+    @property
+    def balance(self) -> Decimal:
+        return EXACT.subtract(self.received, self.sent)
+
+
+@dataclass
+class BlockDelta:
+    height: int
+    hash: str
+    totals: Dict[BalanceKey, Totals]
+
+
+class BalanceIndex:
+    """
+    Received and sent totals and counts per address and currency, built from streamed (block, transaction) pairs.
+
+    Amounts are kept as integers in the smallest units of the currency (`decimals` places, per currency symbol).
+    Transactions are collected per block and applied once the block is complete, that is when a transaction
+    of another block arrives or `flush` is called. Last `rollback_depth` applied blocks can be rolled back.
+    Inputs without address or amount (see `stocra.utxo.UtxoIndex`) are skipped.
+    """
+
+    def __init__(
+        self,
+        decimals: Optional[Dict[str, int]] = None,
+        default_decimals: int = DEFAULT_DECIMALS,
+        rollback_depth: int = DEFAULT_ROLLBACK_DEPTH,
+    ) -> None:
+        self._decimals = decimals or dict()
+        self._default_decimals = default_decimals
+        self._totals: Dict[BalanceKey, Totals] = dict()
+        self._history: Deque[BlockDelta] = deque(maxlen=rollback_depth)
+        self._pending: Optional[BlockDelta] = None
+        self._lock = Lock()
+
+    @property
+    def block_height(self) -> Optional[int]:
+        return self._history[-1].height if self._history else None
+
+    def get(self, address: Address, currency_symbol: str) -> Optional[AddressBalance]:
+        totals = self._totals.get((address, currency_symbol))
+        if totals is None:
+            return None
+
+        return AddressBalance(
+            address=address,
+            currency_symbol=currency_symbol,
+            received=self._to_decimal(currency_symbol, totals[RECEIVED]),
+            sent=self._to_decimal(currency_symbol, totals[SENT]),
+            received_count=totals[RECEIVED_COUNT],
+            sent_count=totals[SENT_COUNT],
+        )
+
+    def balances(self, address: Address) -> List[AddressBalance]:
+        currency_symbols = [currency_symbol for address_, currency_symbol in list(self._totals) if address_ == address]
+        return [cast(AddressBalance, self.get(address, currency_symbol)) for currency_symbol in currency_symbols]
+
+    def add(self, block: Block, transaction: Transaction) -> None:
+        with self._lock:
+            if self._pending is None or self._pending.hash != block.hash:
+                self._flush()
+                self._pending = BlockDelta(height=block.height, hash=block.hash, totals=dict())
+
+            pending = self._pending.totals
+            for transaction_input in transaction.inputs:
+                if transaction_input.address is None or transaction_input.amount is None:
+                    continue
+
+                amount = transaction_input.amount
+                self._count(pending, transaction_input.address, amount.currency_symbol, amount.value, SENT)
+
+            for output in transaction.outputs:
+                self._count(pending, output.address, output.amount.currency_symbol, output.amount.value, RECEIVED)
+
+    def add_block(self, block: Block, transactions: Iterable[Transaction]) -> None:
+        for transaction in transactions:
+            self.add(block, transaction)
+
+        self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def rollback(self, n_blocks: int = 1) -> List[int]:
+        with self._lock:
+            if n_blocks > len(self._history):
+                raise ValueError(f"Only {len(self._history)} blocks can be rolled back. Got `{n_blocks}`")
+
+            self._pending = None
+            rolled_back = []
+            for _ in range(n_blocks):
+                delta = self._history.pop()
+                self._apply(delta.totals, sign=-1)
+                rolled_back.append(delta.height)
+
+            return rolled_back
+
+    def snapshot(self, path: Union[str, Path]) -> None:
+        """Writes totals of applied blocks and rollback history, transactions of an unfinished block are left out."""
+        with self._lock:
+            data = dict(
+                decimals=self._decimals,
+                default_decimals=self._default_decimals,
+                rollback_depth=self._history.maxlen,
+                totals=self._dump(self._totals),
+                history=[
+                    dict(height=delta.height, hash=delta.hash, totals=self._dump(delta.totals))
+                    for delta in self._history
+                ],
+            )
+
+        path = Path(path)
+        temporary_path = path.with_suffix(".tmp")
+        temporary_path.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def restore(cls, path: Union[str, Path]) -> "BalanceIndex":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        index = cls(
+            decimals=data["decimals"],
+            default_decimals=data["default_decimals"],
+            rollback_depth=data["rollback_depth"],
+        )
+        index._totals = cls._load(data["totals"])  # pylint: disable=protected-access
+        for delta in data["history"]:
+            index._history.append(  # pylint: disable=protected-access
+                BlockDelta(height=delta["height"], hash=delta["hash"], totals=cls._load(delta["totals"]))
+            )
+
+        return index
+
+    def _flush(self) -> None:
+        if self._pending is None:
+            return
+
+        self._apply(self._pending.totals, sign=1)
+        self._history.append(self._pending)
+        self._pending = None
+
+    def _apply(self, delta: Dict[BalanceKey, Totals], sign: int) -> None:
+        for key, delta_totals in delta.items():
+            totals = self._totals.setdefault(key, [0, 0, 0, 0])
+            for position, value in enumerate(delta_totals):
+                totals[position] += sign * value
+
+            if not any(totals):
+                del self._totals[key]
+
+    def _count(
+        self, totals: Dict[BalanceKey, Totals], address: Address, currency_symbol: str, value: Decimal, position: int
+    ) -> None:
+        address_totals = totals.setdefault((address, currency_symbol), [0, 0, 0, 0])
+        address_totals[position] += self._to_units(currency_symbol, value)
+        address_totals[position + 2] += 1
+
+    def _to_units(self, currency_symbol: str, value: Decimal) -> int:
+        units = EXACT.scaleb(value, self._decimals.get(currency_symbol, self._default_decimals))
+        if units != units.to_integral_value():
+            raise ValueError(f"{value} {currency_symbol} has more decimal places than supported")
+
+        return int(units)
+
+    def _to_decimal(self, currency_symbol: str, units: int) -> Decimal:
+        return EXACT.scaleb(Decimal(units), -self._decimals.get(currency_symbol, self._default_decimals))
+
+    @classmethod
+    def _dump(cls, totals: Dict[BalanceKey, Totals]) -> List[list]:
+        return [[address, currency_symbol, *values] for (address, currency_symbol), values in totals.items()]
+
+    @classmethod
+    def _load(cls, rows: List[list]) -> Dict[BalanceKey, Totals]:
+        return {(address, currency_symbol): values for address, currency_symbol, *values in rows}
@@ -1,25 +1,204 @@
+from __future__ import annotations
+
 import abc
-from typing import Dict, List, Optional
+from contextlib import contextmanager, nullcontext
+from importlib.util import find_spec
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+)
+from urllib.parse import urlsplit
+
+from stocra.deadline import DEFAULT_REQUEST_TIMEOUT, Deadline
+from stocra.defaults import DEFAULT_BASE_URL, DEFAULT_POOL_SIZE
+from stocra.models import Block, ErrorHandler, Transaction
+
+# optional features are imported only when used to keep the import of clients fast
+if TYPE_CHECKING:
+    from stocra.checkpoint import CheckpointStore, CheckpointTracker
+    from stocra.conditional import ConditionalCache
+    from stocra.connection_pools import PoolStats, PoolTracker
+    from stocra.endpoints import EndpointPool, EndpointStats
+    from stocra.profiling import Profiler
+    from stocra.rate_limit import RateLimiter
+    from stocra.raw import RawBlock, RawTransaction
+    from stocra.reorg import ReorgTracker
+    from stocra.tokens import Token
+
+T = TypeVar("T")
+BlockT = TypeVar("BlockT", Block, "RawBlock")
+TransactionT = TypeVar("TransactionT", Transaction, "RawTransaction")
 
-from stocra.models import ErrorHandler, Token
+# brotli is decoded by both requests and aiohttp only when one of these packages is installed
+BROTLI_AVAILABLE = any(find_spec(package) for package in ("brotli", "brotlicffi"))
+ACCEPT_ENCODING = "gzip, deflate, br" if BROTLI_AVAILABLE else "gzip, deflate"
 
+# Endpoints whose responses change over time and are fetched with conditional requests
+MUTABLE_ENDPOINTS = frozenset(["blocks/latest", "tokens"])
 
-class StocraBase(abc.ABC):
+
+class StocraBase(abc.ABC):  # pylint: disable=too-many-instance-attributes
     _api_key: Optional[str] = None
     _error_handlers: Optional[List[ErrorHandler]] = None
     _tokens: Dict[str, Dict[str, Token]] = dict()
+    _base_url: str
+    _endpoints: Dict[str, List[str]]
+    _endpoint_pools: Dict[str, EndpointPool]
+    _pool_size: int
+    _pool_tracker: PoolTracker
+    _request_timeout: Optional[float]
+    _conditional_cache: ConditionalCache
+    _rate_limiter: Optional[RateLimiter]
+    _profiler: Optional[Profiler]
+    # errors of requests which fail over to the next endpoint and are passed to the error handlers
+    _request_errors: Tuple[Type[BaseException], ...]
 
-    def __init__(
+    def __init__(  # pylint: disable=too-many-arguments
         self,
         api_key: Optional[str] = None,
         error_handlers: Optional[List[ErrorHandler]] = None,
+        *,
+        base_url: str = DEFAULT_BASE_URL,
+        endpoints: Optional[Dict[str, List[str]]] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        request_timeout: Optional[float] = DEFAULT_REQUEST_TIMEOUT,
+        rate_limiter: Optional[RateLimiter] = None,
+        profiler: Optional[Profiler] = None,
     ) -> None:
+        # pylint: disable=import-outside-toplevel
+        from stocra.conditional import ConditionalCache
+        from stocra.connection_pools import PoolTracker
+
         self._api_key = api_key
         self._error_handlers = error_handlers
+        self._base_url = base_url
+        self._endpoints = endpoints or dict()
+        self._endpoint_pools = dict()
+        self._pool_size = pool_size
+        self._pool_tracker = PoolTracker(pool_size)
+        self._request_timeout = request_timeout
+        self._conditional_cache = ConditionalCache()
+        self._rate_limiter = rate_limiter
+        self._profiler = profiler
 
     @property
     def headers(self) -> dict:
+        headers = {"Accept-Encoding": ACCEPT_ENCODING}
         if self._api_key:
-            return dict(Authorization=f"Bearer {self._api_key}")
+            headers["Authorization"] = f"Bearer {self._api_key}"
+
+        return headers
+
+    def endpoint_stats(self, blockchain: str) -> List[EndpointStats]:
+        return self._get_endpoint_pool(blockchain).stats()
+
+    def pool_stats(self) -> Dict[str, PoolStats]:
+        return self._pool_tracker.stats()
+
+    def _profile(self, phase: str) -> ContextManager[None]:
+        # phase is a value of Phase, profiling is imported only together with a profiler
+        if self._profiler:
+            # pylint: disable-next=import-outside-toplevel
+            from stocra.profiling import Phase
+
+            return self._profiler.measure(Phase(phase))
+
+        return nullcontext()
+
+    def _get_endpoint_pool(self, blockchain: str) -> EndpointPool:
+        if blockchain not in self._endpoint_pools:
+            # pylint: disable-next=import-outside-toplevel
+            from stocra.endpoints import EndpointPool
+
+            base_urls = self._endpoints.get(blockchain) or [self._base_url]
+            pool = EndpointPool([base_url.format(blockchain=blockchain) for base_url in base_urls])
+            return self._endpoint_pools.setdefault(blockchain, pool)
+
+        return self._endpoint_pools[blockchain]
+
+    def _store_parsed(
+        self,
+        blockchain: str,
+        endpoint: str,
+        response_headers: Mapping[str, str],
+        decoded: dict,
+        parse: Callable[[dict], T],
+    ) -> T:
+        # parsed value of a mutable endpoint is kept for the next conditional request
+        with self._profile("validation"):
+            value = parse(decoded)
+
+        self._conditional_cache.store(blockchain, endpoint, response_headers, value)
+        return value
+
+    @contextmanager
+    def _attempt(self, blockchain: str, candidate: EndpointStats) -> Iterator[None]:
+        # outcome of a request to the candidate, for choosing endpoints and for the connection pool statistics
+        pool = self._get_endpoint_pool(blockchain)
+        started_at = pool.started(candidate)
+        self._pool_tracker.acquired(candidate.url)
+        try:
+            yield
+        except self._request_errors as exception:
+            if self._is_endpoint_failure(exception):
+                pool.failed(candidate)
+            else:
+                pool.succeeded(candidate, started_at)
+
+            raise
+        except BaseException:
+            pool.abandoned(candidate)
+            raise
+        finally:
+            self._pool_tracker.released(candidate.url)
+
+        pool.succeeded(candidate, started_at)
+
+    @classmethod
+    @abc.abstractmethod
+    def _is_endpoint_failure(cls, exception: BaseException) -> bool: ...
+
+    def _endpoint_hosts(self) -> List[str]:
+        base_urls = [self._base_url] + [url for urls in self._endpoints.values() for url in urls]
+        return [urlsplit(url.format(blockchain="*")).hostname or "" for url in base_urls]
+
+    @classmethod
+    def _checkpoint_tracker(
+        cls, checkpoint_store: Optional[CheckpointStore], checkpoint_key: Optional[str], blockchain: str
+    ) -> Optional[CheckpointTracker]:
+        if checkpoint_store is None:
+            return None
+
+        # pylint: disable-next=import-outside-toplevel
+        from stocra.checkpoint import CheckpointTracker
+
+        return CheckpointTracker(checkpoint_store, checkpoint_key or blockchain)
+
+    @classmethod
+    def _reorg_tracker(cls, depth: int) -> ReorgTracker:
+        # pylint: disable-next=import-outside-toplevel
+        from stocra.reorg import ReorgTracker
+
+        return ReorgTracker(depth)
+
+    @classmethod
+    def _parse_tokens(cls, tokens: dict) -> Dict[str, Token]:
+        # pylint: disable-next=import-outside-toplevel
+        from stocra.tokens import Token
+
+        return {contract_address: Token(**token) for contract_address, token in tokens.items()}
+
+    def _get_request_timeout(self, endpoint: str, deadline: Optional[Deadline]) -> Optional[float]:
+        if deadline is None:
+            return self._request_timeout
 
-        return dict()
+        return deadline.request_timeout(endpoint, self._request_timeout)
@@ -0,0 +1,281 @@
+import abc
+import json
+import os
+import re
+import sqlite3
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Lock
+from time import monotonic
+from typing import IO, Any, Callable, Dict, Iterable, List, Optional, Set, Union
+
+DEFAULT_FLUSH_EVERY = 100
+DEFAULT_FLUSH_INTERVAL_SECONDS = 1.0
+
+
+@dataclass
+class Checkpoint:
+    committed_height: Optional[int] = None
+    block_height: Optional[int] = None
+    processed: Set[str] = field(default_factory=set)
+
+
+class CheckpointStore(abc.ABC):
+    """
+    Durable progress of a transaction stream: height of the last fully processed (committed) block
+    and hashes of already processed transactions of the block in progress.
+    """
+
+    @abc.abstractmethod
+    def load(self, key: str) -> Optional[Checkpoint]: ...
+
+    @abc.abstractmethod
+    def mark_processed(self, key: str, block_height: int, transaction_hashes: Iterable[str]) -> None: ...
+
+    @abc.abstractmethod
+    def commit(self, key: str, block_height: int) -> None: ...
+
+
+class FileCheckpointStore(CheckpointStore):
+    """
+    One JSON-lines file per key in `directory`. Processed transactions are appended,
+    the file is replaced atomically on commit. Every write is fsynced, so it survives a power loss too.
+    """
+
+    def __init__(self, directory: Union[str, Path]) -> None:
+        self._directory = Path(directory)
+        self._checkpoints: Dict[str, Checkpoint] = dict()
+        self._lock = Lock()
+
+    def load(self, key: str) -> Optional[Checkpoint]:
+        with self._lock:
+            checkpoint = self._load(key)
+            if checkpoint == Checkpoint():
+                return None
+
+            return Checkpoint(checkpoint.committed_height, checkpoint.block_height, set(checkpoint.processed))
+
+    def mark_processed(self, key: str, block_height: int, transaction_hashes: Iterable[str]) -> None:
+        with self._lock:
+            checkpoint = self._load(key)
+            record = dict(block_height=block_height, processed=list(transaction_hashes))
+            self._apply(checkpoint, record)
+            self._directory.mkdir(parents=True, exist_ok=True)
+            with self._path(key).open("a") as file:
+                file.write(json.dumps(record) + "\n")
+                self._sync(file)
+
+    def commit(self, key: str, block_height: int) -> None:
+        with self._lock:
+            checkpoint = self._load(key)
+            record = dict(committed_height=block_height)
+            self._apply(checkpoint, record)
+            self._directory.mkdir(parents=True, exist_ok=True)
+            path = self._path(key)
+            temporary_path = path.with_suffix(".tmp")
+            with temporary_path.open("w") as file:
+                file.write(json.dumps(record) + "\n")
+                self._sync(file)
+
+            os.replace(temporary_path, path)
+            self._sync_directory()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return dict(directory=self._directory)
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self._directory = state["directory"]
+        self._checkpoints = dict()
+        self._lock = Lock()
+
+    def _path(self, key: str) -> Path:
+        return self._directory / (re.sub(r"[^\w.-]", "_", key) + ".json")
+
+    def _load(self, key: str) -> Checkpoint:
+        if key not in self._checkpoints:
+            checkpoint = Checkpoint()
+            path = self._path(key)
+            if path.exists():
+                for line in path.read_text().splitlines():
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # torn append of a crashed process, its transactions are processed again
+                        break
+
+                    self._apply(checkpoint, record)
+
+            self._checkpoints[key] = checkpoint
+
+        return self._checkpoints[key]
+
+    @staticmethod
+    def _sync(file: IO[str]) -> None:
+        file.flush()
+        os.fsync(file.fileno())
+
+    def _sync_directory(self) -> None:
+        # makes the replace itself durable, directories cannot be opened on Windows
+        if os.name == "nt":
+            return
+
+        descriptor = os.open(self._directory, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+    @staticmethod
+    def _apply(checkpoint: Checkpoint, record: Dict[str, Any]) -> None:
+        if "committed_height" in record:
+            checkpoint.committed_height = record["committed_height"]
+            checkpoint.block_height = None
+            checkpoint.processed = set()
+
+        if record.get("block_height") is not None:
+            if checkpoint.block_height != record["block_height"]:
+                checkpoint.block_height = record["block_height"]
+                checkpoint.processed = set()
+
+            checkpoint.processed.update(record["processed"])
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    def __init__(self, path: Union[str, Path]) -> None:
+        self._path = str(path)
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = Lock()
+
+    def load(self, key: str) -> Optional[Checkpoint]:
+        with self._lock:
+            connection = self._connect()
+            committed = connection.execute("SELECT height FROM committed WHERE key = ?", (key,)).fetchone()
+            processed = connection.execute(
+                "SELECT block_height, transaction_hash FROM processed WHERE key = ?", (key,)
+            ).fetchall()
+
+        if committed is None and not processed:
+            return None
+
+        return Checkpoint(
+            committed_height=committed[0] if committed else None,
+            block_height=processed[0][0] if processed else None,
+            processed={transaction_hash for _, transaction_hash in processed},
+        )
+
+    def mark_processed(self, key: str, block_height: int, transaction_hashes: Iterable[str]) -> None:
+        with self._lock, self._connect() as connection:
+            connection.execute("DELETE FROM processed WHERE key = ? AND block_height != ?", (key, block_height))
+            connection.executemany(
+                "INSERT OR IGNORE INTO processed (key, block_height, transaction_hash) VALUES (?, ?, ?)",
+                [(key, block_height, transaction_hash) for transaction_hash in transaction_hashes],
+            )
+
+    def commit(self, key: str, block_height: int) -> None:
+        with self._lock, self._connect() as connection:
+            connection.execute("INSERT OR REPLACE INTO committed (key, height) VALUES (?, ?)", (key, block_height))
+            connection.execute("DELETE FROM processed WHERE key = ?", (key,))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection:
+                self._connection.close()
+                self._connection = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return dict(path=self._path)
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self._path = state["path"]
+        self._connection = None
+        self._lock = Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self._path, check_same_thread=False)
+            with self._connection:
+                self._connection.execute("CREATE TABLE IF NOT EXISTS committed (key TEXT PRIMARY KEY, height INTEGER)")
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS processed ("
+                    "key TEXT, block_height INTEGER, transaction_hash TEXT, "
+                    "PRIMARY KEY (key, transaction_hash))"
+                )
+
+        return self._connection
+
+
+class CheckpointTracker:  # pylint: disable=too-many-instance-attributes
+    """
+    Resumes a transaction stream from a checkpoint and records its progress with at-least-once semantics.
+    Processed transactions are written in batches of `flush_every` or after `flush_interval_seconds`,
+    a crash processes at most the unwritten batch again.
+    """
+
+    def __init__(
+        self,
+        store: CheckpointStore,
+        key: str,
+        flush_every: int = DEFAULT_FLUSH_EVERY,
+        flush_interval_seconds: float = DEFAULT_FLUSH_INTERVAL_SECONDS,
+        clock: Callable[[], float] = monotonic,
+    ) -> None:
+        self._store = store
+        self._key = key
+        self._checkpoint = store.load(key) or Checkpoint()
+        self._flush_every = flush_every
+        self._flush_interval_seconds = flush_interval_seconds
+        self._clock = clock
+        self._unflushed_height: Optional[int] = None
+        self._unflushed: List[str] = []
+        self._flushed_at = clock()
+
+    def resume_from(self, start_block_hash_or_height: Union[int, str]) -> Union[int, str]:
+        if self._checkpoint.block_height is not None:
+            return self._checkpoint.block_height
+
+        if self._checkpoint.committed_height is not None:
+            return self._checkpoint.committed_height
+
+        return start_block_hash_or_height
+
+    def is_committed(self, block_height: int) -> bool:
+        committed_height = self._checkpoint.committed_height
+        return committed_height is not None and block_height <= committed_height
+
+    def pending(self, block_height: int, transaction_hashes: List[str]) -> List[str]:
+        if self.is_committed(block_height):
+            return []
+
+        if block_height == self._checkpoint.block_height:
+            processed = self._checkpoint.processed
+            return [transaction_hash for transaction_hash in transaction_hashes if transaction_hash not in processed]
+
+        return transaction_hashes
+
+    def processed(self, block_height: int, transaction_hash: str) -> None:
+        if block_height != self._unflushed_height:
+            self.flush()
+            self._unflushed_height = block_height
+
+        self._unflushed.append(transaction_hash)
+        if (
+            len(self._unflushed) >= self._flush_every
+            or self._clock() - self._flushed_at >= self._flush_interval_seconds
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        if self._unflushed_height is not None and self._unflushed:
+            self._store.mark_processed(self._key, self._unflushed_height, self._unflushed)
+            self._unflushed = []
+
+        self._flushed_at = self._clock()
+
+    def committed(self, block_height: int) -> None:
+        if self.is_committed(block_height):
+            return
+
+        # commit supersedes processed transactions of the block
+        self._unflushed = []
+        self._store.commit(self._key, block_height)
+        self._checkpoint = Checkpoint(committed_height=block_height)
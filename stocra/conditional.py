@@ -0,0 +1,41 @@
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    value: Any
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        headers = dict()
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        return headers
+
+
+class ConditionalCache:
+    """Validators and parsed values of responses of mutable endpoints for conditional requests."""
+
+    def __init__(self) -> None:
+        self._responses: Dict[Tuple[str, str], CachedResponse] = dict()
+        self._lock = Lock()
+
+    def get(self, blockchain: str, endpoint: str) -> Optional[CachedResponse]:
+        with self._lock:
+            return self._responses.get((blockchain, endpoint))
+
+    def store(self, blockchain: str, endpoint: str, response_headers: Mapping[str, str], value: Any) -> None:
+        etag = response_headers.get("ETag")
+        last_modified = response_headers.get("Last-Modified")
+        with self._lock:
+            if etag or last_modified:
+                self._responses[(blockchain, endpoint)] = CachedResponse(value, etag, last_modified)
+            else:
+                self._responses.pop((blockchain, endpoint), None)
@@ -0,0 +1,90 @@
+import socket
+from dataclasses import dataclass, replace
+from fnmatch import fnmatchcase
+from threading import Lock
+from time import monotonic
+from typing import Dict, Iterable, List, Tuple
+from urllib.parse import urlsplit
+
+from stocra.defaults import DEFAULT_DNS_CACHE_SECONDS
+
+
+@dataclass
+class PoolStats:
+    host: str
+    size: int
+    in_use: int = 0
+    peak_in_use: int = 0
+    requests: int = 0
+    warmed_up: int = 0
+
+    @property
+    def utilisation(self) -> float:
+        return self.in_use / self.size
+
+
+class PoolTracker:
+    def __init__(self, pool_size: int) -> None:
+        self._pool_size = pool_size
+        self._stats: Dict[str, PoolStats] = dict()
+        self._lock = Lock()
+
+    def acquired(self, url: str) -> None:
+        with self._lock:
+            stats = self._get(url)
+            stats.in_use += 1
+            stats.requests += 1
+            stats.peak_in_use = max(stats.peak_in_use, stats.in_use)
+
+    def released(self, url: str) -> None:
+        with self._lock:
+            self._get(url).in_use -= 1
+
+    def warmed_up(self, url: str, connections: int) -> None:
+        with self._lock:
+            self._get(url).warmed_up += connections
+
+    def stats(self) -> Dict[str, PoolStats]:
+        with self._lock:
+            return {host: replace(stats) for host, stats in self._stats.items()}
+
+    def _get(self, url: str) -> PoolStats:
+        host = urlsplit(url).netloc
+        if host not in self._stats:
+            self._stats[host] = PoolStats(host=host, size=self._pool_size)
+
+        return self._stats[host]
+
+
+class DNSCache:
+    """Addresses of the endpoint hosts, resolved at most once per ``ttl`` seconds."""
+
+    def __init__(self, hosts: Iterable[str], ttl: float = DEFAULT_DNS_CACHE_SECONDS) -> None:
+        self._hosts: List[str] = [host.lower() for host in hosts]
+        self._ttl = ttl
+        self._addresses: Dict[Tuple[str, int], Tuple[float, List[str]]] = dict()
+        self._lock = Lock()
+
+    def resolve(self, host: str, port: int) -> List[str]:
+        if self._ttl <= 0 or not any(fnmatchcase(host.lower(), pattern) for pattern in self._hosts):
+            return []
+
+        now = monotonic()
+        with self._lock:
+            cached = self._addresses.get((host, port))
+        if cached and cached[0] > now:
+            return cached[1]
+
+        try:
+            results = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except OSError:
+            return []
+
+        addresses = list(dict.fromkeys(str(result[4][0]) for result in results))
+        with self._lock:
+            self._addresses[(host, port)] = (now + self._ttl, addresses)
+        return addresses
+
+    def forget(self, host: str, port: int) -> None:
+        with self._lock:
+            self._addresses.pop((host, port), None)
@@ -0,0 +1,39 @@
+from time import monotonic
+from typing import Callable, Optional
+
+DEFAULT_REQUEST_TIMEOUT = 30.0
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class Deadline:
+    def __init__(self, expires_at: float, clock: Callable[[], float] = monotonic) -> None:
+        self.expires_at = expires_at
+        self._clock = clock
+
+    @classmethod
+    def after(cls, seconds: Optional[float]) -> Optional["Deadline"]:
+        if seconds is None:
+            return None
+
+        return cls(monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(self.expires_at - self._clock(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, endpoint: str) -> None:
+        if self.expired:
+            raise DeadlineExceeded(f"Deadline exceeded while requesting {endpoint}")
+
+    def request_timeout(self, endpoint: str, request_timeout: Optional[float]) -> float:
+        self.check(endpoint)
+        if request_timeout is None:
+            return self.remaining()
+
+        return min(self.remaining(), request_timeout)
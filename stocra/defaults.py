@@ -0,0 +1,9 @@
+# Defaults of the client parameters, kept apart from the features they configure
+# so that importing the clients does not import the features
+DEFAULT_BASE_URL = "https://{blockchain}.stocra.com/v1.0"
+DEFAULT_POOL_SIZE = 10
+DEFAULT_KEEPALIVE_SECONDS = 30.0
+DEFAULT_DNS_CACHE_SECONDS = 300
+DEFAULT_REORG_DEPTH = 6
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_PENDING_TRANSACTIONS = 100
@@ -0,0 +1,105 @@
+from dataclasses import dataclass, replace
+from threading import Lock
+from time import monotonic
+from typing import Callable, List, Optional, Tuple
+
+
+@dataclass
+class EndpointStats:  # pylint: disable=too-many-instance-attributes
+    url: str
+    latency_seconds: Optional[float] = None
+    error_rate: float = 0.0
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    in_flight: int = 0
+    ejected_until: float = 0.0
+
+    def is_ejected(self, now: float) -> bool:
+        return self.ejected_until > now
+
+    @property
+    def score(self) -> Tuple[bool, float]:
+        # Endpoints without any measurement yet are tried first so that every mirror gets a latency sample.
+        # Endpoint which failed on its last request goes after all others which did not.
+        latency = self.latency_seconds or 0.0
+        return self.consecutive_failures > 0, latency * (self.in_flight + 1) / max(1.0 - self.error_rate, 0.05)
+
+
+class EndpointPool:
+    """
+    Set of interchangeable base URLs serving one blockchain.
+
+    Endpoints are ordered by observed latency, error rate and number of requests in flight.
+    An endpoint that fails `ejection_threshold` times in a row is ejected for `ejection_seconds`.
+    Ejected endpoints are still used as a last resort when every endpoint is ejected.
+    """
+
+    def __init__(
+        self,
+        base_urls: List[str],
+        ejection_threshold: int = 3,
+        ejection_seconds: float = 30,
+        smoothing: float = 0.2,
+        clock: Callable[[], float] = monotonic,
+    ) -> None:
+        if not base_urls:
+            raise ValueError("At least one base url must be specified")
+
+        self._endpoints = [EndpointStats(url=base_url.rstrip("/")) for base_url in base_urls]
+        self._ejection_threshold = ejection_threshold
+        self._ejection_seconds = ejection_seconds
+        self._smoothing = smoothing
+        self._clock = clock
+        self._lock = Lock()
+
+    def candidates(self) -> List[EndpointStats]:
+        with self._lock:
+            now = self._clock()
+            healthy = [endpoint for endpoint in self._endpoints if not endpoint.is_ejected(now)]
+            ejected = [endpoint for endpoint in self._endpoints if endpoint.is_ejected(now)]
+            healthy.sort(key=lambda endpoint: endpoint.score)
+            ejected.sort(key=lambda endpoint: endpoint.ejected_until)
+            return healthy + ejected
+
+    def started(self, endpoint: EndpointStats) -> float:
+        with self._lock:
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+            return self._clock()
+
+    def succeeded(self, endpoint: EndpointStats, started_at: float) -> None:
+        with self._lock:
+            latency = self._clock() - started_at
+            endpoint.in_flight -= 1
+            endpoint.consecutive_failures = 0
+            endpoint.ejected_until = 0.0
+            endpoint.error_rate = self._smooth(endpoint.error_rate, 0.0)
+            endpoint.latency_seconds = (
+                latency if endpoint.latency_seconds is None else self._smooth(endpoint.latency_seconds, latency)
+            )
+
+    def failed(self, endpoint: EndpointStats) -> None:
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            endpoint.error_rate = self._smooth(endpoint.error_rate, 1.0)
+            if endpoint.consecutive_failures >= self._ejection_threshold:
+                endpoint.ejected_until = self._clock() + self._ejection_seconds
+
+    def abandoned(self, endpoint: EndpointStats) -> None:
+        # request cancelled or interrupted before its outcome was known, says nothing about the endpoint
+        with self._lock:
+            endpoint.in_flight -= 1
+
+    def stats(self) -> List[EndpointStats]:
+        with self._lock:
+            return [replace(endpoint) for endpoint in self._endpoints]
+
+    def _smooth(self, average: float, sample: float) -> float:
+        return (1 - self._smoothing) * average + self._smoothing * sample
+
+
+def is_failover_status(status: int) -> bool:
+    return status == 429 or status >= 500
@@ -0,0 +1,147 @@
+from collections import deque
+from enum import Enum
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+DEFAULT_BUFFER_SIZE = 1_000
+T = TypeVar("T")
+SubscriptionT = TypeVar("SubscriptionT")
+PipelineT = TypeVar("PipelineT")
+
+
+class SlowConsumerPolicy(Enum):
+    # wait until the subscriber makes room, stalls the pipeline and so all the other subscribers
+    BLOCK = "block"
+    # drop the oldest buffered item to make room for the new one
+    DROP_OLDEST = "drop_oldest"
+    # stop delivering to the subscriber, it gets SubscriberDetached once it drains its buffer
+    DETACH = "detach"
+
+
+class SubscriberDetached(Exception):
+    pass
+
+
+class SubscriptionBuffer(Generic[T]):
+    """Bounded buffer of a subscriber applying its slow consumer policy, waiting is left to the hubs."""
+
+    def __init__(self, size: int, policy: SlowConsumerPolicy) -> None:
+        if size < 1:
+            raise ValueError(f"`buffer_size` must be greater than 0. Got `{size}`")
+
+        self.size = size
+        self.policy = policy
+        self.dropped = 0
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self._items: Deque[T] = deque()
+
+    def readable(self) -> bool:
+        return bool(self._items) or self.finished
+
+    def writable(self) -> bool:
+        # only a blocking subscriber makes the pipeline wait for room
+        return self.finished or self.policy is not SlowConsumerPolicy.BLOCK or len(self._items) < self.size
+
+    def get(self, end: Type[Exception]) -> T:
+        # called once readable, the error of the stream is raised after the last item
+        if self._items:
+            return self._items.popleft()
+
+        if self.error:
+            raise self.error
+
+        raise end()
+
+    def put(self, item: T) -> bool:
+        # called once writable, returns False when the subscriber takes no more items
+        if self.finished:
+            return False
+
+        if len(self._items) >= self.size:
+            if self.policy is SlowConsumerPolicy.DETACH:
+                self.finish(SubscriberDetached(f"Buffer of {self.size} items is full"))
+                return False
+
+            self._items.popleft()
+            self.dropped += 1
+
+        self._items.append(item)
+        return True
+
+    def finish(self, error: Optional[BaseException]) -> None:
+        self.finished = True
+        self.error = self.error or error
+
+
+class SubscriptionBase(Generic[T]):
+    def __init__(self, buffer_size: int, policy: SlowConsumerPolicy, on_close: Callable[[Any], None]) -> None:
+        self._buffer: SubscriptionBuffer[T] = SubscriptionBuffer(buffer_size, policy)
+        self._on_close = on_close
+
+    @property
+    def dropped(self) -> int:
+        return self._buffer.dropped
+
+
+class HubState(Generic[SubscriptionT, PipelineT]):
+    """Subscriptions and the pipeline of every blockchain, locking and running the pipelines is left to the hubs."""
+
+    def __init__(self) -> None:
+        self.closed = False
+        self._subscriptions: Dict[str, List[SubscriptionT]] = dict()
+        self._pipelines: Dict[str, PipelineT] = dict()
+
+    def subscribe(self, blockchain: str, subscription: SubscriptionT) -> bool:
+        # returns whether the blockchain needs a new pipeline
+        if self.closed:
+            raise ValueError("Hub is closed")
+
+        self._subscriptions.setdefault(blockchain, []).append(subscription)
+        return blockchain not in self._pipelines
+
+    def unsubscribe(self, blockchain: str, subscription: SubscriptionT) -> Optional[PipelineT]:
+        # returns the pipeline to stop once its last subscriber left, next subscriber starts a new one
+        subscriptions = self._subscriptions.get(blockchain, [])
+        if subscription in subscriptions:
+            subscriptions.remove(subscription)
+
+        if subscriptions:
+            return None
+
+        self._subscriptions.pop(blockchain, None)
+        return self._pipelines.pop(blockchain, None)
+
+    def started(self, blockchain: str, pipeline: PipelineT) -> None:
+        self._pipelines[blockchain] = pipeline
+
+    def is_current(self, blockchain: str, pipeline: Optional[PipelineT]) -> bool:
+        return not self.closed and self._pipelines.get(blockchain) is pipeline
+
+    def subscriptions(self, blockchain: str) -> List[SubscriptionT]:
+        return list(self._subscriptions.get(blockchain, []))
+
+    def stopped(self, blockchain: str, pipeline: Optional[PipelineT]) -> List[SubscriptionT]:
+        # returns the subscriptions to finish, stopped pipeline must not finish those of the one which replaced it
+        if self._pipelines.get(blockchain) is not pipeline:
+            return []
+
+        self._pipelines.pop(blockchain)
+        return self._subscriptions.pop(blockchain, [])
+
+    def close(self) -> Tuple[List[SubscriptionT], List[PipelineT]]:
+        # returns the subscriptions to finish and the pipelines to stop
+        self.closed = True
+        subscriptions = [subscription for values in self._subscriptions.values() for subscription in values]
+        self._subscriptions.clear()
+        return subscriptions, list(self._pipelines.values())
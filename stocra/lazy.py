@@ -0,0 +1,108 @@
+import json
+from typing import Any, ClassVar, Dict, Generic, List, Type, TypeVar, Union, cast
+
+from pydantic import BaseModel, ValidationError
+from pydantic.error_wrappers import ErrorWrapper
+from pydantic.errors import MissingError
+
+from stocra.models import Amount, Block, Input, Output, Transaction, TransactionHash
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+LazyT = TypeVar("LazyT", bound="LazyModel")
+
+
+class LazyModel(Generic[ModelT]):
+    """
+    Decoded response wrapped without validation. Every field is validated the same way as by `model`
+    on its first access and cached, `to_model` validates the whole response.
+    """
+
+    model: ClassVar[Type[BaseModel]]
+    __slots__ = ("_data", "_fields")
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        self._data = data
+        self._fields: Dict[str, Any] = dict()
+
+    @classmethod
+    def parse_obj(cls: Type[LazyT], data: Dict[str, Any]) -> LazyT:
+        return cls(data)
+
+    @classmethod
+    def parse_raw(cls: Type[LazyT], body: Union[str, bytes]) -> LazyT:
+        return cls(json.loads(body))
+
+    def to_model(self) -> ModelT:
+        return cast(ModelT, self.model.parse_obj(self._data))
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, LazyModel):
+            return self.model is other.model and self._data == other._data
+
+        if isinstance(other, BaseModel):
+            return self.to_model() == other
+
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self._data!r})"
+
+    def _field(self, name: str) -> Any:
+        if name in self._fields:
+            return self._fields[name]
+
+        field = self.model.__fields__[name]
+        if name not in self._data:
+            if field.required:
+                raise ValidationError([ErrorWrapper(MissingError(), loc=name)], self.model)
+
+            value = field.get_default()
+        else:
+            value, errors = field.validate(self._data[name], dict(), loc=name, cls=self.model)
+            if errors:
+                raise ValidationError([errors], self.model)
+
+        self._fields[name] = value
+        return value
+
+
+class LazyTransaction(LazyModel[Transaction]):
+    model = Transaction
+    __slots__ = ()
+
+    @property
+    def hash(self) -> TransactionHash:
+        return cast(TransactionHash, self._field("hash"))
+
+    @property
+    def inputs(self) -> List[Input]:
+        return cast(List[Input], self._field("inputs"))
+
+    @property
+    def outputs(self) -> List[Output]:
+        return cast(List[Output], self._field("outputs"))
+
+    @property
+    def fee(self) -> Amount:
+        return cast(Amount, self._field("fee"))
+
+
+class LazyBlock(LazyModel[Block]):
+    model = Block
+    __slots__ = ()
+
+    @property
+    def height(self) -> int:
+        return cast(int, self._field("height"))
+
+    @property
+    def hash(self) -> str:
+        return cast(str, self._field("hash"))
+
+    @property
+    def timestamp_ms(self) -> int:
+        return cast(int, self._field("timestamp_ms"))
+
+    @property
+    def transactions(self) -> List[str]:
+        return cast(List[str], self._field("transactions"))
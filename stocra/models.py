@@ -1,10 +1,17 @@
 from dataclasses import dataclass
 from decimal import Decimal
-from enum import Enum, unique
-from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Union
 
 from pydantic import BaseModel, root_validator, validator
 
+from stocra.deadline import Deadline
+
+if TYPE_CHECKING:
+    from stocra.ancestry import AncestryEdge
+    from stocra.raw import RawBlock, RawTransaction
+    from stocra.tokens import Currency, Token, TokenType
+
 Address = str
 TransactionHash = str
 OutputIndex = int
@@ -93,30 +100,29 @@ class Block(BaseModel):
         return value
 
 
-class Currency(BaseModel):
-    symbol: str
-    name: str
-
-    class Config:
-        frozen = True
-
-
-@unique
-class TokenType(Enum):
-    ERC20 = "ERC20"
-
-
-class Token(BaseModel):
-    currency: Currency
-    scaling: Decimal
-    type: TokenType
-
-
 @dataclass(frozen=True)
 class StocraHTTPError:
     endpoint: str
     iteration: int
     exception: Exception
+    deadline: Optional[Deadline] = None
 
 
 ErrorHandler = Callable[[StocraHTTPError], Union[bool, Awaitable[bool]]]
+
+# models needed only by some features are built on first access
+LAZY_MODELS = {
+    "AncestryEdge": "stocra.ancestry",
+    "Currency": "stocra.tokens",
+    "RawBlock": "stocra.raw",
+    "RawTransaction": "stocra.raw",
+    "Token": "stocra.tokens",
+    "TokenType": "stocra.tokens",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in LAZY_MODELS:
+        return getattr(import_module(LAZY_MODELS[name]), name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from threading import Lock
+from time import monotonic, time
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Union
+
+from stocra.models import Block
+from stocra.raw import RawBlock
+
+if TYPE_CHECKING:
+    from stocra.checkpoint import CheckpointTracker
+
+
+@dataclass(frozen=True)
+class BlockStats:
+    height: int
+    hash: str
+    # wall-clock time of delivery minus block timestamp
+    lag_seconds: float
+    # time between the block was fetched and delivered to the consumer
+    tip_to_delivery_seconds: Optional[float]
+    # time spent fetching transactions of the block, None for block streams
+    transactions_fetch_seconds: Optional[float]
+    # prefetched blocks ready to be delivered and the size of the prefetch window
+    prefetched: Optional[int]
+    prefetch_window: Optional[int]
+
+
+@dataclass(frozen=True)
+class StreamSnapshot:  # pylint: disable=too-many-instance-attributes
+    blocks: int
+    last: Optional[BlockStats]
+    average_lag_seconds: Optional[float]
+    max_lag_seconds: Optional[float]
+    average_tip_to_delivery_seconds: Optional[float]
+    average_transactions_fetch_seconds: Optional[float]
+    average_prefetch_occupancy: Optional[float]
+    lagging: bool
+
+
+class StreamMonitor:  # pylint: disable=too-many-instance-attributes
+    """
+    Instrumentation of one block or transaction stream, passed to the streaming methods as `monitor`.
+
+    Averages are exponentially weighted with `smoothing`. `on_block` is called for every delivered block,
+    `on_lag` when lag rises above `lag_threshold_seconds` and `on_recovered` when it falls back below it,
+    e.g. to raise an alert or to adjust the number of blocks loaded ahead.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        lag_threshold_seconds: Optional[float] = None,
+        *,
+        on_block: Optional[Callable[[BlockStats], None]] = None,
+        on_lag: Optional[Callable[[BlockStats], None]] = None,
+        on_recovered: Optional[Callable[[BlockStats], None]] = None,
+        smoothing: float = 0.2,
+        clock: Callable[[], float] = time,
+        monotonic_clock: Callable[[], float] = monotonic,
+    ) -> None:
+        self._lag_threshold_seconds = lag_threshold_seconds
+        self._on_block = on_block
+        self._on_lag = on_lag
+        self._on_recovered = on_recovered
+        self._smoothing = smoothing
+        self._clock = clock
+        self._monotonic_clock = monotonic_clock
+        self._fetched_at: Dict[int, float] = dict()
+        self._prefetched: Optional[int] = None
+        self._prefetch_window: Optional[int] = None
+        self._blocks = 0
+        self._last: Optional[BlockStats] = None
+        self._averages: Dict[str, float] = dict()
+        self._max_lag_seconds: Optional[float] = None
+        self._lagging = False
+        self._lock = Lock()
+
+    def snapshot(self) -> StreamSnapshot:
+        with self._lock:
+            return StreamSnapshot(
+                blocks=self._blocks,
+                last=self._last,
+                average_lag_seconds=self._averages.get("lag"),
+                max_lag_seconds=self._max_lag_seconds,
+                average_tip_to_delivery_seconds=self._averages.get("tip_to_delivery"),
+                average_transactions_fetch_seconds=self._averages.get("transactions_fetch"),
+                average_prefetch_occupancy=self._averages.get("prefetch_occupancy"),
+                lagging=self._lagging,
+            )
+
+    def block_fetched(self, height: int) -> None:
+        with self._lock:
+            self._fetched_at.setdefault(height, self._monotonic_clock())
+
+    def prefetch_occupancy(self, prefetched: int, prefetch_window: int) -> None:
+        with self._lock:
+            self._prefetched = prefetched
+            self._prefetch_window = prefetch_window
+
+    def block_delivered(
+        self, block: Union[Block, RawBlock], transactions_fetch_seconds: Optional[float] = None
+    ) -> BlockStats:
+        callbacks: List[Callable[[BlockStats], None]] = []
+        with self._lock:
+            fetched_at = self._fetched_at.pop(block.height, None)
+            for height in [height for height in self._fetched_at if height < block.height]:
+                del self._fetched_at[height]
+
+            stats = BlockStats(
+                height=block.height,
+                hash=block.hash,
+                lag_seconds=self._clock() - block.timestamp_ms / 1_000,
+                tip_to_delivery_seconds=None if fetched_at is None else self._monotonic_clock() - fetched_at,
+                transactions_fetch_seconds=transactions_fetch_seconds,
+                prefetched=self._prefetched,
+                prefetch_window=self._prefetch_window,
+            )
+            self._record(stats)
+
+            if self._on_block:
+                callbacks.append(self._on_block)
+
+            if self._lag_threshold_seconds is not None:
+                lagging = stats.lag_seconds > self._lag_threshold_seconds
+                if lagging != self._lagging:
+                    self._lagging = lagging
+                    callback = self._on_lag if lagging else self._on_recovered
+                    if callback:
+                        callbacks.append(callback)
+
+        # callbacks run outside of the lock so that they can read the snapshot
+        for callback in callbacks:
+            callback(stats)
+
+        return stats
+
+    def _record(self, stats: BlockStats) -> None:
+        self._blocks += 1
+        self._last = stats
+        self._max_lag_seconds = max(stats.lag_seconds, self._max_lag_seconds or stats.lag_seconds)
+        self._average("lag", stats.lag_seconds)
+        self._average("tip_to_delivery", stats.tip_to_delivery_seconds)
+        self._average("transactions_fetch", stats.transactions_fetch_seconds)
+        if stats.prefetched is not None and stats.prefetch_window:
+            self._average("prefetch_occupancy", stats.prefetched / stats.prefetch_window)
+
+    def _average(self, name: str, value: Optional[float]) -> None:
+        if value is None:
+            return
+
+        average = self._averages.get(name)
+        self._averages[name] = value if average is None else (1 - self._smoothing) * average + self._smoothing * value
+
+
+class BlockDelivery:
+    """
+    Delivery of the transactions of one block by a transaction stream, recorded by its checkpoint and monitor.
+    """
+
+    def __init__(
+        self,
+        block: Union[Block, RawBlock],
+        checkpoint: Optional[CheckpointTracker],
+        monitor: Optional[StreamMonitor],
+    ) -> None:
+        self.block = block
+        self._checkpoint = checkpoint
+        self._monitor = monitor
+        self._started_at = monotonic()
+        self._consumer_seconds = 0.0
+
+    def pending(self) -> List[str]:
+        if self._checkpoint:
+            return self._checkpoint.pending(self.block.height, self.block.transactions)
+
+        return self.block.transactions
+
+    @contextmanager
+    def consumed(self, transaction_hash: str) -> Iterator[None]:
+        # wraps the yield of a transaction, time spent by the consumer is not counted as fetching
+        yielded_at = monotonic()
+        yield
+        self._consumer_seconds += monotonic() - yielded_at
+        # consumer asked for the next item, the previous one is considered processed
+        if self._checkpoint:
+            self._checkpoint.processed(self.block.height, transaction_hash)
+
+    def finished(self) -> None:
+        if self._monitor:
+            self._monitor.block_delivered(
+                self.block, transactions_fetch_seconds=monotonic() - self._started_at - self._consumer_seconds
+            )
+
+        if self._checkpoint:
+            self._checkpoint.committed(self.block.height)
@@ -0,0 +1,145 @@
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from enum import Enum
+from random import random
+from threading import Lock
+from time import perf_counter
+from typing import (
+    AsyncIterable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+
+class Phase(Enum):
+    # waiting for the rate limiter
+    RATE_LIMIT = "rate_limit"
+    # sending the request and receiving the response
+    NETWORK = "network"
+    # decoding JSON of the response
+    DECODE = "decode"
+    # constructing models from the decoded response
+    VALIDATION = "validation"
+    # error handlers deciding about and waiting before a retry
+    RETRY = "retry"
+    # consumer code between two items of a stream
+    CONSUMER = "consumer"
+
+
+@dataclass(frozen=True)
+class PhaseStats:
+    phase: Phase
+    calls: int
+    total_seconds: float
+    max_seconds: float
+    # number of calls with sampled allocations and net size of memory they allocated
+    allocation_samples: int
+    allocated_bytes: int
+
+    @property
+    def average_seconds(self) -> float:
+        return self.total_seconds / self.calls if self.calls else 0.0
+
+    @property
+    def average_allocated_bytes(self) -> Optional[float]:
+        return self.allocated_bytes / self.allocation_samples if self.allocation_samples else None
+
+
+class Profiler:
+    """
+    Wall time spent in each phase of requests and streams, passed to the clients as `profiler`.
+
+    With `trace_allocations` a `allocation_sample_rate` fraction of calls also measures memory allocated
+    during the call with tracemalloc. Concurrent requests overlap, so their phases add up to more than
+    the wall time of the whole run and sampled allocations include allocations of the other requests.
+    """
+
+    def __init__(
+        self,
+        trace_allocations: bool = False,
+        allocation_sample_rate: float = 0.01,
+        clock: Callable[[], float] = perf_counter,
+    ) -> None:
+        self._allocation_sample_rate = allocation_sample_rate if trace_allocations else 0.0
+        self._clock = clock
+        self._stats: Dict[Phase, PhaseStats] = dict()
+        self._lock = Lock()
+        self._started_tracing = trace_allocations and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+
+    def close(self) -> None:
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def measure(self, phase: Phase) -> Iterator[None]:
+        sample_allocations = tracemalloc.is_tracing() and random() < self._allocation_sample_rate
+        allocated_before = tracemalloc.get_traced_memory()[0] if sample_allocations else 0
+        started_at = self._clock()
+        try:
+            yield
+        finally:
+            elapsed = self._clock() - started_at
+            allocated = tracemalloc.get_traced_memory()[0] - allocated_before if sample_allocations else None
+            self.record(phase, elapsed, allocated)
+
+    def record(self, phase: Phase, seconds: float, allocated_bytes: Optional[int] = None) -> None:
+        with self._lock:
+            stats = self._stats.get(phase) or PhaseStats(phase, 0, 0.0, 0.0, 0, 0)
+            self._stats[phase] = PhaseStats(
+                phase=phase,
+                calls=stats.calls + 1,
+                total_seconds=stats.total_seconds + seconds,
+                max_seconds=max(stats.max_seconds, seconds),
+                allocation_samples=stats.allocation_samples + (allocated_bytes is not None),
+                allocated_bytes=stats.allocated_bytes + (allocated_bytes or 0),
+            )
+
+    def profile_consumer(self, items: Iterable[T]) -> Iterable[T]:
+        for item in items:
+            with self.measure(Phase.CONSUMER):
+                yield item
+
+    async def profile_async_consumer(self, items: AsyncIterable[T]) -> AsyncIterable[T]:
+        async for item in items:
+            with self.measure(Phase.CONSUMER):
+                yield item
+
+    def stats(self) -> List[PhaseStats]:
+        with self._lock:
+            return [self._stats[phase] for phase in Phase if phase in self._stats]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def report(self) -> str:
+        stats = self.stats()
+        total_seconds = sum(phase_stats.total_seconds for phase_stats in stats)
+        lines = [
+            f"{'phase':<12}{'calls':>10}{'total s':>12}{'avg ms':>10}{'max ms':>10}{'share':>8}{'avg alloc B':>14}"
+        ]
+        for phase_stats in stats:
+            share = phase_stats.total_seconds / total_seconds if total_seconds else 0.0
+            allocated = phase_stats.average_allocated_bytes
+            lines.append(
+                f"{phase_stats.phase.value:<12}"
+                f"{phase_stats.calls:>10}"
+                f"{phase_stats.total_seconds:>12.3f}"
+                f"{phase_stats.average_seconds * 1_000:>10.2f}"
+                f"{phase_stats.max_seconds * 1_000:>10.2f}"
+                f"{share:>8.1%}"
+                f"{'-' if allocated is None else f'{allocated:.0f}':>14}"
+            )
+
+        return "\n".join(lines)
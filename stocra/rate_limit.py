@@ -0,0 +1,29 @@
+from threading import Lock
+from time import monotonic
+from typing import Callable
+
+
+class RateLimiter:
+    """
+    Spaces requests evenly to at most `requests_per_second`, allowing bursts of up to `burst` requests.
+    `reserve` books a slot and returns how long the caller has to wait before sending its request.
+    """
+
+    def __init__(self, requests_per_second: float, burst: int = 1, clock: Callable[[], float] = monotonic) -> None:
+        if requests_per_second <= 0:
+            raise ValueError(f"`requests_per_second` must be greater than 0. Got `{requests_per_second}`")
+
+        self.requests_per_second = requests_per_second
+        self._interval = 1 / requests_per_second
+        self._burst = max(burst, 1)
+        self._clock = clock
+        self._next_slot = 0.0
+        self._lock = Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = self._clock()
+            self._next_slot = max(self._next_slot, now - (self._burst - 1) * self._interval)
+            delay = max(self._next_slot - now, 0.0)
+            self._next_slot += self._interval
+            return delay
@@ -0,0 +1,31 @@
+import json
+from dataclasses import dataclass
+from typing import List
+
+from stocra.models import TransactionHash
+
+
+@dataclass(frozen=True)
+class RawBlock:
+    height: int
+    hash: str
+    timestamp_ms: int
+    transactions: List[TransactionHash]
+    body: bytes
+
+    @classmethod
+    def from_body(cls, body: bytes) -> "RawBlock":
+        block = json.loads(body)
+        return cls(
+            height=block["height"],
+            hash=block["hash"],
+            timestamp_ms=block["timestamp_ms"],
+            transactions=block.get("transactions", []),
+            body=body,
+        )
+
+
+@dataclass(frozen=True)
+class RawTransaction:
+    hash: TransactionHash
+    body: bytes
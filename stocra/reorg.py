@@ -0,0 +1,107 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+from stocra.defaults import DEFAULT_REORG_DEPTH
+
+
+@dataclass(frozen=True)
+class BlockRollback:
+    # lowest orphaned height, the stream continues with the replacing block at this height
+    height: int
+    # orphaned (height, hash) pairs in the order they were delivered
+    blocks: List[Tuple[int, str]]
+
+
+class ReorgTooDeep(Exception):
+    pass
+
+
+class RecentBlocks:
+    """
+    Ring buffer of (height, hash) pairs of the last delivered blocks, enough to roll back a reorg `depth` blocks deep.
+    """
+
+    def __init__(self, depth: int = DEFAULT_REORG_DEPTH) -> None:
+        if depth < 1:
+            raise ValueError(f"`depth` must be greater than 0. Got `{depth}`")
+
+        # one more block is kept as the common ancestor of a reorg exactly `depth` blocks deep
+        self._blocks: Deque[Tuple[int, str]] = deque(maxlen=depth + 1)
+        # whether blocks older than the buffered ones were delivered
+        self._truncated = False
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    def add(self, height: int, block_hash: str) -> None:
+        if len(self._blocks) == self._blocks.maxlen:
+            self._truncated = True
+
+        self._blocks.append((height, block_hash))
+
+    def heights(self) -> List[int]:
+        return [height for height, _ in self._blocks]
+
+    def matches(self, hashes: Dict[int, Optional[str]]) -> bool:
+        return all(hashes[height] == block_hash for height, block_hash in self._blocks if height in hashes)
+
+    def rollback(self, hashes: Dict[int, Optional[str]]) -> Optional[BlockRollback]:
+        # `hashes` are current hashes of all the buffered heights, None for heights no longer on the chain
+        orphaned_at = next(
+            (index for index, (height, block_hash) in enumerate(self._blocks) if hashes[height] != block_hash), None
+        )
+        if orphaned_at is None:
+            return None
+
+        # when the oldest buffered block is the first delivered one, all the delivered blocks are rolled back
+        if orphaned_at == 0 and self._truncated:
+            height, block_hash = self._blocks[0]
+            raise ReorgTooDeep(f"Block {height} {block_hash} was replaced, reorg may be deeper than the buffer")
+
+        orphaned = list(self._blocks)[orphaned_at:]
+        for _ in orphaned:
+            self._blocks.pop()
+
+        return BlockRollback(height=orphaned[0][0], blocks=orphaned)
+
+
+class ReorgTracker:
+    """
+    Position of a reorg-aware stream and the recent blocks to verify while waiting for the next block.
+    """
+
+    def __init__(self, depth: int = DEFAULT_REORG_DEPTH) -> None:
+        self.recent_blocks = RecentBlocks(depth)
+        # known once the first block is delivered
+        self.next_height = 0
+        # every reorg either replaces the tip or extends the chain, so all the recent blocks are verified
+        # only after a new block was delivered and just the tip while waiting for the next block
+        self._verify_all = True
+
+    def delivered(self, height: int, block_hash: str) -> None:
+        self.recent_blocks.add(height, block_hash)
+        self.next_height = height + 1
+        self._verify_all = True
+
+    def heights_to_verify(self) -> List[int]:
+        heights = self.recent_blocks.heights()
+        return heights if self._verify_all else heights[-1:]
+
+    def heights_to_roll_back(self, hashes: Dict[int, Optional[str]]) -> List[int]:
+        # a replaced tip needs the current hashes of all the recent blocks to find the orphaned ones
+        if self.recent_blocks.matches(hashes):
+            return []
+
+        return [height for height in self.recent_blocks.heights() if height not in hashes]
+
+    def verified(self, hashes: Dict[int, Optional[str]]) -> Optional[BlockRollback]:
+        self._verify_all = False
+        if self.recent_blocks.matches(hashes):
+            return None
+
+        rollback = self.recent_blocks.rollback(hashes)
+        if rollback is not None:
+            self.next_height = rollback.height
+
+        return rollback
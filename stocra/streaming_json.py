@@ -0,0 +1,209 @@
+import json
+import re
+from enum import Enum
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from stocra.models import Input, Output, Transaction
+
+STRUCTURAL = re.compile(rb'[{}\[\],:"]')
+STRING_SPECIAL = re.compile(rb'["\\]')
+# run of array items which are strings without escapes, e.g. transaction hashes
+SIMPLE_STRING_ITEMS = re.compile(rb'(?:\s*"[^"\\]*"\s*,)+')
+
+
+class _State(Enum):
+    KEY = "key"
+    COLON = "colon"
+    VALUE = "value"
+    ARRAY = "array"
+
+
+class IncrementalObjectParser:  # pylint: disable=too-many-instance-attributes
+    """
+    Parses a JSON object fed in chunks. Items of the top-level arrays under `streamed_keys` are returned by `feed`
+    as soon as they are complete and never kept, other top-level values are collected in `fields`.
+    Memory is bounded by the largest item and the chunk size, not by the length of the streamed arrays.
+    """
+
+    def __init__(self, streamed_keys: Iterable[str]) -> None:
+        self.fields: Dict[str, Any] = dict()
+        self._streamed_keys = frozenset(streamed_keys)
+        self._buffer = bytearray()
+        self._position = 0
+        self._depth = 0
+        self._state = _State.KEY
+        self._key = ""
+        # start of the current top-level value or array item in the buffer
+        self._value_start: Optional[int] = None
+        self._done = False
+
+    def feed(self, chunk: bytes) -> List[Tuple[str, Any]]:
+        if self._done and chunk.strip():
+            raise ValueError("Data after the end of JSON object")
+
+        self._buffer += chunk
+        items = self._parse()
+        # drop what was already parsed
+        keep = self._position if self._value_start is None else min(self._position, self._value_start)
+        del self._buffer[:keep]
+        self._position -= keep
+        if self._value_start is not None:
+            self._value_start -= keep
+
+        return items
+
+    def close(self) -> Dict[str, Any]:
+        if not self._done:
+            raise ValueError("Incomplete JSON object")
+
+        return self.fields
+
+    def _parse(self) -> List[Tuple[str, Any]]:
+        items: List[Tuple[str, Any]] = []
+        while not self._done:
+            if self._simple_items(items):
+                continue
+
+            match = STRUCTURAL.search(self._buffer, self._position)
+            if match is None:
+                self._position = len(self._buffer)
+                break
+
+            position = match.start()
+            char = bytes(self._buffer[position : position + 1])
+            if char == b'"':
+                if not self._string(position):
+                    # wait for the rest of the string
+                    break
+
+                continue
+
+            self._position = position + 1
+            if char in b"{[":
+                self._open(char, position)
+            elif char in b"}]":
+                self._close(char, position, items)
+            elif char == b",":
+                self._comma(position, items)
+            elif self._depth == 1 and self._state == _State.COLON:
+                self._state = _State.VALUE
+                self._value_start = position + 1
+
+        return items
+
+    def _simple_items(self, items: List[Tuple[str, Any]]) -> bool:
+        if self._state != _State.ARRAY or self._depth != 2 or self._position != self._value_start:
+            return False
+
+        # decode the whole run at once instead of item by item
+        run = SIMPLE_STRING_ITEMS.match(self._buffer, self._position)
+        if run is None:
+            return False
+
+        decoded = json.loads(b"[" + self._buffer[run.start() : run.end() - 1] + b"]")
+        items.extend((self._key, item) for item in decoded)
+        self._position = self._value_start = run.end()
+        return True
+
+    def _string(self, position: int) -> bool:
+        string_end = self._string_end(position + 1)
+        if string_end is None:
+            self._position = position
+            return False
+
+        if self._depth == 1 and self._state == _State.KEY:
+            self._key = json.loads(self._buffer[position : string_end + 1])
+            self._state = _State.COLON
+
+        self._position = string_end + 1
+        return True
+
+    def _string_end(self, position: int) -> Optional[int]:
+        while True:
+            match = STRING_SPECIAL.search(self._buffer, position)
+            if match is None:
+                return None
+
+            if self._buffer[match.start()] == ord('"'):
+                return match.start()
+
+            if match.start() + 1 >= len(self._buffer):
+                return None
+
+            # skip the escaped character
+            position = match.start() + 2
+
+    def _open(self, char: bytes, position: int) -> None:
+        if self._depth == 0:
+            if char != b"{":
+                raise ValueError("Expected JSON object")
+        elif (
+            self._depth == 1
+            and self._state == _State.VALUE
+            and char == b"["
+            and self._key in self._streamed_keys
+            and not self._buffer[self._value_start : position].strip()
+        ):
+            self._state = _State.ARRAY
+            self._value_start = position + 1
+
+        self._depth += 1
+
+    def _close(self, char: bytes, position: int, items: List[Tuple[str, Any]]) -> None:
+        self._depth -= 1
+        if self._depth == 1 and self._state == _State.ARRAY and char == b"]":
+            self._item(position, items)
+            self._state = _State.VALUE
+            self._value_start = None
+        elif self._depth == 0:
+            self._value(position)
+            self._done = True
+
+    def _comma(self, position: int, items: List[Tuple[str, Any]]) -> None:
+        if self._depth == 2 and self._state == _State.ARRAY:
+            self._item(position, items)
+            self._value_start = position + 1
+        elif self._depth == 1:
+            self._value(position)
+            self._state = _State.KEY
+
+    def _item(self, position: int, items: List[Tuple[str, Any]]) -> None:
+        item = self._buffer[self._value_start : position]
+        if item.strip():
+            items.append((self._key, json.loads(item)))
+
+    def _value(self, position: int) -> None:
+        if self._state == _State.VALUE and self._value_start is not None:
+            self.fields[self._key] = json.loads(self._buffer[self._value_start : position])
+
+        self._value_start = None
+
+
+class TransactionParser:
+    """
+    Builds `Transaction` from chunks of its JSON, inputs and outputs are validated one by one as they are parsed.
+    """
+
+    def __init__(self) -> None:
+        self._parser = IncrementalObjectParser(["inputs", "outputs"])
+        self._inputs: List[Input] = []
+        self._outputs: List[Output] = []
+
+    def feed(self, chunk: bytes) -> None:
+        for key, item in self._parser.feed(chunk):
+            if key == "inputs":
+                self._inputs.append(Input.parse_obj(item))
+            else:
+                self._outputs.append(Output.parse_obj(item))
+
+    def close(self) -> Transaction:
+        return Transaction(**self._parser.close(), inputs=self._inputs, outputs=self._outputs)
+
+
+def iter_block_transaction_hashes(chunks: Iterable[bytes]) -> Iterator[str]:
+    parser = IncrementalObjectParser(["transactions"])
+    for chunk in chunks:
+        for _, transaction_hash in parser.feed(chunk):
+            yield transaction_hash
+
+    parser.close()
@@ -1,72 +1,531 @@
+from __future__ import annotations
+
 import logging
-from concurrent.futures import Executor, as_completed
+from collections import deque
+from concurrent.futures import Executor, Future
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures import as_completed
 from decimal import Decimal
 from itertools import count
 from time import sleep
-from typing import Dict, Iterable, List, Optional, Tuple, Union, cast
-
-from requests import HTTPError, RequestException, Session
-
-from stocra.base_client import StocraBase
-from stocra.models import Block, ErrorHandler, StocraHTTPError, Token, Transaction
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    cast,
+)
+
+from requests import HTTPError, Request, RequestException, Response, Session
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool
+
+from stocra.base_client import MUTABLE_ENDPOINTS, BlockT, StocraBase, T, TransactionT
+from stocra.deadline import DEFAULT_REQUEST_TIMEOUT, Deadline, DeadlineExceeded
+from stocra.defaults import (
+    DEFAULT_BASE_URL,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_DNS_CACHE_SECONDS,
+    DEFAULT_KEEPALIVE_SECONDS,
+    DEFAULT_MAX_PENDING_TRANSACTIONS,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_REORG_DEPTH,
+)
+from stocra.models import (
+    Block,
+    ErrorHandler,
+    StocraHTTPError,
+    Transaction,
+)
+from stocra.synchronous.session import create_session
+from stocra.utils import limit_sleep
+
+# optional features are imported only when used to keep the import of the client fast
+if TYPE_CHECKING:
+    from stocra.ancestry import AncestryEdge
+    from stocra.checkpoint import CheckpointStore, CheckpointTracker
+    from stocra.endpoints import EndpointStats
+    from stocra.monitoring import StreamMonitor
+    from stocra.profiling import Profiler
+    from stocra.rate_limit import RateLimiter
+    from stocra.raw import RawBlock, RawTransaction
+    from stocra.reorg import BlockRollback, ReorgTracker
+    from stocra.tokens import Token
+    from stocra.utxo import UtxoIndex
+    from stocra.watchlist import Watchlist
 
 logger = logging.getLogger("stocra")
+GetBlock = Callable[[str, Union[str, int], Optional[Deadline]], BlockT]
 
 
-class Stocra(StocraBase):
+class Stocra(StocraBase):  # pylint: disable=too-many-public-methods
     _session: Session
     _executor: Optional[Executor]
+    _request_errors = (RequestException,)
 
-    def __init__(
+    def __init__(  # pylint: disable=too-many-arguments
         self,
         api_key: Optional[str] = None,
         session: Optional[Session] = None,
         executor: Optional[Executor] = None,
         error_handlers: Optional[List[ErrorHandler]] = None,
+        *,
+        base_url: str = DEFAULT_BASE_URL,
+        endpoints: Optional[Dict[str, List[str]]] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        keepalive_seconds: float = DEFAULT_KEEPALIVE_SECONDS,
+        dns_cache_seconds: int = DEFAULT_DNS_CACHE_SECONDS,
+        request_timeout: Optional[float] = DEFAULT_REQUEST_TIMEOUT,
+        rate_limiter: Optional[RateLimiter] = None,
+        profiler: Optional[Profiler] = None,
     ):
         super().__init__(
             api_key=api_key,
             error_handlers=error_handlers,
+            base_url=base_url,
+            endpoints=endpoints,
+            pool_size=pool_size,
+            request_timeout=request_timeout,
+            rate_limiter=rate_limiter,
+            profiler=profiler,
+        )
+        self._session = session or create_session(
+            pool_size=pool_size,
+            keepalive_seconds=keepalive_seconds,
+            dns_cache_seconds=dns_cache_seconds,
+            dns_cache_hosts=self._endpoint_hosts(),
         )
-        self._session = session or Session()
         self._executor = executor
 
-    def get_block(self, blockchain: str, hash_or_height: Union[str, int] = "latest") -> Block:
-        logger.debug("%s: get_block %s", blockchain, hash_or_height)
-        block_json = self._get(blockchain=blockchain, endpoint=f"blocks/{hash_or_height}")
-        return Block(**block_json)
+    def close(self) -> None:
+        self._session.close()
 
-    def get_transaction(self, blockchain: str, transaction_hash: str) -> Transaction:
-        logger.debug("%s: get_transaction %s", blockchain, transaction_hash)
-        transaction_json = self._get(blockchain=blockchain, endpoint=f"transactions/{transaction_hash}")
-        return Transaction(**transaction_json)
+    def warm_up(self, blockchains: Iterable[str], connections: int = 1) -> None:
+        for blockchain in blockchains:
+            for endpoint in self._get_endpoint_pool(blockchain).candidates():
+                self._warm_up_endpoint(endpoint.url, min(connections, self._pool_size))
+
+    def get_block(
+        self, blockchain: str, hash_or_height: Union[str, int] = "latest", timeout: Optional[float] = None
+    ) -> Block:
+        return self._get_block(blockchain, hash_or_height, Deadline.after(timeout))
 
-    def get_all_transactions_of_block(self, blockchain: str, block: Block) -> Iterable[Transaction]:
+    def get_block_raw(
+        self, blockchain: str, hash_or_height: Union[str, int] = "latest", timeout: Optional[float] = None
+    ) -> RawBlock:
+        return self._get_raw_block(blockchain, hash_or_height, Deadline.after(timeout))
+
+    def get_transaction(self, blockchain: str, transaction_hash: str, timeout: Optional[float] = None) -> Transaction:
+        return self._get_transaction(blockchain, transaction_hash, Deadline.after(timeout))
+
+    def get_transaction_raw(
+        self, blockchain: str, transaction_hash: str, timeout: Optional[float] = None
+    ) -> RawTransaction:
+        return self._get_raw_transaction(blockchain, transaction_hash, Deadline.after(timeout))
+
+    def get_all_transactions_of_block(
+        self, blockchain: str, block: Union[Block, RawBlock], timeout: Optional[float] = None
+    ) -> Iterable[Transaction]:
         logger.debug("%s: get_all_transactions %s", blockchain, block.height)
-        if self._executor:
-            futures = [
-                self._executor.submit(self.get_transaction, blockchain, transaction_hash)
-                for transaction_hash in block.transactions
-            ]
-            for transaction_task in as_completed(futures):
-                yield transaction_task.result()
-        else:
-            for transaction_hash in block.transactions:
-                yield self.get_transaction(blockchain, transaction_hash)
+        return self._get_all_transactions(
+            blockchain, block.transactions, self._get_transaction, Deadline.after(timeout)
+        )
+
+    def get_all_transactions_of_block_raw(
+        self, blockchain: str, block: Union[Block, RawBlock], timeout: Optional[float] = None
+    ) -> Iterable[RawTransaction]:
+        logger.debug("%s: get_all_transactions %s", blockchain, block.height)
+        return self._get_all_transactions(
+            blockchain, block.transactions, self._get_raw_transaction, Deadline.after(timeout)
+        )
+
+    def get_transaction_streaming(
+        self, blockchain: str, transaction_hash: str, timeout: Optional[float] = None
+    ) -> Transaction:
+        return self._get_transaction_streaming(blockchain, transaction_hash, Deadline.after(timeout))
+
+    def get_all_transactions_of_block_streaming(
+        self,
+        blockchain: str,
+        hash_or_height: Union[str, int] = "latest",
+        max_pending: int = DEFAULT_MAX_PENDING_TRANSACTIONS,
+        timeout: Optional[float] = None,
+    ) -> Iterable[Transaction]:
+        if max_pending < 1:
+            raise ValueError(f"`max_pending` must be greater than 0. Got `{max_pending}`")
+
+        return self._get_all_transactions_streaming(blockchain, hash_or_height, max_pending, Deadline.after(timeout))
 
     def stream_new_blocks(
         self,
         blockchain: str,
         start_block_hash_or_height: Union[int, str] = "latest",
         sleep_interval_seconds: float = 10,
+        monitor: Optional[StreamMonitor] = None,
     ) -> Iterable[Block]:
-        block = self.get_block(blockchain=blockchain, hash_or_height=start_block_hash_or_height)
+        return self._profile_consumer(
+            self._deliver_blocks(
+                self._stream_blocks(
+                    blockchain, start_block_hash_or_height, sleep_interval_seconds, self._get_block, monitor
+                ),
+                monitor,
+            )
+        )
+
+    def stream_new_blocks_raw(
+        self,
+        blockchain: str,
+        start_block_hash_or_height: Union[int, str] = "latest",
+        sleep_interval_seconds: float = 10,
+        monitor: Optional[StreamMonitor] = None,
+    ) -> Iterable[RawBlock]:
+        return self._profile_consumer(
+            self._deliver_blocks(
+                self._stream_blocks(
+                    blockchain, start_block_hash_or_height, sleep_interval_seconds, self._get_raw_block, monitor
+                ),
+                monitor,
+            )
+        )
+
+    def stream_new_blocks_ahead(
+        self,
+        blockchain: str,
+        start_block_hash_or_height: Union[int, str] = "latest",
+        sleep_interval_seconds: float = 10,
+        n_blocks_ahead: int = 10,
+        monitor: Optional[StreamMonitor] = None,
+    ) -> Iterable[Block]:
+        return self._profile_consumer(
+            self._deliver_blocks(
+                self._stream_blocks_ahead(
+                    blockchain,
+                    start_block_hash_or_height,
+                    sleep_interval_seconds,
+                    n_blocks_ahead,
+                    self._get_block,
+                    monitor,
+                ),
+                monitor,
+            )
+        )
+
+    def stream_new_blocks_ahead_raw(
+        self,
+        blockchain: str,
+        start_block_hash_or_height: Union[int, str] = "latest",
+        sleep_interval_seconds: float = 10,
+        n_blocks_ahead: int = 10,
+        monitor: Optional[StreamMonitor] = None,
+    ) -> Iterable[RawBlock]:
+        return self._profile_consumer(
+            self._deliver_blocks(
+                self._stream_blocks_ahead(
+                    blockchain,
+                    start_block_hash_or_height,
+                    sleep_interval_seconds,
+                    n_blocks_ahead,
+                    self._get_raw_block,
+                    monitor,
+                ),
+                monitor,
+            )
+        )
+
+    def stream_new_transactions(  # pylint: disable=too-many-arguments
+        self,
+        blockchain: str,
+        start_block_hash_or_height: Union[int, str] = "latest",
+        sleep_interval_seconds: float = 10,
+        load_n_blocks_ahead: Optional[int] = None,
+        *,
+        checkpoint_store: Optional[CheckpointStore] = None,
+        checkpoint_key: Optional[str] = None,
+        monitor: Optional[StreamMonitor] = None,
+    ) -> Iterable[Tuple[Block, Transaction]]:
+        return self._profile_consumer(
+            self._stream_transactions(
+                blockchain,
+                start_block_hash_or_height,
+                sleep_interval_seconds,
+                load_n_blocks_ahead,
+                self._get_block,
+                self._get_transaction,
+                self._checkpoint_tracker(checkpoint_store, checkpoint_key, blockchain),
+                monitor,
+            )
+        )
+
+    def stream_new_transactions_raw(  # pylint: disable=too-many-arguments
+        self,
+        blockchain: str,
+        start_block_hash_or_height: Union[int, str] = "latest",
+        sleep_interval_seconds: float = 10,
+        load_n_blocks_ahead: Optional[int] = None,
+        *,
+        checkpoint_store: Optional[CheckpointStore] = None,
+        checkpoint_key: Optional[str] = None,
+        monitor: Optional[StreamMonitor] = None,
+    ) -> Iterable[Tuple[RawBlock, RawTransaction]]:
+        return self._profile_consumer(
+            self._stream_transactions(
+                blockchain,
+                start_block_hash_or_height,
+                sleep_interval_seconds,
+                load_n_blocks_ahead,
+                self._get_raw_block,
+                self._get_raw_transaction,
+                self._checkpoint_tracker(checkpoint_store, checkpoint_key, blockchain),
+                monitor,
+            )
+        )
+
+    def stream_new_transactions_filtered(  # pylint: disable=too-many-arguments
+        self,
+        blockchain: str,
+        watchlist: Watchlist,
+        start_block_hash_or_height: Union[int, str] = "latest",
+        sleep_interval_seconds: float = 10,
+        load_n_blocks_ahead: Optional[int] = None,
+        *,
+        checkpoint_store: Optional[CheckpointStore] = None,
+        checkpoint_key: Optional[str] = None,
+        monitor: Optional[StreamMonitor] = None,
+    ) -> Iterable[Tuple[Block, Transaction]]:
+        return self._profile_consumer(
+            self._filter_transactions(
+                watchlist,
+                self._stream_transactions(
+                    blockchain,
+                    start_block_hash_or_height,
+                    sleep_interval_seconds,
+                    load_n_blocks_ahead,
+                    self._get_block,
+                    self._get_raw_transaction,
+                    self._checkpoint_tracker(checkpoint_store, checkpoint_key, blockchain),
+                    monitor,
+                ),
+            )
+        )
+
+    def stream_new_blocks_reorg_aware(
+        self,
+        blockchain: str,
+        start_block_hash_or_height: Union[int, str] = "latest",
+        sleep_interval_seconds: float = 10,
+        reorg_depth: int = DEFAULT_REORG_DEPTH,
+    ) -> Iterable[Union[Block, BlockRollback]]:
+        return self._profile_consumer(
+            self._stream_blocks_reorg_aware(
+                blockchain, start_block_hash_or_height, sleep_interval_seconds, self._reorg_tracker(reorg_depth)
+            )
+        )
+
+    def stream_new_transactions_reorg_aware(
+        self,
+        blockchain: str,
+        start_block_hash_or_height: Union[int, str] = "latest",
+        sleep_interval_seconds: float = 10,
+        reorg_depth: int = DEFAULT_REORG_DEPTH,
+    ) -> Iterable[Union[Tuple[Block, Transaction], BlockRollback]]:
+        return self._profile_consumer(
+            self._stream_transactions_reorg_aware(
+                blockchain, start_block_hash_or_height, sleep_interval_seconds, self._reorg_tracker(reorg_depth)
+            )
+        )
+
+    def get_tokens(self, blockchain: str, timeout: Optional[float] = None, refresh: bool = False) -> Dict[str, Token]:
+        if refresh or self._tokens.get(blockchain) is None:
+            self._refresh_tokens(blockchain, Deadline.after(timeout))
+
+        return self._tokens[blockchain]
+
+    def scale_token_value(
+        self, blockchain: str, contract_address: str, value: Decimal, timeout: Optional[float] = None
+    ) -> Decimal:
+        token = self.get_tokens(blockchain, timeout=timeout)[contract_address]
+        return value * token.scaling
+
+    def resolve_inputs(
+        self,
+        blockchain: str,
+        transactions: Iterable[Transaction],
+        utxo_index: UtxoIndex,
+        timeout: Optional[float] = None,
+    ) -> List[Transaction]:
+        transactions = list(transactions)
+        for transaction in transactions:
+            utxo_index.add_transaction(transaction)
+
+        missing_parents = utxo_index.missing_parents(transactions)
+        logger.debug("%s: resolve_inputs, fetching %d parent transactions", blockchain, len(missing_parents))
+        for parent in self._get_all_transactions(
+            blockchain, missing_parents, self._get_transaction, Deadline.after(timeout)
+        ):
+            utxo_index.add_transaction(parent)
+
+        return [utxo_index.resolve(transaction) for transaction in transactions]
+
+    def trace_ancestry(
+        self,
+        blockchain: str,
+        transaction_hash: str,
+        max_hops: int,
+        max_nodes: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> Iterable[AncestryEdge]:
+        if max_hops < 1:
+            raise ValueError(f"`max_hops` must be greater than 0. Got `{max_hops}`")
+
+        return self._trace_ancestry(blockchain, transaction_hash, max_hops, max_nodes, Deadline.after(timeout))
+
+    def _get_block(self, blockchain: str, hash_or_height: Union[str, int], deadline: Optional[Deadline]) -> Block:
+        logger.debug("%s: get_block %s", blockchain, hash_or_height)
+        return self._get_parsed(blockchain, f"blocks/{hash_or_height}", Block.parse_obj, deadline)
+
+    def _get_transaction(self, blockchain: str, transaction_hash: str, deadline: Optional[Deadline]) -> Transaction:
+        logger.debug("%s: get_transaction %s", blockchain, transaction_hash)
+        transaction_json = self._get(
+            blockchain=blockchain, endpoint=f"transactions/{transaction_hash}", deadline=deadline
+        )
+        with self._profile("validation"):
+            return Transaction(**transaction_json)
+
+    def _get_raw_block(
+        self, blockchain: str, hash_or_height: Union[str, int], deadline: Optional[Deadline]
+    ) -> RawBlock:
+        # pylint: disable-next=import-outside-toplevel
+        from stocra.raw import RawBlock
+
+        logger.debug("%s: get_block_raw %s", blockchain, hash_or_height)
+        response = self._request(blockchain, f"blocks/{hash_or_height}", deadline)
+        with self._profile("decode"):
+            return RawBlock.from_body(response.content)
+
+    def _get_raw_transaction(
+        self, blockchain: str, transaction_hash: str, deadline: Optional[Deadline]
+    ) -> RawTransaction:
+        # pylint: disable-next=import-outside-toplevel
+        from stocra.raw import RawTransaction
+
+        logger.debug("%s: get_transaction_raw %s", blockchain, transaction_hash)
+        response = self._request(blockchain, f"transactions/{transaction_hash}", deadline)
+        return RawTransaction(hash=transaction_hash, body=response.content)
+
+    def _get_transaction_streaming(
+        self, blockchain: str, transaction_hash: str, deadline: Optional[Deadline]
+    ) -> Transaction:
+        logger.debug("%s: get_transaction_streaming %s", blockchain, transaction_hash)
+        # pylint: disable-next=import-outside-toplevel
+        from stocra.streaming_json import TransactionParser
+
+        parser = TransactionParser()
+        with self._request(blockchain, f"transactions/{transaction_hash}", deadline, stream=True) as response:
+            for chunk in response.iter_content(DEFAULT_CHUNK_SIZE):
+                parser.feed(chunk)
+
+        with self._profile("validation"):
+            return parser.close()
+
+    def _get_all_transactions_streaming(
+        self, blockchain: str, hash_or_height: Union[str, int], max_pending: int, deadline: Optional[Deadline]
+    ) -> Iterable[Transaction]:
+        # pylint: disable-next=import-outside-toplevel
+        from stocra.streaming_json import iter_block_transaction_hashes
+
+        logger.debug("%s: get_all_transactions_streaming %s", blockchain, hash_or_height)
+        with self._request(blockchain, f"blocks/{hash_or_height}", deadline, stream=True) as response:
+            transaction_hashes = iter_block_transaction_hashes(response.iter_content(DEFAULT_CHUNK_SIZE))
+            if not self._executor:
+                for transaction_hash in transaction_hashes:
+                    yield self._get_transaction_streaming(blockchain, transaction_hash, deadline)
+
+                return
+
+            # hashes are fetched as they are parsed, at most `max_pending` transactions are held at once
+            futures: Deque["Future[Transaction]"] = deque()
+            try:
+                for transaction_hash in transaction_hashes:
+                    futures.append(
+                        self._executor.submit(self._get_transaction_streaming, blockchain, transaction_hash, deadline)
+                    )
+                    if len(futures) >= max_pending:
+                        yield self._result(futures.popleft(), deadline)
+
+                while futures:
+                    yield self._result(futures.popleft(), deadline)
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def _get_all_transactions(
+        self,
+        blockchain: str,
+        transaction_hashes: Iterable[str],
+        get_transaction: Callable[[str, str, Optional[Deadline]], T],
+        deadline: Optional[Deadline],
+    ) -> Iterable[T]:
+        if self._executor:
+            futures = [
+                self._executor.submit(get_transaction, blockchain, transaction_hash, deadline)
+                for transaction_hash in transaction_hashes
+            ]
+            try:
+                yield from self._as_completed(futures, deadline)
+            finally:
+                for future in futures:
+                    future.cancel()
+        else:
+            for transaction_hash in transaction_hashes:
+                yield get_transaction(blockchain, transaction_hash, deadline)
+
+    def _trace_ancestry(
+        self,
+        blockchain: str,
+        transaction_hash: str,
+        max_hops: int,
+        max_nodes: Optional[int],
+        deadline: Optional[Deadline],
+    ) -> Iterable[AncestryEdge]:
+        # pylint: disable-next=import-outside-toplevel
+        from stocra.ancestry import AncestryWalk
+
+        # every hop is fetched in parallel
+        walk = AncestryWalk(transaction_hash, max_nodes)
+        while walk.hop < max_hops:
+            frontier = walk.next_hop()
+            if not frontier:
+                return
+
+            logger.debug(
+                "%s: trace_ancestry %s, hop %d, %d transactions", blockchain, transaction_hash, walk.hop, len(frontier)
+            )
+            for transaction in self._get_all_transactions(blockchain, frontier, self._get_transaction, deadline):
+                yield from walk.edges(transaction)
+
+    def _stream_blocks(
+        self,
+        blockchain: str,
+        start_block_hash_or_height: Union[int, str],
+        sleep_interval_seconds: float,
+        get_block: GetBlock[BlockT],
+        monitor: Optional[StreamMonitor],
+    ) -> Iterable[BlockT]:
+        if monitor:
+            get_block = self._record_fetches(get_block, monitor)
+
+        block = get_block(blockchain, start_block_hash_or_height, None)
         next_block_height = block.height + 1
         yield block
 
         while True:
             try:
-                block = self.get_block(blockchain=blockchain, hash_or_height=next_block_height)
+                block = get_block(blockchain, next_block_height, None)
             except HTTPError as exception:
                 if exception.response.status_code == 404:
                     self._handle_404_during_block_streaming(blockchain, next_block_height, sleep_interval_seconds)
@@ -77,98 +536,363 @@ class Stocra(StocraBase):
             next_block_height += 1
             yield block
 
-    def stream_new_blocks_ahead(
+    def _stream_blocks_ahead(  # pylint: disable=too-many-arguments,too-many-positional-arguments
         self,
         blockchain: str,
-        start_block_hash_or_height: Union[int, str] = "latest",
-        sleep_interval_seconds: float = 10,
-        n_blocks_ahead: int = 10,
-    ) -> Iterable[Block]:
+        start_block_hash_or_height: Union[int, str],
+        sleep_interval_seconds: float,
+        n_blocks_ahead: int,
+        get_block: GetBlock[BlockT],
+        monitor: Optional[StreamMonitor],
+    ) -> Iterable[BlockT]:
         if not self._executor:
             raise Exception("Works only with executor")
 
         if n_blocks_ahead < 1:
             raise ValueError(f"`n_blocks_ahead` must be greater than 0. Got `{n_blocks_ahead}`")
 
-        block = self.get_block(blockchain=blockchain, hash_or_height=start_block_hash_or_height)
+        if monitor:
+            get_block = self._record_fetches(get_block, monitor)
+
+        block = get_block(blockchain, start_block_hash_or_height, None)
         next_block_height = block.height + 1
         last_block_height = next_block_height + n_blocks_ahead + 1
         yield block
 
         block_tasks = [
-            self._executor.submit(self.get_block, blockchain, height)
+            self._executor.submit(get_block, blockchain, height, None)
             for height in range(next_block_height, last_block_height)
         ]
 
+        try:
+            while True:
+                block_task = block_tasks.pop(0)
+                try:
+                    block = block_task.result()
+                except HTTPError as exception:
+                    if exception.response.status_code == 404:
+                        self._handle_404_during_block_streaming(blockchain, next_block_height, sleep_interval_seconds)
+                        block_tasks.insert(0, self._executor.submit(get_block, blockchain, next_block_height, None))
+                        continue
+
+                    raise
+
+                if monitor:
+                    monitor.prefetch_occupancy(sum(task.done() for task in block_tasks), len(block_tasks))
+
+                yield block
+                block_tasks.append(self._executor.submit(get_block, blockchain, last_block_height, None))
+                next_block_height += 1
+                last_block_height += 1
+        finally:
+            for block_task in block_tasks:
+                block_task.cancel()
+
+    def _stream_blocks_for_transactions(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        blockchain: str,
+        start_block_hash_or_height: Union[int, str],
+        sleep_interval_seconds: float,
+        load_n_blocks_ahead: Optional[int],
+        get_block: GetBlock[BlockT],
+        monitor: Optional[StreamMonitor],
+    ) -> Iterable[BlockT]:
+        if load_n_blocks_ahead:
+            return self._stream_blocks_ahead(
+                blockchain, start_block_hash_or_height, sleep_interval_seconds, load_n_blocks_ahead, get_block, monitor
+            )
+
+        return self._stream_blocks(blockchain, start_block_hash_or_height, sleep_interval_seconds, get_block, monitor)
+
+    def _stream_transactions(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        blockchain: str,
+        start_block_hash_or_height: Union[int, str],
+        sleep_interval_seconds: float,
+        load_n_blocks_ahead: Optional[int],
+        get_block: GetBlock[BlockT],
+        get_transaction: Callable[[str, str, Optional[Deadline]], TransactionT],
+        checkpoint: Optional[CheckpointTracker],
+        monitor: Optional[StreamMonitor],
+    ) -> Iterable[Tuple[BlockT, TransactionT]]:
+        # pylint: disable-next=import-outside-toplevel
+        from stocra.monitoring import BlockDelivery
+
+        if checkpoint:
+            start_block_hash_or_height = checkpoint.resume_from(start_block_hash_or_height)
+
+        try:
+            for block in self._stream_blocks_for_transactions(
+                blockchain, start_block_hash_or_height, sleep_interval_seconds, load_n_blocks_ahead, get_block, monitor
+            ):
+                delivery = BlockDelivery(block, checkpoint, monitor)
+                logger.debug("%s: get_all_transactions %s", blockchain, block.height)
+                transactions = self._get_all_transactions(blockchain, delivery.pending(), get_transaction, None)
+                for transaction in transactions:
+                    with delivery.consumed(transaction.hash):
+                        yield block, transaction
+
+                delivery.finished()
+        finally:
+            # transactions processed since the last batch are not processed again after a restart
+            if checkpoint:
+                checkpoint.flush()
+
+    def _stream_blocks_reorg_aware(
+        self,
+        blockchain: str,
+        start_block_hash_or_height: Union[int, str],
+        sleep_interval_seconds: float,
+        reorg: ReorgTracker,
+    ) -> Iterable[Union[Block, BlockRollback]]:
+        block = self._get_block(blockchain, start_block_hash_or_height, None)
+        reorg.delivered(block.height, block.hash)
+        yield block
+
         while True:
-            block_task = block_tasks.pop(0)
             try:
-                yield block_task.result()
+                block = self._get_block(blockchain, reorg.next_height, None)
             except HTTPError as exception:
-                if exception.response.status_code == 404:
-                    self._handle_404_during_block_streaming(blockchain, next_block_height, sleep_interval_seconds)
-                    block_tasks.insert(0, self._executor.submit(self.get_block, blockchain, next_block_height))
+                if exception.response.status_code != 404:
+                    raise
+
+                rollback = self._verify_recent_blocks(blockchain, reorg)
+                if rollback is None:
+                    self._handle_404_during_block_streaming(blockchain, reorg.next_height, sleep_interval_seconds)
                     continue
 
-                raise
+                logger.info("%s: reorg, rolling back blocks %s", blockchain, rollback.blocks)
+                yield rollback
+                continue
 
-            block_tasks.append(self._executor.submit(self.get_block, blockchain, last_block_height))
-            next_block_height += 1
-            last_block_height += 1
+            reorg.delivered(block.height, block.hash)
+            yield block
 
-    def stream_new_transactions(
+    def _stream_transactions_reorg_aware(
         self,
         blockchain: str,
-        start_block_hash_or_height: Union[int, str] = "latest",
-        sleep_interval_seconds: float = 10,
-        load_n_blocks_ahead: Optional[int] = None,
-    ) -> Iterable[Tuple[Block, Transaction]]:
-        if load_n_blocks_ahead:
-            new_blocks = self.stream_new_blocks_ahead(
-                blockchain=blockchain,
-                start_block_hash_or_height=start_block_hash_or_height,
-                sleep_interval_seconds=sleep_interval_seconds,
-                n_blocks_ahead=load_n_blocks_ahead,
-            )
-        else:
-            new_blocks = self.stream_new_blocks(
-                blockchain=blockchain,
-                start_block_hash_or_height=start_block_hash_or_height,
-                sleep_interval_seconds=sleep_interval_seconds,
-            )
+        start_block_hash_or_height: Union[int, str],
+        sleep_interval_seconds: float,
+        reorg: ReorgTracker,
+    ) -> Iterable[Union[Tuple[Block, Transaction], BlockRollback]]:
+        # pylint: disable-next=import-outside-toplevel
+        from stocra.reorg import BlockRollback
+
+        events = self._stream_blocks_reorg_aware(blockchain, start_block_hash_or_height, sleep_interval_seconds, reorg)
+        for event in events:
+            if isinstance(event, BlockRollback):
+                yield event
+                continue
+
+            logger.debug("%s: get_all_transactions %s", blockchain, event.height)
+            for transaction in self._get_all_transactions(blockchain, event.transactions, self._get_transaction, None):
+                yield event, transaction
+
+    def _verify_recent_blocks(self, blockchain: str, reorg: ReorgTracker) -> Optional[BlockRollback]:
+        hashes = self._get_block_hashes(blockchain, reorg.heights_to_verify())
+        heights = reorg.heights_to_roll_back(hashes)
+        if heights:
+            hashes.update(self._get_block_hashes(blockchain, heights))
+
+        return reorg.verified(hashes)
+
+    def _get_block_hashes(self, blockchain: str, heights: List[int]) -> Dict[int, Optional[str]]:
+        def get_block_hash(height: int) -> Optional[str]:
+            try:
+                # raw block is enough to compare hashes and skips validation of the whole block
+                return self._get_raw_block(blockchain, height, None).hash
+            except HTTPError as exception:
+                if exception.response.status_code == 404:
+                    return None
 
-        for block in new_blocks:
-            block_transactions = self.get_all_transactions_of_block(blockchain=blockchain, block=block)
-            for transaction in block_transactions:
-                yield block, transaction
+                raise
 
-    def get_tokens(self, blockchain: str) -> Dict[str, Token]:
-        if self._tokens.get(blockchain) is None:
-            self._refresh_tokens(blockchain)
+        if self._executor:
+            return dict(zip(heights, self._executor.map(get_block_hash, heights)))
 
-        return self._tokens[blockchain]
+        return {height: get_block_hash(height) for height in heights}
 
-    def scale_token_value(self, blockchain: str, contract_address: str, value: Decimal) -> Decimal:
-        token = self.get_tokens(blockchain)[contract_address]
-        return value * token.scaling
+    def _profile_consumer(self, items: Iterable[T]) -> Iterable[T]:
+        if self._profiler:
+            return self._profiler.profile_consumer(items)
+
+        return items
+
+    @classmethod
+    def _record_fetches(cls, get_block: GetBlock[BlockT], monitor: StreamMonitor) -> GetBlock[BlockT]:
+        def get_and_record_block(
+            blockchain: str, hash_or_height: Union[str, int], deadline: Optional[Deadline]
+        ) -> BlockT:
+            block = get_block(blockchain, hash_or_height, deadline)
+            monitor.block_fetched(block.height)
+            return block
+
+        return get_and_record_block
 
-    def _get(self, blockchain: str, endpoint: str) -> dict:  # type: ignore[return]
+    @classmethod
+    def _deliver_blocks(cls, blocks: Iterable[BlockT], monitor: Optional[StreamMonitor]) -> Iterable[BlockT]:
+        for block in blocks:
+            if monitor:
+                monitor.block_delivered(block)
+
+            yield block
+
+    @classmethod
+    def _filter_transactions(
+        cls, watchlist: Watchlist, transactions: Iterable[Tuple[Block, RawTransaction]]
+    ) -> Iterable[Tuple[Block, Transaction]]:
+        for block, transaction in transactions:
+            if watchlist.matches(transaction.body):
+                yield block, Transaction.parse_raw(transaction.body)
+
+    @classmethod
+    def _result(cls, future: "Future[T]", deadline: Optional[Deadline]) -> T:
+        try:
+            return future.result(timeout=deadline.remaining() if deadline else None)
+        except FuturesTimeoutError as exception:
+            raise DeadlineExceeded("Deadline exceeded while waiting for results") from exception
+
+    @classmethod
+    def _as_completed(cls, futures: List[Future], deadline: Optional[Deadline]) -> Iterable:
+        try:
+            for future in as_completed(futures, timeout=deadline.remaining() if deadline else None):
+                yield future.result()
+        except DeadlineExceeded:
+            raise
+        except FuturesTimeoutError as exception:
+            raise DeadlineExceeded("Deadline exceeded while waiting for results") from exception
+
+    def _get(self, blockchain: str, endpoint: str, deadline: Optional[Deadline] = None) -> dict:
+        response = self._request(blockchain, endpoint, deadline)
+        return self._decode(response)
+
+    def _decode(self, response: Response) -> dict:
+        with self._profile("decode"):
+            return cast(dict, response.json())
+
+    def _get_parsed(
+        self, blockchain: str, endpoint: str, parse: Callable[[dict], T], deadline: Optional[Deadline]
+    ) -> T:
+        if endpoint not in MUTABLE_ENDPOINTS:
+            decoded = self._get(blockchain, endpoint, deadline)
+            with self._profile("validation"):
+                return parse(decoded)
+
+        cached = self._conditional_cache.get(blockchain, endpoint)
+        response = self._request(blockchain, endpoint, deadline, headers=cached.headers if cached else None)
+        if cached and response.status_code == 304:
+            logger.debug("%s: %s not modified", blockchain, endpoint)
+            return cast(T, cached.value)
+
+        return self._store_parsed(blockchain, endpoint, response.headers, self._decode(response), parse)
+
+    def _request(  # type: ignore[return]
+        self,
+        blockchain: str,
+        endpoint: str,
+        deadline: Optional[Deadline] = None,
+        headers: Optional[Dict[str, str]] = None,
+        stream: bool = False,
+    ) -> Response:
         for iteration in count(start=1):
             try:
-                response = self._session.get(
-                    f"https://{blockchain}.stocra.com/v1.0/{endpoint}",
-                    allow_redirects=False,
-                    headers=self.headers,
-                )
-                response.raise_for_status()
-                return cast(dict, response.json())
+                return self._get_from_any_endpoint(blockchain, endpoint, deadline, headers, stream)
             except RequestException as exception:
-                error = StocraHTTPError(endpoint=endpoint, iteration=iteration, exception=exception)
-                if self._should_continue(error):
+                error = StocraHTTPError(endpoint=endpoint, iteration=iteration, exception=exception, deadline=deadline)
+                with self._profile("retry"):
+                    retry = self._should_continue(error)
+
+                if retry:
                     continue
 
                 raise
 
+    def _get_from_any_endpoint(
+        self,
+        blockchain: str,
+        endpoint: str,
+        deadline: Optional[Deadline],
+        headers: Optional[Dict[str, str]],
+        stream: bool,
+    ) -> Response:
+        *fallbacks, last_resort = self._get_endpoint_pool(blockchain).candidates()
+        for candidate in fallbacks:
+            try:
+                return self._get_from_endpoint(blockchain, candidate, endpoint, deadline, headers, stream)
+            except RequestException as exception:
+                if not self._is_endpoint_failure(exception):
+                    raise
+
+                logger.debug("%s: %s failed on %s, failing over", blockchain, endpoint, candidate.url)
+
+        return self._get_from_endpoint(blockchain, last_resort, endpoint, deadline, headers, stream)
+
+    def _get_from_endpoint(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        blockchain: str,
+        candidate: EndpointStats,
+        endpoint: str,
+        deadline: Optional[Deadline],
+        headers: Optional[Dict[str, str]],
+        stream: bool,
+    ) -> Response:
+        if self._rate_limiter:
+            with self._profile("rate_limit"):
+                sleep(limit_sleep(self._rate_limiter.reserve(), deadline))
+
+        timeout = self._get_request_timeout(endpoint, deadline)
+        with self._attempt(blockchain, candidate):
+            with self._profile("network"):
+                response = self._session.get(
+                    f"{candidate.url}/{endpoint}",
+                    allow_redirects=False,
+                    headers={**self.headers, **(headers or dict())},
+                    timeout=timeout,
+                    stream=stream,
+                )
+            response.raise_for_status()
+
+        return response
+
+    def _warm_up_endpoint(self, url: str, connections: int) -> None:
+        adapter = self._session.get_adapter(url)
+        if not isinstance(adapter, HTTPAdapter):
+            return
+
+        # the same pool as for regular requests must be used, its key depends on TLS settings
+        settings = self._session.merge_environment_settings(url, {}, None, None, None)
+        if hasattr(adapter, "get_connection_with_tls_context"):
+            request = Request("GET", url).prepare()
+            pool = adapter.get_connection_with_tls_context(request, settings["verify"], cert=settings["cert"])
+        else:
+            pool = adapter.get_connection(url)
+
+        # urllib3 has no public API for opening connections ahead of requests
+        # pylint: disable=protected-access
+        pool = cast(HTTPConnectionPool, pool)
+        opened = [pool._get_conn() for _ in range(connections)]
+        try:
+            for connection in opened:
+                if getattr(connection, "sock", None) is None:
+                    connection.connect()
+
+            self._pool_tracker.warmed_up(url, connections)
+        except OSError:
+            logger.warning("Warm-up of %s failed", url, exc_info=True)
+        finally:
+            for connection in opened:
+                pool._put_conn(connection)
+
+    @classmethod
+    def _is_endpoint_failure(cls, exception: BaseException) -> bool:
+        if isinstance(exception, HTTPError):
+            # pylint: disable-next=import-outside-toplevel
+            from stocra.endpoints import is_failover_status
+
+            return is_failover_status(exception.response.status_code)
+
+        return True
+
     def _should_continue(self, error: StocraHTTPError) -> bool:
         if not self._error_handlers:
             return False
@@ -176,6 +900,9 @@ class Stocra(StocraBase):
         for error_handler in self._error_handlers:
             retry = error_handler(error)
             if retry:
+                if error.deadline:
+                    error.deadline.check(error.endpoint)
+
                 return True
 
         return False
@@ -192,6 +919,5 @@ class Stocra(StocraBase):
         )
         sleep(sleep_interval_seconds)
 
-    def _refresh_tokens(self, blockchain: str) -> None:
-        tokens = self._get(blockchain, "tokens")
-        self._tokens[blockchain] = {contract_address: Token(**token) for contract_address, token in tokens.items()}
+    def _refresh_tokens(self, blockchain: str, deadline: Optional[Deadline] = None) -> None:
+        self._tokens[blockchain] = self._get_parsed(blockchain, "tokens", self._parse_tokens, deadline)
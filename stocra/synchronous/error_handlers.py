@@ -3,7 +3,7 @@ from time import sleep
 from requests import HTTPError, Timeout
 
 from stocra.models import StocraHTTPError
-from stocra.utils import calculate_sleep
+from stocra.utils import calculate_sleep, limit_sleep
 
 
 def retry_on_service_unavailable(error: StocraHTTPError) -> bool:
@@ -16,7 +16,7 @@ def retry_on_service_unavailable(error: StocraHTTPError) -> bool:
     if error.iteration > 10:
         return False
 
-    sleep(calculate_sleep(error.iteration))
+    sleep(limit_sleep(calculate_sleep(error.iteration), error.deadline))
     return True
 
 
@@ -30,7 +30,7 @@ def retry_on_too_many_requests(error: StocraHTTPError) -> bool:
     if error.iteration > 10:
         return False
 
-    sleep(int(error.exception.response.headers["Retry-After"]))
+    sleep(limit_sleep(int(error.exception.response.headers["Retry-After"]), error.deadline))
     return True
 
 
@@ -44,7 +44,7 @@ def retry_on_bad_gateway(error: StocraHTTPError) -> bool:
     if error.iteration > 10:
         return False
 
-    sleep(calculate_sleep(error.iteration))
+    sleep(limit_sleep(calculate_sleep(error.iteration), error.deadline))
     return True
 
 
@@ -55,5 +55,5 @@ def retry_on_timeout_error(error: StocraHTTPError) -> bool:
     if error.iteration > 10:
         return False
 
-    sleep(calculate_sleep(error.iteration))
+    sleep(limit_sleep(calculate_sleep(error.iteration), error.deadline))
     return True
@@ -0,0 +1,112 @@
+import logging
+from functools import partial
+from threading import Condition, Lock, Thread, current_thread
+from typing import Callable, Generic, Iterable, Optional, TypeVar
+
+from stocra.hub import (
+    DEFAULT_BUFFER_SIZE,
+    HubState,
+    SlowConsumerPolicy,
+    SubscriptionBase,
+)
+
+logger = logging.getLogger("stocra")
+T = TypeVar("T")
+
+
+class Subscription(SubscriptionBase[T]):
+    def __init__(self, buffer_size: int, policy: SlowConsumerPolicy, on_close: Callable[["Subscription"], None]):
+        super().__init__(buffer_size, policy, on_close)
+        self._condition = Condition()
+
+    def __iter__(self) -> "Subscription[T]":
+        return self
+
+    def __next__(self) -> T:
+        with self._condition:
+            self._condition.wait_for(self._buffer.readable)
+            self._condition.notify_all()
+            return self._buffer.get(StopIteration)
+
+    def close(self) -> None:
+        self._on_close(self)
+        self._finish(None)
+
+    def _put(self, item: T) -> bool:
+        with self._condition:
+            self._condition.wait_for(self._buffer.writable)
+            delivered = self._buffer.put(item)
+            self._condition.notify_all()
+            return delivered
+
+    def _finish(self, error: Optional[BaseException]) -> None:
+        with self._condition:
+            self._buffer.finish(error)
+            self._condition.notify_all()
+
+
+class StreamHub(Generic[T]):
+    """
+    Runs one `stream(blockchain)` pipeline per blockchain in a background thread and delivers every item
+    to all subscribers of that blockchain. Every subscriber has its own bounded buffer and slow consumer policy.
+    Subscribers get items produced after they subscribed. Pipeline runs until its stream ends, its last subscriber
+    leaves or the hub is closed, an error of the stream is raised to every subscriber after it drains its buffer.
+    """
+
+    def __init__(self, stream: Callable[[str], Iterable[T]]) -> None:
+        self._stream = stream
+        self._state: HubState[Subscription[T], Thread] = HubState()
+        self._lock = Lock()
+
+    def subscribe(
+        self,
+        blockchain: str,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        policy: SlowConsumerPolicy = SlowConsumerPolicy.BLOCK,
+    ) -> Subscription[T]:
+        subscription: Subscription[T] = Subscription(buffer_size, policy, partial(self._unsubscribe, blockchain))
+        with self._lock:
+            if self._state.subscribe(blockchain, subscription):
+                pipeline = Thread(target=self._run, args=(blockchain,), name=f"stocra-hub-{blockchain}", daemon=True)
+                self._state.started(blockchain, pipeline)
+                pipeline.start()
+
+        return subscription
+
+    def close(self) -> None:
+        with self._lock:
+            # pipelines stop at their next item
+            subscriptions, _ = self._state.close()
+
+        for subscription in subscriptions:
+            subscription._finish(None)  # pylint: disable=protected-access
+
+    def _unsubscribe(self, blockchain: str, subscription: Subscription[T]) -> None:
+        with self._lock:
+            # pipeline stops at its next item
+            self._state.unsubscribe(blockchain, subscription)
+
+    def _run(self, blockchain: str) -> None:
+        # pylint: disable=protected-access
+        pipeline = current_thread()
+        error: Optional[BaseException] = None
+        try:
+            for item in self._stream(blockchain):
+                with self._lock:
+                    if not self._state.is_current(blockchain, pipeline):
+                        break
+
+                    subscriptions = self._state.subscriptions(blockchain)
+
+                for subscription in subscriptions:
+                    if not subscription._put(item):
+                        self._unsubscribe(blockchain, subscription)
+        except Exception as exception:  # pylint: disable=broad-except
+            logger.exception("%s: hub pipeline failed", blockchain)
+            error = exception
+        finally:
+            with self._lock:
+                subscriptions = self._state.stopped(blockchain, pipeline)
+
+            for subscription in subscriptions:
+                subscription._finish(error)
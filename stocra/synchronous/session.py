@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import socket
+from functools import partial
+from typing import TYPE_CHECKING, Any, Iterable, List, Optional, Tuple
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.exceptions import HTTPError
+
+from stocra.defaults import (
+    DEFAULT_DNS_CACHE_SECONDS,
+    DEFAULT_KEEPALIVE_SECONDS,
+    DEFAULT_POOL_SIZE,
+)
+
+if TYPE_CHECKING:
+    from stocra.connection_pools import DNSCache
+
+# Number of hosts (one per blockchain and endpoint) whose connection pools are kept open
+POOL_HOSTS = 32
+
+
+def keepalive_socket_options(keepalive_seconds: float) -> List[Tuple[int, int, int]]:
+    options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, int(keepalive_seconds)))
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(int(keepalive_seconds) // 3, 1)))
+
+    return options
+
+
+class CachedDNSHTTPConnection(HTTPConnection):
+    """Connects to the cached address of the host instead of resolving it for every new connection."""
+
+    def __init__(self, *args: Any, dns_cache: Optional[DNSCache] = None, **kwargs: Any) -> None:
+        self._dns_cache = dns_cache
+        super().__init__(*args, **kwargs)
+
+    def _new_conn(self) -> socket.socket:
+        host, dns_cache = self._dns_host, self._dns_cache
+        addresses = dns_cache.resolve(host, self.port) if dns_cache else []
+        if dns_cache is None or not addresses:
+            return super()._new_conn()
+
+        try:
+            for address in addresses[:-1]:
+                try:
+                    return self._new_conn_to(address)
+                except (OSError, HTTPError):
+                    continue
+            return self._new_conn_to(addresses[-1])
+        except (OSError, HTTPError):
+            # the host may have moved, resolve it again on the next connection
+            dns_cache.forget(host, self.port)
+            raise
+        finally:
+            self._dns_host = host  # pylint: disable=attribute-defined-outside-init
+
+    def _new_conn_to(self, address: str) -> socket.socket:
+        # only the socket connects to the cached address, TLS keeps verifying the host name
+        self._dns_host = address  # pylint: disable=attribute-defined-outside-init
+        return super()._new_conn()
+
+
+class CachedDNSHTTPSConnection(CachedDNSHTTPConnection, HTTPSConnection):
+    pass
+
+
+class CachedDNSHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = CachedDNSHTTPConnection
+
+    def __init__(self, *args: Any, dns_cache: DNSCache, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.conn_kw["dns_cache"] = dns_cache
+
+
+class CachedDNSHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = CachedDNSHTTPSConnection
+
+    def __init__(self, *args: Any, dns_cache: DNSCache, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.conn_kw["dns_cache"] = dns_cache
+
+
+class KeepAliveHTTPAdapter(HTTPAdapter):
+    def __init__(
+        self,
+        keepalive_seconds: float = DEFAULT_KEEPALIVE_SECONDS,
+        dns_cache: Optional[DNSCache] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._keepalive_seconds = keepalive_seconds
+        self._dns_cache = dns_cache
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        kwargs["socket_options"] = HTTPConnection.default_socket_options + keepalive_socket_options(
+            self._keepalive_seconds
+        )
+        super().init_poolmanager(*args, **kwargs)
+        if self._dns_cache:
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": partial(CachedDNSHTTPConnectionPool, dns_cache=self._dns_cache),
+                "https": partial(CachedDNSHTTPSConnectionPool, dns_cache=self._dns_cache),
+            }
+
+
+def create_session(
+    pool_size: int = DEFAULT_POOL_SIZE,
+    keepalive_seconds: float = DEFAULT_KEEPALIVE_SECONDS,
+    dns_cache_seconds: int = DEFAULT_DNS_CACHE_SECONDS,
+    dns_cache_hosts: Iterable[str] = ("*",),
+) -> Session:
+    # pylint: disable-next=import-outside-toplevel
+    from stocra.connection_pools import DNSCache
+
+    session = Session()
+    adapter = KeepAliveHTTPAdapter(
+        keepalive_seconds=keepalive_seconds,
+        dns_cache=DNSCache(dns_cache_hosts, ttl=dns_cache_seconds) if dns_cache_seconds > 0 else None,
+        pool_connections=POOL_HOSTS,
+        pool_maxsize=pool_size,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
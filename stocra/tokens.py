@@ -0,0 +1,23 @@
+from decimal import Decimal
+from enum import Enum, unique
+
+from pydantic import BaseModel
+
+
+class Currency(BaseModel):
+    symbol: str
+    name: str
+
+    class Config:
+        frozen = True
+
+
+@unique
+class TokenType(Enum):
+    ERC20 = "ERC20"
+
+
+class Token(BaseModel):
+    currency: Currency
+    scaling: Decimal
+    type: TokenType
@@ -1,6 +1,15 @@
-from typing import cast
+from typing import Optional, cast
+
+from stocra.deadline import Deadline
 
 
 def calculate_sleep(backoff_factor: int) -> int:
     sleep_length = 1 * (2 ** (backoff_factor - 1))
     return cast(int, sleep_length)
+
+
+def limit_sleep(sleep_length: float, deadline: Optional[Deadline]) -> float:
+    if deadline is None:
+        return sleep_length
+
+    return min(sleep_length, deadline.remaining())
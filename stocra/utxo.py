@@ -0,0 +1,143 @@
+import sqlite3
+from collections import OrderedDict
+from decimal import Decimal
+from pathlib import Path
+from threading import Lock
+from typing import Iterable, List, Optional, Set, Tuple, Union
+
+from stocra.models import (
+    Address,
+    Amount,
+    Input,
+    Output,
+    OutputIndex,
+    Transaction,
+    TransactionHash,
+)
+
+OutputKey = Tuple[TransactionHash, OutputIndex]
+# Outputs are kept as plain tuples, building pydantic models for every indexed output is too expensive
+IndexedOutput = Tuple[Address, Decimal, str]
+
+
+class UtxoIndex:
+    """
+    Outputs of recently seen transactions keyed by (transaction hash, output index),
+    used to fill address and amount of inputs which carry only a transaction pointer.
+
+    At most `max_size` outputs are held in memory, least recently used ones are evicted.
+    When `spill_path` is set, evicted outputs are moved to an SQLite database instead of being dropped.
+    """
+
+    def __init__(self, max_size: int = 1_000_000, spill_path: Optional[Union[str, Path]] = None) -> None:
+        if max_size < 1:
+            raise ValueError(f"`max_size` must be greater than 0. Got `{max_size}`")
+
+        self._max_size = max_size
+        self._outputs: "OrderedDict[OutputKey, IndexedOutput]" = OrderedDict()
+        self._spill: Optional[sqlite3.Connection] = None
+        self._lock = Lock()
+        if spill_path is not None:
+            self._spill = sqlite3.connect(str(spill_path), check_same_thread=False)
+            with self._spill:
+                self._spill.execute(
+                    "CREATE TABLE IF NOT EXISTS outputs ("
+                    "transaction_hash TEXT, output_index INTEGER, address TEXT, value TEXT, currency_symbol TEXT, "
+                    "PRIMARY KEY (transaction_hash, output_index))"
+                )
+
+    def __len__(self) -> int:
+        return len(self._outputs)
+
+    def add_transaction(self, transaction: Transaction) -> None:
+        with self._lock:
+            for output_index, output in enumerate(transaction.outputs):
+                key = (transaction.hash, output_index)
+                self._outputs[key] = (output.address, output.amount.value, output.amount.currency_symbol)
+                self._outputs.move_to_end(key)
+
+            if len(self._outputs) > self._max_size:
+                self._evict()
+
+    def get(self, transaction_hash: TransactionHash, output_index: OutputIndex) -> Optional[Output]:
+        with self._lock:
+            indexed_output = self._get((transaction_hash, output_index))
+
+        if indexed_output is None:
+            return None
+
+        address, value, currency_symbol = indexed_output
+        return Output(address=address, amount=Amount(value=value, currency_symbol=currency_symbol))
+
+    def missing_parents(self, transactions: Iterable[Transaction]) -> Set[TransactionHash]:
+        missing = set()
+        with self._lock:
+            for transaction in transactions:
+                for transaction_input in transaction.inputs:
+                    pointer = transaction_input.transaction_pointer
+                    if self._is_resolved(transaction_input) or pointer is None:
+                        continue
+
+                    if self._get((pointer.transaction_hash, pointer.output_index)) is None:
+                        missing.add(pointer.transaction_hash)
+
+        return missing
+
+    def resolve(self, transaction: Transaction) -> Transaction:
+        inputs = [self._resolve_input(transaction_input) for transaction_input in transaction.inputs]
+        return transaction.copy(update=dict(inputs=inputs))
+
+    def close(self) -> None:
+        if self._spill:
+            self._spill.close()
+            self._spill = None
+
+    @classmethod
+    def _is_resolved(cls, transaction_input: Input) -> bool:
+        return transaction_input.address is not None and transaction_input.amount is not None
+
+    def _resolve_input(self, transaction_input: Input) -> Input:
+        pointer = transaction_input.transaction_pointer
+        if self._is_resolved(transaction_input) or pointer is None:
+            return transaction_input
+
+        output = self.get(pointer.transaction_hash, pointer.output_index)
+        if output is None:
+            return transaction_input
+
+        return transaction_input.copy(update=dict(address=output.address, amount=output.amount))
+
+    def _get(self, key: OutputKey) -> Optional[IndexedOutput]:
+        indexed_output = self._outputs.get(key)
+        if indexed_output is not None:
+            self._outputs.move_to_end(key)
+            return indexed_output
+
+        if self._spill is None:
+            return None
+
+        row = self._spill.execute(
+            "SELECT address, value, currency_symbol FROM outputs WHERE transaction_hash = ? AND output_index = ?", key
+        ).fetchone()
+        if row is None:
+            return None
+
+        return row[0], Decimal(row[1]), row[2]
+
+    def _evict(self) -> None:
+        # evict in batches so that the spill database is written in few large transactions
+        evicted: List[Tuple[OutputKey, IndexedOutput]] = []
+        while len(self._outputs) > self._max_size - self._max_size // 10:
+            evicted.append(self._outputs.popitem(last=False))
+
+        if self._spill is None:
+            return
+
+        with self._spill:
+            self._spill.executemany(
+                "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?)",
+                [
+                    (transaction_hash, output_index, address, str(value), currency_symbol)
+                    for (transaction_hash, output_index), (address, value, currency_symbol) in evicted
+                ],
+            )
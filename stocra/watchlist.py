@@ -0,0 +1,39 @@
+import re
+from threading import Lock
+from typing import FrozenSet, Iterable
+
+# addresses are matched in undecoded response bodies, only matching transactions are decoded and validated
+ADDRESS_PATTERN = re.compile(rb'"address"\s*:\s*"([^"]*)"')
+
+
+class Watchlist:
+    """
+    Set of watched addresses, safe to update while a filtered stream is running.
+    Updates replace the whole set (copy-on-write) so that matching never takes a lock.
+    """
+
+    def __init__(self, addresses: Iterable[str] = ()) -> None:
+        self._addresses: FrozenSet[bytes] = frozenset(address.encode() for address in addresses)
+        self._lock = Lock()
+
+    def __contains__(self, address: str) -> bool:
+        return address.encode() in self._addresses
+
+    def __len__(self) -> int:
+        return len(self._addresses)
+
+    def add(self, addresses: Iterable[str]) -> None:
+        with self._lock:
+            self._addresses = self._addresses | {address.encode() for address in addresses}
+
+    def remove(self, addresses: Iterable[str]) -> None:
+        with self._lock:
+            self._addresses = self._addresses - {address.encode() for address in addresses}
+
+    def replace(self, addresses: Iterable[str]) -> None:
+        with self._lock:
+            self._addresses = frozenset(address.encode() for address in addresses)
+
+    def matches(self, body: bytes) -> bool:
+        addresses = self._addresses
+        return any(address in addresses for address in ADDRESS_PATTERN.findall(body))
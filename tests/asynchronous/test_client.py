@@ -1,22 +1,46 @@
+import asyncio
 import json
 from asyncio import Semaphore
+from dataclasses import astuple
 from decimal import Decimal
+from time import monotonic
 from unittest.mock import patch
 
 import pytest
 import pytest_asyncio
+from aiohttp import ClientResponseError
 from aioresponses import aioresponses
 
 from stocra.asynchronous.client import Stocra
+from stocra.checkpoint import FileCheckpointStore
+from stocra.deadline import DeadlineExceeded
+from stocra.models import AncestryEdge, RawTransaction, StocraHTTPError, Transaction
+from stocra.monitoring import StreamMonitor
+from stocra.profiling import Phase, Profiler
+from stocra.reorg import BlockRollback
+from stocra.utxo import UtxoIndex
+from stocra.watchlist import Watchlist
 from tests.fixtures import (
     BASE_URL,
     BLOCK_100,
     BLOCK_101,
+    BLOCK_101_REORG,
+    DESCENDANT_TRANSACTION,
+    MIRROR_URL,
+    SPENDING_TRANSACTION,
     TOKEN_CONTRACT_ADDRESS,
     TOKEN_RESPONSE,
     TRANSACTION_BLOCK_100,
     TRANSACTION_BLOCK_101,
 )
+from tests.local_server import LocalServer, local_server
+
+ANCESTRY_EDGES = [
+    AncestryEdge(DESCENDANT_TRANSACTION.hash, SPENDING_TRANSACTION.hash, 0, 1),
+    AncestryEdge(DESCENDANT_TRANSACTION.hash, TRANSACTION_BLOCK_100.hash, 0, 1),
+    AncestryEdge(SPENDING_TRANSACTION.hash, TRANSACTION_BLOCK_100.hash, 0, 2),
+    AncestryEdge(SPENDING_TRANSACTION.hash, TRANSACTION_BLOCK_101.hash, 0, 2),
+]
 
 
 @pytest_asyncio.fixture
@@ -32,6 +56,11 @@ async def default_responses():
         yield
 
 
+@pytest.fixture
+def server():
+    yield from local_server()
+
+
 @pytest_asyncio.fixture(params=[dict(semaphore=None), dict(semaphore=Semaphore(2))])
 async def client(request) -> Stocra:
     client_instance = Stocra(**request.param)
@@ -70,6 +99,47 @@ async def test_get_all_transactions_of_block(client: Stocra, default_responses)
     assert transactions == [TRANSACTION_BLOCK_100]
 
 
+@pytest.mark.asyncio
+async def test_get_transaction_streaming(client: Stocra, default_responses) -> None:
+    transaction = await client.get_transaction_streaming("bitcoin", TRANSACTION_BLOCK_100.hash)
+    assert transaction == TRANSACTION_BLOCK_100
+
+
+@pytest.mark.asyncio
+async def test_get_all_transactions_of_block_streaming(client: Stocra) -> None:
+    block = BLOCK_100.copy(update=dict(transactions=[TRANSACTION_BLOCK_100.hash, TRANSACTION_BLOCK_101.hash]))
+    with aioresponses() as mocked:
+        mocked.get(f"{BASE_URL}/blocks/{block.height}", body=block.json())
+        mocked.get(f"{BASE_URL}/transactions/{TRANSACTION_BLOCK_100.hash}", body=TRANSACTION_BLOCK_100.json())
+        mocked.get(f"{BASE_URL}/transactions/{TRANSACTION_BLOCK_101.hash}", body=TRANSACTION_BLOCK_101.json())
+        transactions = client.get_all_transactions_of_block_streaming("bitcoin", block.height, max_pending=1)
+        assert [transaction async for transaction in transactions] == [TRANSACTION_BLOCK_100, TRANSACTION_BLOCK_101]
+
+
+@pytest.mark.asyncio
+async def test_get_all_transactions_of_block_streaming_slow_consumer(server: LocalServer) -> None:
+    # long hashes make the consumer go through many chunks of the block
+    transaction = TRANSACTION_BLOCK_100.copy(update=dict(hash="a" * 1_000))
+    block = BLOCK_100.copy(update=dict(transactions=[transaction.hash] * 5_000))
+    server.compress = False
+    server.add(f"/blocks/{block.height}", block.json().encode())
+    server.add(f"/transactions/{transaction.hash}", transaction.json().encode())
+    client = Stocra(endpoints=dict(bitcoin=[server.url]), request_timeout=0.5)
+    transactions = client.get_all_transactions_of_block_streaming("bitcoin", block.height, max_pending=10)
+    # the block is read at the pace of the consumer, longer than the request timeout
+    started_at = monotonic()
+    consumed = 0
+    async for streamed_transaction in transactions:
+        assert streamed_transaction == transaction
+        consumed += 1
+        if monotonic() - started_at > 1.5:
+            break
+
+    await transactions.aclose()
+    await client.close()
+    assert consumed > 100
+
+
 @pytest.mark.asyncio
 async def test_stream_new_blocks(client: Stocra, default_responses) -> None:
     blocks = client.stream_new_blocks("bitcoin", BLOCK_100.hash)
@@ -77,6 +147,88 @@ async def test_stream_new_blocks(client: Stocra, default_responses) -> None:
     assert await anext(blocks) == BLOCK_101
 
 
+@pytest.mark.asyncio
+async def test_profiler(default_responses) -> None:
+    profiler = Profiler()
+    client = Stocra(profiler=profiler)
+    transactions = client.stream_new_transactions("bitcoin", BLOCK_100.hash)
+    assert await anext(transactions) == (BLOCK_100, TRANSACTION_BLOCK_100)
+    await client.close()
+
+    stats = {phase_stats.phase: phase_stats for phase_stats in profiler.stats()}
+    assert stats[Phase.NETWORK].calls >= 2
+    assert stats[Phase.DECODE].calls >= 2
+    assert stats[Phase.VALIDATION].calls >= 2
+    assert Phase.CONSUMER not in stats
+
+
+@pytest.mark.asyncio
+async def test_profiler_network_once_per_request(default_responses) -> None:
+    profiler = Profiler()
+    client = Stocra(profiler=profiler)
+    assert await client.get_block("bitcoin", BLOCK_100.hash) == BLOCK_100
+    assert await client.get_transaction("bitcoin", TRANSACTION_BLOCK_100.hash) == TRANSACTION_BLOCK_100
+    assert (await client.get_block_raw("bitcoin", BLOCK_100.height)).hash == BLOCK_100.hash
+    await client.close()
+
+    stats = {phase_stats.phase: phase_stats for phase_stats in profiler.stats()}
+    assert stats[Phase.NETWORK].calls == 3
+    assert stats[Phase.DECODE].calls == 3
+    assert stats[Phase.VALIDATION].calls == 2
+
+
+@pytest.mark.asyncio
+async def test_profiler_retry_and_consumer() -> None:
+    async def retry_once(error: StocraHTTPError) -> bool:
+        return error.iteration < 2
+
+    profiler = Profiler()
+    client = Stocra(profiler=profiler, error_handlers=[retry_once])
+    with aioresponses() as mocked:
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_100.hash}", status=503)
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_100.hash}", body=BLOCK_100.json())
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height}", body=BLOCK_101.json())
+        blocks = client.stream_new_blocks("bitcoin", BLOCK_100.hash)
+        assert await anext(blocks) == BLOCK_100
+        assert await anext(blocks) == BLOCK_101
+
+    await client.close()
+    stats = {phase_stats.phase: phase_stats for phase_stats in profiler.stats()}
+    # blocks loaded ahead are retried too
+    assert stats[Phase.RETRY].calls >= 1
+    assert stats[Phase.CONSUMER].calls == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_new_blocks_monitor(client: Stocra, default_responses) -> None:
+    monitor = StreamMonitor()
+    blocks = client.stream_new_blocks("bitcoin", BLOCK_100.hash, monitor=monitor)
+    assert await anext(blocks) == BLOCK_100
+    assert await anext(blocks) == BLOCK_101
+
+    snapshot = monitor.snapshot()
+    assert snapshot.blocks == 2
+    assert snapshot.last is not None
+    assert snapshot.last.height == BLOCK_101.height
+    assert snapshot.last.tip_to_delivery_seconds is not None
+    assert snapshot.last.prefetch_window is not None
+
+
+@pytest.mark.asyncio
+async def test_stream_new_transactions_monitor(client: Stocra, default_responses) -> None:
+    monitor = StreamMonitor()
+    transactions = client.stream_new_transactions("bitcoin", BLOCK_100.hash, monitor=monitor)
+    assert await anext(transactions) == (BLOCK_100, TRANSACTION_BLOCK_100)
+    assert monitor.snapshot().blocks == 0
+    assert await anext(transactions) == (BLOCK_101, TRANSACTION_BLOCK_101)
+
+    snapshot = monitor.snapshot()
+    assert snapshot.blocks == 1
+    assert snapshot.last is not None
+    assert snapshot.last.height == BLOCK_100.height
+    assert snapshot.average_transactions_fetch_seconds is not None
+
+
 @pytest.mark.asyncio
 @patch("stocra.asynchronous.client.asyncio.sleep")
 async def test_stream_new_blocks_not_found(patch_sleep, client: Stocra) -> None:
@@ -92,6 +244,62 @@ async def test_stream_new_blocks_not_found(patch_sleep, client: Stocra) -> None:
         patch_sleep.assert_called_with(0.5)
 
 
+@pytest.mark.asyncio
+@patch("stocra.asynchronous.client.asyncio.sleep")
+async def test_stream_new_blocks_reorg_aware(patch_sleep, client: Stocra) -> None:
+    with aioresponses() as mocked:
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_100.hash}", body=BLOCK_100.json())
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_100.height}", body=BLOCK_100.json(), repeat=True)
+        # streamed, verified after it was streamed, verified at the tip, verified after the tip changed
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height}", body=BLOCK_101.json())
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height}", body=BLOCK_101.json())
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height}", body=BLOCK_101_REORG.json(), repeat=True)
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height + 1}", status=404, repeat=True)
+        events = client.stream_new_blocks_reorg_aware("bitcoin", BLOCK_100.hash, sleep_interval_seconds=0.5)
+        assert await anext(events) == BLOCK_100
+        assert await anext(events) == BLOCK_101
+        assert await anext(events) == BlockRollback(
+            height=BLOCK_101.height, blocks=[(BLOCK_101.height, BLOCK_101.hash)]
+        )
+        assert await anext(events) == BLOCK_101_REORG
+        patch_sleep.assert_called_once_with(0.5)
+
+
+@pytest.mark.asyncio
+async def test_stream_new_blocks_reorg_of_start_block(client: Stocra) -> None:
+    with aioresponses() as mocked:
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.hash}", body=BLOCK_101.json())
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height}", body=BLOCK_101_REORG.json(), repeat=True)
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height + 1}", status=404)
+        events = client.stream_new_blocks_reorg_aware("bitcoin", BLOCK_101.hash)
+        assert await anext(events) == BLOCK_101
+        assert await anext(events) == BlockRollback(
+            height=BLOCK_101.height, blocks=[(BLOCK_101.height, BLOCK_101.hash)]
+        )
+        assert await anext(events) == BLOCK_101_REORG
+
+
+@pytest.mark.asyncio
+async def test_stream_new_transactions_reorg_aware(client: Stocra) -> None:
+    with aioresponses() as mocked:
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_100.hash}", body=BLOCK_100.json())
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_100.height}", body=BLOCK_100.json(), repeat=True)
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height}", body=BLOCK_101.json())
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height}", body=BLOCK_101_REORG.json(), repeat=True)
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height + 1}", status=404, repeat=True)
+        mocked.get(f"{BASE_URL}/transactions/{TRANSACTION_BLOCK_100.hash}", body=TRANSACTION_BLOCK_100.json())
+        mocked.get(
+            f"{BASE_URL}/transactions/{TRANSACTION_BLOCK_101.hash}", body=TRANSACTION_BLOCK_101.json(), repeat=True
+        )
+        events = client.stream_new_transactions_reorg_aware("bitcoin", BLOCK_100.hash)
+        assert await anext(events) == (BLOCK_100, TRANSACTION_BLOCK_100)
+        assert await anext(events) == (BLOCK_101, TRANSACTION_BLOCK_101)
+        assert await anext(events) == BlockRollback(
+            height=BLOCK_101.height, blocks=[(BLOCK_101.height, BLOCK_101.hash)]
+        )
+        assert await anext(events) == (BLOCK_101_REORG, TRANSACTION_BLOCK_101)
+
+
 @pytest.mark.asyncio
 async def test_stream_new_transactions(client: Stocra, default_responses) -> None:
     transactions = client.stream_new_transactions("bitcoin", start_block_hash_or_height=BLOCK_100.hash)
@@ -105,3 +313,212 @@ async def test_scale_token_value(client: Stocra):
         mocked.get("https://ethereum.stocra.com/v1.0/tokens", body=json.dumps(TOKEN_RESPONSE))
         value = await client.scale_token_value("ethereum", TOKEN_CONTRACT_ADDRESS, Decimal("325000000"))
         assert value == Decimal("325")
+
+
+@pytest.mark.asyncio
+async def test_failover_to_mirror() -> None:
+    client = Stocra(endpoints=dict(bitcoin=[BASE_URL, MIRROR_URL]))
+    with aioresponses() as mocked:
+        mocked.get(f"{BASE_URL}/blocks/latest", status=503)
+        mocked.get(f"{MIRROR_URL}/blocks/latest", body=BLOCK_100.json())
+        assert await client.get_block("bitcoin") == BLOCK_100
+
+    stats = {endpoint.url: endpoint for endpoint in client.endpoint_stats("bitcoin")}
+    assert stats[BASE_URL].failures == 1
+    assert stats[MIRROR_URL].requests == 1
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_request_releases_endpoint(client: Stocra) -> None:
+    started = asyncio.Event()
+
+    async def hanging_get(*args, **kwargs) -> None:
+        started.set()
+        await asyncio.sleep(10)
+
+    with patch.object(client._session, "get", hanging_get):
+        task = asyncio.create_task(client.get_transaction("bitcoin", TRANSACTION_BLOCK_100.hash))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    [stats] = client.endpoint_stats("bitcoin")
+    assert stats.in_flight == 0
+    assert stats.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_warm_up(server: LocalServer) -> None:
+    server.add(f"/blocks/{BLOCK_100.height}", BLOCK_100.json().encode())
+    client = Stocra(endpoints=dict(bitcoin=[server.url]), pool_size=2)
+    await client.warm_up(["bitcoin"], connections=3)
+    assert server.wait_for_connections(2) == 2
+
+    assert await client.get_block("bitcoin", BLOCK_100.height) == BLOCK_100
+    assert len(server.connections) == 2
+
+    stats = client.pool_stats()[server.url.split("/")[2]]
+    assert stats.warmed_up == 2
+    assert stats.requests == 1
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_get_all_transactions_of_block_cancels_siblings(client: Stocra) -> None:
+    block = BLOCK_100.copy(update=dict(transactions=[TRANSACTION_BLOCK_100.hash, TRANSACTION_BLOCK_101.hash]))
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def hanging_get(blockchain: str, endpoint: str, deadline=None) -> dict:
+        if endpoint.endswith(TRANSACTION_BLOCK_101.hash):
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        await started.wait()
+        raise ClientResponseError(request_info=None, history=(), status=500)
+
+    with patch.object(client, "_get", hanging_get):
+        with pytest.raises(ClientResponseError):
+            async for _ in client.get_all_transactions_of_block("bitcoin", block):
+                pass
+
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_get_all_transactions_of_block_deadline(client: Stocra) -> None:
+    async def hanging_get(blockchain: str, endpoint: str, deadline=None) -> dict:
+        await asyncio.sleep(10)
+
+    with patch.object(client, "_get", hanging_get):
+        with pytest.raises(DeadlineExceeded):
+            async for _ in client.get_all_transactions_of_block("bitcoin", BLOCK_100, timeout=0.1):
+                pass
+
+
+@pytest.mark.asyncio
+async def test_conditional_latest_block(server: LocalServer) -> None:
+    server.add("/blocks/latest", BLOCK_100.json().encode(), headers={"ETag": '"100"'})
+    client = Stocra(endpoints=dict(bitcoin=[server.url]))
+    first = await client.get_block("bitcoin")
+    second = await client.get_block("bitcoin")
+    assert first == BLOCK_100
+    assert second is first
+
+    server.add("/blocks/latest", BLOCK_101.json().encode(), headers={"ETag": '"101"'})
+    assert await client.get_block("bitcoin") == BLOCK_101
+
+    method, path, headers = server.requests[1]
+    assert headers["If-None-Match"] == '"100"'
+    assert "gzip" in headers["Accept-Encoding"]
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_conditional_tokens(server: LocalServer) -> None:
+    last_modified = "Wed, 21 Oct 2015 07:28:00 GMT"
+    server.add("/tokens", json.dumps(TOKEN_RESPONSE).encode(), headers={"Last-Modified": last_modified})
+    client = Stocra(endpoints=dict(ethereum=[server.url]))
+    tokens = await client.get_tokens("ethereum", refresh=True)
+    assert await client.get_tokens("ethereum", refresh=True) is tokens
+    assert server.requests[1][2]["If-Modified-Since"] == last_modified
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_new_transactions_raw(client: Stocra, default_responses) -> None:
+    transactions = client.stream_new_transactions_raw("bitcoin", start_block_hash_or_height=BLOCK_100.hash)
+    block, transaction = await anext(transactions)
+    assert (block.height, block.hash, block.transactions) == (BLOCK_100.height, BLOCK_100.hash, BLOCK_100.transactions)
+    assert transaction == RawTransaction(hash=TRANSACTION_BLOCK_100.hash, body=TRANSACTION_BLOCK_100.json().encode())
+    block, transaction = await anext(transactions)
+    assert block.body == BLOCK_101.json().encode()
+    assert Transaction.parse_raw(transaction.body) == TRANSACTION_BLOCK_101
+
+
+@pytest.mark.asyncio
+async def test_stream_new_transactions_checkpoint(client: Stocra, tmp_path) -> None:
+    block = BLOCK_100.copy(update=dict(transactions=[TRANSACTION_BLOCK_100.hash, TRANSACTION_BLOCK_101.hash]))
+    store = FileCheckpointStore(tmp_path)
+    with aioresponses() as mocked:
+        mocked.get(f"{BASE_URL}/blocks/latest", body=block.json(), repeat=True)
+        mocked.get(f"{BASE_URL}/blocks/{block.height}", body=block.json(), repeat=True)
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height}", body=BLOCK_101.json(), repeat=True)
+        for transaction in [TRANSACTION_BLOCK_100, TRANSACTION_BLOCK_101]:
+            mocked.get(f"{BASE_URL}/transactions/{transaction.hash}", body=transaction.json(), repeat=True)
+
+        transactions = client.stream_new_transactions("bitcoin", checkpoint_store=store)
+        first_block, first = await anext(transactions)
+        await anext(transactions)
+        # processed transactions are written in batches, the rest when the stream is closed
+        await transactions.aclose()
+        assert store.load("bitcoin").processed == {first.hash}
+
+        resumed = client.stream_new_transactions("bitcoin", checkpoint_store=store)
+        second_block, second = await anext(resumed)
+        assert second_block == first_block == block
+        assert {first.hash, second.hash} == set(block.transactions)
+
+        assert await anext(resumed) == (BLOCK_101, TRANSACTION_BLOCK_101)
+        assert store.load("bitcoin").committed_height == block.height
+
+
+@pytest.mark.asyncio
+async def test_resolve_inputs(client: Stocra) -> None:
+    index = UtxoIndex()
+    with aioresponses() as mocked:
+        mocked.get(f"{BASE_URL}/transactions/{TRANSACTION_BLOCK_101.hash}", body=TRANSACTION_BLOCK_101.json())
+        resolved = await client.resolve_inputs("bitcoin", [TRANSACTION_BLOCK_100, SPENDING_TRANSACTION], index)
+        assert resolved[0] == TRANSACTION_BLOCK_100
+        assert [transaction_input.address for transaction_input in resolved[1].inputs] == [
+            TRANSACTION_BLOCK_100.outputs[0].address,
+            TRANSACTION_BLOCK_101.outputs[0].address,
+        ]
+
+        # parent is served from the index, no request is mocked for it anymore
+        resolved = await client.resolve_inputs("bitcoin", [SPENDING_TRANSACTION], index)
+        assert resolved[0].inputs[1].amount == TRANSACTION_BLOCK_101.outputs[0].amount
+
+
+@pytest.mark.asyncio
+async def test_trace_ancestry(client: Stocra) -> None:
+    with aioresponses() as mocked:
+        for transaction in [DESCENDANT_TRANSACTION, SPENDING_TRANSACTION, TRANSACTION_BLOCK_100]:
+            mocked.get(f"{BASE_URL}/transactions/{transaction.hash}", body=transaction.json())
+
+        edges = [edge async for edge in client.trace_ancestry("bitcoin", DESCENDANT_TRANSACTION.hash, max_hops=2)]
+        assert sorted(edges, key=astuple) == sorted(ANCESTRY_EDGES, key=astuple)
+
+
+@pytest.mark.asyncio
+async def test_trace_ancestry_max_hops(client: Stocra) -> None:
+    with aioresponses() as mocked:
+        mocked.get(f"{BASE_URL}/transactions/{DESCENDANT_TRANSACTION.hash}", body=DESCENDANT_TRANSACTION.json())
+        edges = [edge async for edge in client.trace_ancestry("bitcoin", DESCENDANT_TRANSACTION.hash, max_hops=1)]
+        assert sorted(edges, key=astuple) == sorted(ANCESTRY_EDGES[:2], key=astuple)
+
+
+@pytest.mark.asyncio
+async def test_stream_new_transactions_filtered(client: Stocra) -> None:
+    block = BLOCK_100.copy(update=dict(transactions=[TRANSACTION_BLOCK_100.hash, SPENDING_TRANSACTION.hash]))
+    output = TRANSACTION_BLOCK_101.outputs[0].copy(update=dict(address="test_address_watched"))
+    watched = TRANSACTION_BLOCK_101.copy(update=dict(hash="test_watched_transaction_hash", outputs=[output]))
+    next_block = BLOCK_101.copy(update=dict(transactions=[TRANSACTION_BLOCK_101.hash, watched.hash]))
+    watchlist = Watchlist(["test_address_spending"])
+    with aioresponses() as mocked:
+        mocked.get(f"{BASE_URL}/blocks/{block.height}", body=block.json())
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height}", body=next_block.json())
+        for transaction in [TRANSACTION_BLOCK_100, TRANSACTION_BLOCK_101, SPENDING_TRANSACTION, watched]:
+            mocked.get(f"{BASE_URL}/transactions/{transaction.hash}", body=transaction.json())
+
+        transactions = client.stream_new_transactions_filtered("bitcoin", watchlist, block.height).__aiter__()
+        assert await transactions.__anext__() == (block, SPENDING_TRANSACTION)
+
+        watchlist.add(["test_address_watched"])
+        assert await transactions.__anext__() == (next_block, watched)
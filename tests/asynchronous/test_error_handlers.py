@@ -10,6 +10,8 @@ from stocra.asynchronous.error_handlers import (
     retry_on_timeout_error,
     retry_on_too_many_requests,
 )
+from stocra.deadline import DeadlineExceeded
+from stocra.models import StocraHTTPError
 from tests.fixtures import BASE_URL, BLOCK_100
 
 
@@ -44,3 +46,17 @@ async def test_retry_on_timeout_error() -> None:
         block = await client.get_block("bitcoin", hash_or_height=BLOCK_100.height)
         assert block == BLOCK_100
     await client.close()
+
+
+@pytest.mark.asyncio
+async def test_retry_stops_at_deadline() -> None:
+    async def retry_forever(error: StocraHTTPError) -> bool:
+        await asyncio.sleep(0.05)
+        return True
+
+    client = Stocra(error_handlers=[retry_forever])
+    with aioresponses() as mocked:
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_100.height}", status=503, repeat=True)
+        with pytest.raises(DeadlineExceeded):
+            await client.get_block("bitcoin", hash_or_height=BLOCK_100.height, timeout=0.2)
+    await client.close()
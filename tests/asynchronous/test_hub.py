@@ -0,0 +1,139 @@
+import asyncio
+from typing import AsyncIterable
+
+import pytest
+
+from stocra.asynchronous.hub import StreamHub
+from stocra.hub import SlowConsumerPolicy, SubscriberDetached
+
+
+class Stream:
+    def __init__(self, items: int, error: bool = False) -> None:
+        self.items = items
+        self.error = error
+        self.calls = 0
+        self.start = asyncio.Event()
+        self.done = asyncio.Event()
+        self.closed = asyncio.Event()
+
+    async def __call__(self, blockchain: str) -> AsyncIterable[int]:
+        self.calls += 1
+        await self.start.wait()
+        try:
+            for item in range(self.items):
+                yield item
+        finally:
+            self.closed.set()
+
+        self.done.set()
+        if self.error:
+            raise ValueError(blockchain)
+
+
+@pytest.mark.asyncio
+async def test_broadcast() -> None:
+    stream = Stream(items=5)
+    hub = StreamHub(stream)
+    first = hub.subscribe("bitcoin")
+    second = hub.subscribe("bitcoin", buffer_size=5)
+    stream.start.set()
+
+    assert [item async for item in first] == list(range(5))
+    assert [item async for item in second] == list(range(5))
+    assert stream.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest() -> None:
+    stream = Stream(items=5)
+    hub = StreamHub(stream)
+    subscription = hub.subscribe("bitcoin", buffer_size=2, policy=SlowConsumerPolicy.DROP_OLDEST)
+    stream.start.set()
+    await stream.done.wait()
+
+    assert [item async for item in subscription] == [3, 4]
+    assert subscription.dropped == 3
+
+
+@pytest.mark.asyncio
+async def test_detach() -> None:
+    stream = Stream(items=3)
+    hub = StreamHub(stream)
+    detached = hub.subscribe("bitcoin", buffer_size=1, policy=SlowConsumerPolicy.DETACH)
+    subscription = hub.subscribe("bitcoin", buffer_size=3)
+    stream.start.set()
+    await stream.done.wait()
+
+    assert await detached.__anext__() == 0
+    with pytest.raises(SubscriberDetached):
+        await detached.__anext__()
+
+    assert [item async for item in subscription] == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_stream_error() -> None:
+    stream = Stream(items=1, error=True)
+    hub = StreamHub(stream)
+    subscription = hub.subscribe("bitcoin")
+    stream.start.set()
+
+    assert await subscription.__anext__() == 0
+    with pytest.raises(ValueError):
+        await subscription.__anext__()
+
+
+@pytest.mark.asyncio
+async def test_close() -> None:
+    stream = Stream(items=1)
+    hub = StreamHub(stream)
+    subscription = hub.subscribe("bitcoin")
+    await hub.close()
+
+    assert [item async for item in subscription] == []
+    with pytest.raises(ValueError):
+        hub.subscribe("bitcoin")
+
+
+@pytest.mark.asyncio
+async def test_block_waits_for_slow_subscriber() -> None:
+    stream = Stream(items=5)
+    hub = StreamHub(stream)
+    subscription = hub.subscribe("bitcoin", buffer_size=1)
+    stream.start.set()
+
+    await asyncio.sleep(0.1)
+    assert not stream.done.is_set()
+    assert [item async for item in subscription] == list(range(5))
+
+
+@pytest.mark.asyncio
+async def test_pipeline_stops_without_subscribers() -> None:
+    stream = Stream(items=1_000)
+    hub = StreamHub(stream)
+    subscription = hub.subscribe("bitcoin", buffer_size=1)
+    stream.start.set()
+    assert await subscription.__anext__() == 0
+
+    await subscription.close()
+    await asyncio.wait_for(stream.closed.wait(), timeout=1)
+    assert not stream.done.is_set()
+
+    resubscribed = hub.subscribe("bitcoin", buffer_size=1)
+    assert await resubscribed.__anext__() == 0
+    assert stream.calls == 2
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_pipeline_stops_when_last_subscriber_detaches() -> None:
+    stream = Stream(items=1_000)
+    hub = StreamHub(stream)
+    subscription = hub.subscribe("bitcoin", buffer_size=1, policy=SlowConsumerPolicy.DETACH)
+    stream.start.set()
+
+    await asyncio.wait_for(stream.closed.wait(), timeout=1)
+    assert not stream.done.is_set()
+    with pytest.raises(SubscriberDetached):
+        async for _ in subscription:
+            pass
@@ -11,9 +11,11 @@ from stocra.models import (
     Token,
     TokenType,
     Transaction,
+    TransactionPointer,
 )
 
 BASE_URL = "https://bitcoin.stocra.com/v1.0"
+MIRROR_URL = "https://bitcoin.mirror.local/v1.0"
 TRANSACTION_BLOCK_100 = Transaction(
     hash="test_transaction_hash_block_100",
     inputs=[Input(address="test_address_input", amount=Amount(value=Decimal("1"), currency_symbol="BTC"))],
@@ -26,6 +28,24 @@ TRANSACTION_BLOCK_101 = Transaction(
     outputs=[Output(address="test_address_output", amount=Amount(value=Decimal("0.8"), currency_symbol="BTC"))],
     fee=Amount(value=Decimal("0.2"), currency_symbol="BTC"),
 )
+SPENDING_TRANSACTION = Transaction(
+    hash="test_spending_transaction_hash",
+    inputs=[
+        Input(transaction_pointer=TransactionPointer(transaction_hash=TRANSACTION_BLOCK_100.hash, output_index=0)),
+        Input(transaction_pointer=TransactionPointer(transaction_hash=TRANSACTION_BLOCK_101.hash, output_index=0)),
+    ],
+    outputs=[Output(address="test_address_spending", amount=Amount(value=Decimal("1.5"), currency_symbol="BTC"))],
+    fee=Amount(value=Decimal("0.1"), currency_symbol="BTC"),
+)
+DESCENDANT_TRANSACTION = Transaction(
+    hash="test_descendant_transaction_hash",
+    inputs=[
+        Input(transaction_pointer=TransactionPointer(transaction_hash=SPENDING_TRANSACTION.hash, output_index=0)),
+        Input(transaction_pointer=TransactionPointer(transaction_hash=TRANSACTION_BLOCK_100.hash, output_index=0)),
+    ],
+    outputs=[Output(address="test_address_descendant", amount=Amount(value=Decimal("2.2"), currency_symbol="BTC"))],
+    fee=Amount(value=Decimal("0.1"), currency_symbol="BTC"),
+)
 BLOCK_100 = Block(
     height=100,
     hash="test_block_hash_100",
@@ -38,6 +58,8 @@ BLOCK_101 = Block(
     timestamp_ms=int(datetime.now().timestamp() * 1_000),
     transactions=[TRANSACTION_BLOCK_101.hash],
 )
+# BLOCK_101 replaced by a reorg
+BLOCK_101_REORG = BLOCK_101.copy(update=dict(hash="test_block_hash_101_reorg"))
 
 TOKEN_CONTRACT_ADDRESS = "0xdAC17F958D2ee523a2206206994597C13D831ec7"
 TOKEN = Token(currency=Currency(symbol="USDT", name="Tether"), scaling="0.000001", type=TokenType.ERC20)
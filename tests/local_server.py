@@ -0,0 +1,114 @@
+import gzip
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from time import monotonic, sleep
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+Route = Tuple[int, Dict[str, str], bytes]
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    # default backlog of 5 drops connections of concurrent clients, which then wait for a retransmit
+    request_queue_size = 128
+
+
+class LocalServer:
+    """
+    Minimal keep-alive HTTP server standing in for the Stocra API in tests.
+    Supports conditional requests (ETag / Last-Modified) and gzip compression.
+    """
+
+    def __init__(self) -> None:
+        self.compress = True
+        self.routes: Dict[str, Route] = dict()
+        self.requests: List[Tuple[str, str, Dict[str, str]]] = []
+        self.connections: Set[Tuple[str, int]] = set()
+        self._lock = Lock()
+        self._server = _HTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1.0"
+
+    def add(self, path: str, body: bytes, status: int = 200, headers: Optional[Dict[str, str]] = None) -> None:
+        self.routes[path] = (status, headers or dict(), body)
+
+    def wait_for_connections(self, count: int, timeout: float = 1.0) -> int:
+        deadline = monotonic() + timeout
+        while len(self.connections) < count and monotonic() < deadline:
+            sleep(0.01)
+
+        return len(self.connections)
+
+    def start(self) -> "LocalServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self) -> None:
+                super().setup()
+                with server._lock:  # pylint: disable=protected-access
+                    server.connections.add(self.client_address)
+
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                self._respond(with_body=True)
+
+            def do_HEAD(self) -> None:  # pylint: disable=invalid-name
+                self._respond(with_body=False)
+
+            def log_message(self, *args: object) -> None:
+                pass
+
+            def _respond(self, with_body: bool) -> None:
+                with server._lock:  # pylint: disable=protected-access
+                    server.requests.append((self.command, self.path, dict(self.headers)))
+
+                path = self.path[len("/v1.0") :] if self.path.startswith("/v1.0") else self.path
+                status, headers, body = server.routes.get(path, (404, dict(), b"not found"))
+                if status == 200 and self._not_modified(headers):
+                    status, body = 304, b""
+
+                self.send_response(status)
+                if "Content-Type" not in headers:
+                    self.send_header("Content-Type", "application/json")
+
+                if body and server.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body)
+                    self.send_header("Content-Encoding", "gzip")
+
+                for name, value in headers.items():
+                    self.send_header(name, value)
+
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if with_body:
+                    self.wfile.write(body)
+
+            def _not_modified(self, headers: Dict[str, str]) -> bool:
+                if "If-None-Match" in self.headers:
+                    return self.headers["If-None-Match"] == headers.get("ETag")
+
+                if "If-Modified-Since" in self.headers:
+                    return self.headers["If-Modified-Since"] == headers.get("Last-Modified")
+
+                return False
+
+        return Handler
+
+
+def local_server() -> Iterator[LocalServer]:
+    server = LocalServer().start()
+    yield server
+    server.stop()
@@ -1,20 +1,43 @@
+import json
+import socket
 from concurrent.futures import ThreadPoolExecutor
+from dataclasses import astuple
 from decimal import Decimal
 from unittest.mock import patch
 
 import pytest
 import requests_mock
+from requests import HTTPError
 
+from stocra.checkpoint import FileCheckpointStore
+from stocra.models import AncestryEdge, RawTransaction, Transaction
+from stocra.monitoring import StreamMonitor
+from stocra.profiling import Phase, Profiler
+from stocra.reorg import BlockRollback
 from stocra.synchronous.client import Stocra
+from stocra.utxo import UtxoIndex
+from stocra.watchlist import Watchlist
 from tests.fixtures import (
     BASE_URL,
     BLOCK_100,
     BLOCK_101,
+    BLOCK_101_REORG,
+    DESCENDANT_TRANSACTION,
+    MIRROR_URL,
+    SPENDING_TRANSACTION,
     TOKEN_CONTRACT_ADDRESS,
     TOKEN_RESPONSE,
     TRANSACTION_BLOCK_100,
     TRANSACTION_BLOCK_101,
 )
+from tests.local_server import LocalServer, local_server
+
+ANCESTRY_EDGES = [
+    AncestryEdge(DESCENDANT_TRANSACTION.hash, SPENDING_TRANSACTION.hash, 0, 1),
+    AncestryEdge(DESCENDANT_TRANSACTION.hash, TRANSACTION_BLOCK_100.hash, 0, 1),
+    AncestryEdge(SPENDING_TRANSACTION.hash, TRANSACTION_BLOCK_100.hash, 0, 2),
+    AncestryEdge(SPENDING_TRANSACTION.hash, TRANSACTION_BLOCK_101.hash, 0, 2),
+]
 
 
 @pytest.fixture
@@ -30,6 +53,11 @@ def default_responses():
         yield
 
 
+@pytest.fixture
+def server():
+    yield from local_server()
+
+
 @pytest.fixture(params=[dict(executor=None), dict(executor=ThreadPoolExecutor())])
 def client(request) -> Stocra:
     yield Stocra(**request.param)
@@ -60,12 +88,83 @@ def test_get_all_transactions_of_block(client: Stocra, default_responses) -> Non
     assert list(transactions) == [TRANSACTION_BLOCK_100]
 
 
+def test_get_transaction_streaming(client: Stocra, default_responses) -> None:
+    transaction = client.get_transaction_streaming("bitcoin", TRANSACTION_BLOCK_100.hash)
+    assert transaction == TRANSACTION_BLOCK_100
+
+
+def test_get_all_transactions_of_block_streaming(client: Stocra) -> None:
+    block = BLOCK_100.copy(update=dict(transactions=[TRANSACTION_BLOCK_100.hash, TRANSACTION_BLOCK_101.hash]))
+    with requests_mock.Mocker(real_http=False) as mocked:
+        mocked.get(f"{BASE_URL}/blocks/{block.height}", text=block.json())
+        mocked.get(f"{BASE_URL}/transactions/{TRANSACTION_BLOCK_100.hash}", text=TRANSACTION_BLOCK_100.json())
+        mocked.get(f"{BASE_URL}/transactions/{TRANSACTION_BLOCK_101.hash}", text=TRANSACTION_BLOCK_101.json())
+        transactions = client.get_all_transactions_of_block_streaming("bitcoin", block.height, max_pending=1)
+        assert list(transactions) == [TRANSACTION_BLOCK_100, TRANSACTION_BLOCK_101]
+
+
 def test_stream_new_blocks(client: Stocra, default_responses) -> None:
     blocks = client.stream_new_blocks("bitcoin", BLOCK_100.hash)
     assert next(blocks) == BLOCK_100
     assert next(blocks) == BLOCK_101
 
 
+def test_profiler(default_responses) -> None:
+    profiler = Profiler()
+    client = Stocra(profiler=profiler)
+    assert client.get_block("bitcoin", BLOCK_100.hash) == BLOCK_100
+    assert client.get_transaction("bitcoin", TRANSACTION_BLOCK_100.hash) == TRANSACTION_BLOCK_100
+    assert client.get_block_raw("bitcoin", BLOCK_100.hash).hash == BLOCK_100.hash
+
+    stats = {phase_stats.phase: phase_stats for phase_stats in profiler.stats()}
+    assert stats[Phase.NETWORK].calls == 3
+    assert stats[Phase.DECODE].calls == 3
+    assert stats[Phase.VALIDATION].calls == 2
+
+
+def test_profiler_retry_and_consumer() -> None:
+    profiler = Profiler()
+    client = Stocra(profiler=profiler, error_handlers=[lambda error: error.iteration < 2])
+    with requests_mock.Mocker(real_http=False) as mocked:
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_100.hash}", [dict(status_code=503), dict(text=BLOCK_100.json())])
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height}", text=BLOCK_101.json())
+        blocks = client.stream_new_blocks("bitcoin", BLOCK_100.hash)
+        assert next(blocks) == BLOCK_100
+        assert next(blocks) == BLOCK_101
+
+    stats = {phase_stats.phase: phase_stats for phase_stats in profiler.stats()}
+    assert stats[Phase.RETRY].calls == 1
+    assert stats[Phase.NETWORK].calls == 3
+    assert stats[Phase.CONSUMER].calls == 1
+
+
+def test_stream_new_blocks_monitor(client: Stocra, default_responses) -> None:
+    monitor = StreamMonitor()
+    blocks = client.stream_new_blocks("bitcoin", BLOCK_100.hash, monitor=monitor)
+    assert next(blocks) == BLOCK_100
+    assert next(blocks) == BLOCK_101
+
+    snapshot = monitor.snapshot()
+    assert snapshot.blocks == 2
+    assert snapshot.last is not None
+    assert snapshot.last.height == BLOCK_101.height
+    assert snapshot.last.tip_to_delivery_seconds is not None
+
+
+def test_stream_new_transactions_monitor(client: Stocra, default_responses) -> None:
+    monitor = StreamMonitor()
+    transactions = client.stream_new_transactions("bitcoin", BLOCK_100.hash, monitor=monitor)
+    assert next(transactions) == (BLOCK_100, TRANSACTION_BLOCK_100)
+    assert monitor.snapshot().blocks == 0
+    assert next(transactions) == (BLOCK_101, TRANSACTION_BLOCK_101)
+
+    snapshot = monitor.snapshot()
+    assert snapshot.blocks == 1
+    assert snapshot.last is not None
+    assert snapshot.last.height == BLOCK_100.height
+    assert snapshot.average_transactions_fetch_seconds is not None
+
+
 @patch("stocra.synchronous.client.sleep")
 def test_stream_new_blocks_not_found(patch_sleep, client: Stocra) -> None:
     with requests_mock.Mocker(real_http=False) as mocked:
@@ -79,6 +178,55 @@ def test_stream_new_blocks_not_found(patch_sleep, client: Stocra) -> None:
         patch_sleep.assert_called_with(0.5)
 
 
+@patch("stocra.synchronous.client.sleep")
+def test_stream_new_blocks_reorg_aware(patch_sleep, client: Stocra) -> None:
+    with requests_mock.Mocker(real_http=False) as mocked:
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_100.hash}", text=BLOCK_100.json())
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_100.height}", text=BLOCK_100.json())
+        mocked.get(
+            f"{BASE_URL}/blocks/{BLOCK_101.height}",
+            # streamed, verified after it was streamed, verified at the tip, verified after the tip changed
+            [dict(text=BLOCK_101.json()), dict(text=BLOCK_101.json()), dict(text=BLOCK_101_REORG.json())],
+        )
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height + 1}", status_code=404)
+        events = client.stream_new_blocks_reorg_aware("bitcoin", BLOCK_100.hash, sleep_interval_seconds=0.5)
+        assert next(events) == BLOCK_100
+        assert next(events) == BLOCK_101
+        assert next(events) == BlockRollback(height=BLOCK_101.height, blocks=[(BLOCK_101.height, BLOCK_101.hash)])
+        assert next(events) == BLOCK_101_REORG
+        patch_sleep.assert_called_once_with(0.5)
+
+
+@patch("stocra.synchronous.client.sleep")
+def test_stream_new_blocks_reorg_of_start_block(patch_sleep, client: Stocra) -> None:
+    with requests_mock.Mocker(real_http=False) as mocked:
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.hash}", text=BLOCK_101.json())
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height}", text=BLOCK_101_REORG.json())
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height + 1}", status_code=404)
+        events = client.stream_new_blocks_reorg_aware("bitcoin", BLOCK_101.hash)
+        assert next(events) == BLOCK_101
+        assert next(events) == BlockRollback(height=BLOCK_101.height, blocks=[(BLOCK_101.height, BLOCK_101.hash)])
+        assert next(events) == BLOCK_101_REORG
+
+
+def test_stream_new_transactions_reorg_aware(client: Stocra) -> None:
+    with requests_mock.Mocker(real_http=False) as mocked:
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_100.hash}", text=BLOCK_100.json())
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_100.height}", text=BLOCK_100.json())
+        mocked.get(
+            f"{BASE_URL}/blocks/{BLOCK_101.height}",
+            [dict(text=BLOCK_101.json()), dict(text=BLOCK_101_REORG.json())],
+        )
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height + 1}", status_code=404)
+        mocked.get(f"{BASE_URL}/transactions/{TRANSACTION_BLOCK_100.hash}", text=TRANSACTION_BLOCK_100.json())
+        mocked.get(f"{BASE_URL}/transactions/{TRANSACTION_BLOCK_101.hash}", text=TRANSACTION_BLOCK_101.json())
+        events = client.stream_new_transactions_reorg_aware("bitcoin", BLOCK_100.hash)
+        assert next(events) == (BLOCK_100, TRANSACTION_BLOCK_100)
+        assert next(events) == (BLOCK_101, TRANSACTION_BLOCK_101)
+        assert next(events) == BlockRollback(height=BLOCK_101.height, blocks=[(BLOCK_101.height, BLOCK_101.hash)])
+        assert next(events) == (BLOCK_101_REORG, TRANSACTION_BLOCK_101)
+
+
 def test_stream_new_transactions(client: Stocra, default_responses) -> None:
     transactions = client.stream_new_transactions("bitcoin", start_block_hash_or_height=BLOCK_100.hash)
     assert next(transactions) == (BLOCK_100, TRANSACTION_BLOCK_100)
@@ -90,3 +238,187 @@ def test_scale_token_value(client: Stocra):
         mocked.get("https://ethereum.stocra.com/v1.0/tokens", json=TOKEN_RESPONSE)
         value = client.scale_token_value("ethereum", TOKEN_CONTRACT_ADDRESS, Decimal("325000000"))
         assert value == Decimal("325")
+
+
+def test_custom_base_url() -> None:
+    client = Stocra(base_url="https://{blockchain}.mirror.local/v1.0")
+    with requests_mock.Mocker(real_http=False) as mocked:
+        mocked.get(f"{MIRROR_URL}/blocks/latest", text=BLOCK_100.json())
+        assert client.get_block("bitcoin") == BLOCK_100
+
+
+def test_failover_to_mirror() -> None:
+    client = Stocra(endpoints=dict(bitcoin=[BASE_URL, MIRROR_URL]))
+    with requests_mock.Mocker(real_http=False) as mocked:
+        mocked.get(f"{BASE_URL}/blocks/latest", status_code=503)
+        mocked.get(f"{MIRROR_URL}/blocks/latest", text=BLOCK_100.json())
+        assert client.get_block("bitcoin") == BLOCK_100
+        assert client.get_block("bitcoin") == BLOCK_100
+
+    stats = {endpoint.url: endpoint for endpoint in client.endpoint_stats("bitcoin")}
+    assert stats[BASE_URL].failures == 1
+    assert stats[MIRROR_URL].requests == 2
+
+
+def test_interrupted_request_releases_endpoint(client: Stocra) -> None:
+    with requests_mock.Mocker(real_http=False) as mocked:
+        mocked.get(f"{BASE_URL}/transactions/{TRANSACTION_BLOCK_100.hash}", exc=KeyboardInterrupt)
+        with pytest.raises(KeyboardInterrupt):
+            client.get_transaction("bitcoin", TRANSACTION_BLOCK_100.hash)
+
+    [stats] = client.endpoint_stats("bitcoin")
+    assert stats.in_flight == 0
+    assert stats.failures == 0
+
+
+def test_no_failover_on_not_found() -> None:
+    client = Stocra(endpoints=dict(bitcoin=[BASE_URL, MIRROR_URL]))
+    with requests_mock.Mocker(real_http=False) as mocked:
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height}", status_code=404)
+        mocked.get(f"{MIRROR_URL}/blocks/{BLOCK_101.height}", status_code=404)
+        with pytest.raises(HTTPError):
+            client.get_block("bitcoin", BLOCK_101.height)
+
+        assert mocked.call_count == 1
+
+
+def test_warm_up(server: LocalServer) -> None:
+    server.add(f"/blocks/{BLOCK_100.height}", BLOCK_100.json().encode())
+    client = Stocra(endpoints=dict(bitcoin=[server.url]), pool_size=2)
+    client.warm_up(["bitcoin"], connections=3)
+    assert server.wait_for_connections(2) == 2
+
+    assert client.get_block("bitcoin", BLOCK_100.height) == BLOCK_100
+    assert len(server.connections) == 2
+
+    stats = client.pool_stats()[server.url.split("/")[2]]
+    assert stats.warmed_up == 2
+    assert stats.requests == 1
+    assert stats.in_use == 0
+    client.close()
+
+
+def test_dns_cache(server: LocalServer) -> None:
+    server.add(f"/blocks/{BLOCK_100.height}", BLOCK_100.json().encode())
+    client = Stocra(endpoints=dict(bitcoin=[server.url.replace("127.0.0.1", "localhost")]))
+    with patch("stocra.connection_pools.socket.getaddrinfo", wraps=socket.getaddrinfo) as getaddrinfo:
+        for _ in range(3):
+            assert client.get_block("bitcoin", BLOCK_100.height) == BLOCK_100
+            client.close()  # next request opens a new connection
+
+    assert len(server.connections) == 3
+    assert [call.args[0] for call in getaddrinfo.call_args_list].count("localhost") == 1
+    client.close()
+
+
+def test_conditional_latest_block(server: LocalServer) -> None:
+    server.add("/blocks/latest", BLOCK_100.json().encode(), headers={"ETag": '"100"'})
+    client = Stocra(endpoints=dict(bitcoin=[server.url]))
+    first = client.get_block("bitcoin")
+    second = client.get_block("bitcoin")
+    assert first == BLOCK_100
+    assert second is first
+
+    server.add("/blocks/latest", BLOCK_101.json().encode(), headers={"ETag": '"101"'})
+    assert client.get_block("bitcoin") == BLOCK_101
+
+    method, path, headers = server.requests[1]
+    assert headers["If-None-Match"] == '"100"'
+    assert "gzip" in headers["Accept-Encoding"]
+    client.close()
+
+
+def test_conditional_tokens(server: LocalServer) -> None:
+    last_modified = "Wed, 21 Oct 2015 07:28:00 GMT"
+    server.add("/tokens", json.dumps(TOKEN_RESPONSE).encode(), headers={"Last-Modified": last_modified})
+    client = Stocra(endpoints=dict(ethereum=[server.url]))
+    tokens = client.get_tokens("ethereum", refresh=True)
+    assert client.get_tokens("ethereum", refresh=True) is tokens
+    assert server.requests[1][2]["If-Modified-Since"] == last_modified
+    client.close()
+
+
+def test_stream_new_transactions_raw(client: Stocra, default_responses) -> None:
+    transactions = client.stream_new_transactions_raw("bitcoin", start_block_hash_or_height=BLOCK_100.hash)
+    block, transaction = next(transactions)
+    assert (block.height, block.hash, block.transactions) == (BLOCK_100.height, BLOCK_100.hash, BLOCK_100.transactions)
+    assert transaction == RawTransaction(hash=TRANSACTION_BLOCK_100.hash, body=TRANSACTION_BLOCK_100.json().encode())
+    block, transaction = next(transactions)
+    assert block.body == BLOCK_101.json().encode()
+    assert Transaction.parse_raw(transaction.body) == TRANSACTION_BLOCK_101
+
+
+def test_stream_new_transactions_checkpoint(client: Stocra, tmp_path) -> None:
+    block = BLOCK_100.copy(update=dict(transactions=[TRANSACTION_BLOCK_100.hash, TRANSACTION_BLOCK_101.hash]))
+    store = FileCheckpointStore(tmp_path)
+    with requests_mock.Mocker(real_http=False) as mocked:
+        mocked.get(f"{BASE_URL}/blocks/latest", text=block.json())
+        mocked.get(f"{BASE_URL}/blocks/{block.height}", text=block.json())
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height}", text=BLOCK_101.json())
+        for transaction in [TRANSACTION_BLOCK_100, TRANSACTION_BLOCK_101]:
+            mocked.get(f"{BASE_URL}/transactions/{transaction.hash}", text=transaction.json())
+
+        transactions = client.stream_new_transactions("bitcoin", checkpoint_store=store)
+        first_block, first = next(transactions)
+        next(transactions)
+        # processed transactions are written in batches, the rest when the stream is closed
+        transactions.close()
+        assert store.load("bitcoin").processed == {first.hash}
+
+        resumed = client.stream_new_transactions("bitcoin", checkpoint_store=store)
+        second_block, second = next(resumed)
+        assert second_block == first_block == block
+        assert {first.hash, second.hash} == set(block.transactions)
+
+        assert next(resumed) == (BLOCK_101, TRANSACTION_BLOCK_101)
+        assert store.load("bitcoin").committed_height == block.height
+
+
+def test_resolve_inputs(client: Stocra) -> None:
+    index = UtxoIndex()
+    with requests_mock.Mocker(real_http=False) as mocked:
+        parent = mocked.get(f"{BASE_URL}/transactions/{TRANSACTION_BLOCK_101.hash}", text=TRANSACTION_BLOCK_101.json())
+        resolved = client.resolve_inputs("bitcoin", [TRANSACTION_BLOCK_100, SPENDING_TRANSACTION], index)
+        assert resolved[0] == TRANSACTION_BLOCK_100
+        assert [transaction_input.address for transaction_input in resolved[1].inputs] == [
+            TRANSACTION_BLOCK_100.outputs[0].address,
+            TRANSACTION_BLOCK_101.outputs[0].address,
+        ]
+        assert parent.call_count == 1
+
+        client.resolve_inputs("bitcoin", [SPENDING_TRANSACTION], index)
+        assert parent.call_count == 1
+
+
+def test_trace_ancestry(client: Stocra) -> None:
+    with requests_mock.Mocker(real_http=False) as mocked:
+        responses = [
+            mocked.get(f"{BASE_URL}/transactions/{transaction.hash}", text=transaction.json())
+            for transaction in [DESCENDANT_TRANSACTION, SPENDING_TRANSACTION, TRANSACTION_BLOCK_100]
+        ]
+        edges = list(client.trace_ancestry("bitcoin", DESCENDANT_TRANSACTION.hash, max_hops=2))
+        assert sorted(edges, key=astuple) == sorted(ANCESTRY_EDGES, key=astuple)
+        assert [response.call_count for response in responses] == [1, 1, 1]
+
+        edges = list(client.trace_ancestry("bitcoin", DESCENDANT_TRANSACTION.hash, max_hops=2, max_nodes=2))
+        assert {edge.child_hash for edge in edges} == {DESCENDANT_TRANSACTION.hash, SPENDING_TRANSACTION.hash}
+        assert responses[2].call_count == 1
+
+
+def test_stream_new_transactions_filtered(client: Stocra) -> None:
+    block = BLOCK_100.copy(update=dict(transactions=[TRANSACTION_BLOCK_100.hash, SPENDING_TRANSACTION.hash]))
+    output = TRANSACTION_BLOCK_101.outputs[0].copy(update=dict(address="test_address_watched"))
+    watched = TRANSACTION_BLOCK_101.copy(update=dict(hash="test_watched_transaction_hash", outputs=[output]))
+    next_block = BLOCK_101.copy(update=dict(transactions=[TRANSACTION_BLOCK_101.hash, watched.hash]))
+    watchlist = Watchlist(["test_address_spending"])
+    with requests_mock.Mocker(real_http=False) as mocked:
+        mocked.get(f"{BASE_URL}/blocks/{block.height}", text=block.json())
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_101.height}", text=next_block.json())
+        for transaction in [TRANSACTION_BLOCK_100, TRANSACTION_BLOCK_101, SPENDING_TRANSACTION, watched]:
+            mocked.get(f"{BASE_URL}/transactions/{transaction.hash}", text=transaction.json())
+
+        transactions = client.stream_new_transactions_filtered("bitcoin", watchlist, block.height)
+        assert next(transactions) == (block, SPENDING_TRANSACTION)
+
+        watchlist.add(["test_address_watched"])
+        assert next(transactions) == (next_block, watched)
@@ -1,6 +1,11 @@
+from time import sleep
+
+import pytest
 import requests_mock
 from requests import Timeout
 
+from stocra.deadline import DeadlineExceeded
+from stocra.models import StocraHTTPError
 from stocra.synchronous.client import Stocra
 from stocra.synchronous.error_handlers import (
     retry_on_bad_gateway,
@@ -50,3 +55,18 @@ def test_retry_on_timeout_error() -> None:
         )
         block = client.get_block("bitcoin", hash_or_height=BLOCK_100.height)
         assert block == BLOCK_100
+
+
+def test_retry_stops_at_deadline() -> None:
+    def retry_forever(error: StocraHTTPError) -> bool:
+        sleep(0.05)
+        return True
+
+    client = Stocra(error_handlers=[retry_forever])
+    with requests_mock.Mocker(real_http=False) as mocked:
+        mocked.get(f"{BASE_URL}/blocks/{BLOCK_100.height}", status_code=503)
+        with pytest.raises(DeadlineExceeded):
+            client.get_block("bitcoin", hash_or_height=BLOCK_100.height, timeout=0.2)
+
+        assert 1 < mocked.call_count < 10
+        assert mocked.last_request.timeout <= 0.2
@@ -0,0 +1,130 @@
+from threading import Event
+from typing import Iterable
+
+import pytest
+
+from stocra.hub import SlowConsumerPolicy, SubscriberDetached
+from stocra.synchronous.hub import StreamHub
+
+
+class Stream:
+    def __init__(self, items: int, error: bool = False) -> None:
+        self.items = items
+        self.error = error
+        self.calls = 0
+        self.start = Event()
+        self.done = Event()
+        self.closed = Event()
+
+    def __call__(self, blockchain: str) -> Iterable[int]:
+        self.calls += 1
+        self.start.wait()
+        try:
+            yield from range(self.items)
+        finally:
+            self.closed.set()
+
+        self.done.set()
+        if self.error:
+            raise ValueError(blockchain)
+
+
+def test_broadcast() -> None:
+    stream = Stream(items=5)
+    hub = StreamHub(stream)
+    first = hub.subscribe("bitcoin")
+    second = hub.subscribe("bitcoin", buffer_size=5)
+    stream.start.set()
+
+    assert list(first) == list(range(5))
+    assert list(second) == list(range(5))
+    assert stream.calls == 1
+
+
+def test_drop_oldest() -> None:
+    stream = Stream(items=5)
+    hub = StreamHub(stream)
+    subscription = hub.subscribe("bitcoin", buffer_size=2, policy=SlowConsumerPolicy.DROP_OLDEST)
+    stream.start.set()
+    stream.done.wait()
+
+    assert list(subscription) == [3, 4]
+    assert subscription.dropped == 3
+
+
+def test_detach() -> None:
+    stream = Stream(items=3)
+    hub = StreamHub(stream)
+    detached = hub.subscribe("bitcoin", buffer_size=1, policy=SlowConsumerPolicy.DETACH)
+    subscription = hub.subscribe("bitcoin", buffer_size=3)
+    stream.start.set()
+    stream.done.wait()
+
+    assert next(detached) == 0
+    with pytest.raises(SubscriberDetached):
+        next(detached)
+
+    assert list(subscription) == [0, 1, 2]
+
+
+def test_stream_error() -> None:
+    stream = Stream(items=1, error=True)
+    hub = StreamHub(stream)
+    subscription = hub.subscribe("bitcoin")
+    stream.start.set()
+
+    assert next(subscription) == 0
+    with pytest.raises(ValueError):
+        next(subscription)
+
+
+def test_close() -> None:
+    stream = Stream(items=1)
+    hub = StreamHub(stream)
+    subscription = hub.subscribe("bitcoin")
+    hub.close()
+    stream.start.set()
+
+    assert list(subscription) == []
+    with pytest.raises(ValueError):
+        hub.subscribe("bitcoin")
+
+
+def test_block_waits_for_slow_subscriber() -> None:
+    stream = Stream(items=5)
+    hub = StreamHub(stream)
+    subscription = hub.subscribe("bitcoin", buffer_size=1)
+    stream.start.set()
+
+    assert not stream.done.wait(0.1)
+    assert list(subscription) == list(range(5))
+
+
+def test_pipeline_stops_without_subscribers() -> None:
+    stream = Stream(items=1_000)
+    hub = StreamHub(stream)
+    subscription = hub.subscribe("bitcoin", buffer_size=1)
+    stream.start.set()
+    assert next(subscription) == 0
+
+    subscription.close()
+    assert stream.closed.wait(1)
+    assert not stream.done.is_set()
+
+    stream.closed.clear()
+    resubscribed = hub.subscribe("bitcoin", buffer_size=1)
+    assert next(resubscribed) == 0
+    assert stream.calls == 2
+    hub.close()
+
+
+def test_pipeline_stops_when_last_subscriber_detaches() -> None:
+    stream = Stream(items=1_000)
+    hub = StreamHub(stream)
+    subscription = hub.subscribe("bitcoin", buffer_size=1, policy=SlowConsumerPolicy.DETACH)
+    stream.start.set()
+
+    assert stream.closed.wait(1)
+    assert not stream.done.is_set()
+    with pytest.raises(SubscriberDetached):
+        list(subscription)
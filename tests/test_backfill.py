@@ -0,0 +1,85 @@
+import json
+from functools import partial
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from stocra.backfill import Backfill, BackfillProgress
+from stocra.checkpoint import FileCheckpointStore
+from stocra.models import Block, Transaction
+from tests.fixtures import BLOCK_100, TRANSACTION_BLOCK_100
+from tests.local_server import LocalServer, local_server
+
+HEIGHTS = range(100, 105)
+
+
+def transactions_of(height: int) -> List[Transaction]:
+    return [
+        TRANSACTION_BLOCK_100.copy(update=dict(hash=f"test_transaction_hash_{height}_{index}")) for index in range(3)
+    ]
+
+
+def block_of(height: int) -> Block:
+    transaction_hashes = [transaction.hash for transaction in transactions_of(height)]
+    return BLOCK_100.copy(update=dict(height=height, hash=f"test_block_hash_{height}", transactions=transaction_hashes))
+
+
+def write_block(directory: Path, block: Block, transactions: List[Transaction]) -> None:
+    (directory / f"{block.height}.json").write_text(json.dumps([transaction.hash for transaction in transactions]))
+
+
+@pytest.fixture
+def server():
+    for server_instance in local_server():
+        for height in HEIGHTS:
+            server_instance.add(f"/blocks/{height}", block_of(height).json().encode())
+            for transaction in transactions_of(height):
+                server_instance.add(f"/transactions/{transaction.hash}", transaction.json().encode())
+
+        yield server_instance
+
+
+def test_stream_in_height_order(server: LocalServer, tmp_path) -> None:
+    progress: List[BackfillProgress] = []
+    backfill = Backfill(
+        "bitcoin",
+        HEIGHTS.start,
+        HEIGHTS.stop,
+        shard_size=2,
+        workers=2,
+        requests_per_second=1_000,
+        checkpoint_store=FileCheckpointStore(tmp_path),
+        progress=progress.append,
+        client_options=dict(base_url=server.url),
+    )
+    assert [(shard.start, shard.stop) for shard in backfill.shards] == [(100, 102), (102, 104), (104, 105)]
+    assert list(backfill.stream()) == [(block_of(height), transactions_of(height)) for height in HEIGHTS]
+    assert [(item.shards_done, item.blocks_done, item.transactions) for item in progress] == [
+        (1, 2, 6),
+        (2, 4, 12),
+        (3, 5, 15),
+    ]
+
+    requests = len(server.requests)
+    assert list(backfill.stream()) == []
+    assert len(server.requests) == requests
+
+
+def test_run_with_sink(server: LocalServer, tmp_path) -> None:
+    store = FileCheckpointStore(tmp_path / "checkpoints")
+    store.commit("bitcoin-102-104", 102)
+    backfill = Backfill(
+        "bitcoin",
+        HEIGHTS.start,
+        HEIGHTS.stop,
+        shard_size=2,
+        workers=2,
+        checkpoint_store=store,
+        client_options=dict(base_url=server.url),
+    )
+    backfill.run(partial(write_block, tmp_path))
+
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == ["100.json", "101.json", "103.json", "104.json"]
+    assert json.loads((tmp_path / "103.json").read_text()) == [transaction.hash for transaction in transactions_of(103)]
+    assert store.load("bitcoin-104-105").committed_height == 104
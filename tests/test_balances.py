@@ -0,0 +1,92 @@
+from decimal import Decimal
+
+import pytest
+
+from stocra.balances import AddressBalance, BalanceIndex
+from stocra.models import Amount, Input, Output, Transaction
+from tests.fixtures import (
+    BLOCK_100,
+    BLOCK_101,
+    SPENDING_TRANSACTION,
+    TRANSACTION_BLOCK_100,
+    TRANSACTION_BLOCK_101,
+)
+
+
+def test_add_block() -> None:
+    index = BalanceIndex(decimals=dict(BTC=8))
+    index.add_block(BLOCK_100, [TRANSACTION_BLOCK_100])
+    index.add_block(BLOCK_101, [TRANSACTION_BLOCK_101, SPENDING_TRANSACTION])
+
+    assert index.block_height == BLOCK_101.height
+    assert index.get("test_address_input", "BTC") == AddressBalance(
+        address="test_address_input",
+        currency_symbol="BTC",
+        received=Decimal("0"),
+        sent=Decimal("2"),
+        received_count=0,
+        sent_count=2,
+    )
+    assert index.get("test_address_output", "BTC").balance == Decimal("1.6")
+    assert index.balances("test_address_spending") == [
+        AddressBalance("test_address_spending", "BTC", Decimal("1.5"), Decimal("0"), 1, 0)
+    ]
+    assert index.get("test_address_output", "ETH") is None
+
+
+def test_unfinished_block_is_not_applied() -> None:
+    index = BalanceIndex()
+    index.add(BLOCK_100, TRANSACTION_BLOCK_100)
+    assert index.get("test_address_output", "BTC") is None
+
+    index.add(BLOCK_101, TRANSACTION_BLOCK_101)
+    assert index.get("test_address_output", "BTC").received == Decimal("0.8")
+    assert index.block_height == BLOCK_100.height
+
+
+def test_rollback() -> None:
+    index = BalanceIndex(rollback_depth=1)
+    index.add_block(BLOCK_100, [TRANSACTION_BLOCK_100])
+    index.add_block(BLOCK_101, [TRANSACTION_BLOCK_101])
+
+    assert index.rollback() == [BLOCK_101.height]
+    assert index.get("test_address_output", "BTC").received_count == 1
+    with pytest.raises(ValueError):
+        index.rollback()
+
+
+def test_too_many_decimal_places() -> None:
+    index = BalanceIndex(decimals=dict(BTC=0))
+    with pytest.raises(ValueError):
+        index.add(BLOCK_100, TRANSACTION_BLOCK_100)
+
+
+def test_snapshot_and_restore(tmp_path) -> None:
+    index = BalanceIndex(decimals=dict(BTC=8))
+    index.add_block(BLOCK_100, [TRANSACTION_BLOCK_100])
+    index.add(BLOCK_101, TRANSACTION_BLOCK_101)
+    index.snapshot(tmp_path / "balances.json")
+
+    restored = BalanceIndex.restore(tmp_path / "balances.json")
+    assert restored.block_height == BLOCK_100.height
+    assert restored.get("test_address_output", "BTC") == index.get("test_address_output", "BTC")
+    assert restored.rollback() == [BLOCK_100.height]
+    assert restored.get("test_address_output", "BTC") is None
+
+
+def test_amounts_beyond_default_decimal_precision() -> None:
+    # 33 significant digits, the default decimal context keeps only 28
+    value = Decimal("589735030408323.123456789012345678")
+    transaction = Transaction(
+        hash="test_transaction_hash_token",
+        inputs=[Input(address="test_address_sender", amount=Amount(value=value, currency_symbol="USDT"))],
+        outputs=[Output(address="test_address_receiver", amount=Amount(value=value, currency_symbol="USDT"))],
+        fee=Amount(value=Decimal("0"), currency_symbol="ETH"),
+    )
+    index = BalanceIndex()
+    index.add_block(BLOCK_100, [transaction])
+    index.add_block(BLOCK_101, [transaction])
+
+    total = Decimal("1179470060816646.246913578024691356")
+    assert index.get("test_address_receiver", "USDT").received == total
+    assert index.get("test_address_sender", "USDT").balance == Decimal("-1179470060816646.246913578024691356")
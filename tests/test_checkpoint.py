@@ -0,0 +1,125 @@
+import os
+import pickle
+from pathlib import Path
+from typing import Iterable
+from unittest.mock import patch
+
+import pytest
+
+from stocra.checkpoint import (
+    Checkpoint,
+    CheckpointStore,
+    CheckpointTracker,
+    FileCheckpointStore,
+    SQLiteCheckpointStore,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def store(request, tmp_path) -> CheckpointStore:
+    if request.param == "file":
+        return FileCheckpointStore(tmp_path)
+
+    return SQLiteCheckpointStore(tmp_path / "checkpoints.sqlite")
+
+
+def test_store_roundtrip(store: CheckpointStore) -> None:
+    assert not store.load("bitcoin")
+
+    store.mark_processed("bitcoin", 100, ["first"])
+    store.mark_processed("bitcoin", 100, ["second"])
+    assert store.load("bitcoin") == Checkpoint(committed_height=None, block_height=100, processed={"first", "second"})
+
+    store.commit("bitcoin", 100)
+    store.mark_processed("bitcoin", 101, ["third"])
+    restored = pickle.loads(pickle.dumps(store))
+    assert restored.load("bitcoin") == Checkpoint(committed_height=100, block_height=101, processed={"third"})
+    assert not restored.load("ethereum")
+
+
+def test_tracker(store: CheckpointStore) -> None:
+    tracker = CheckpointTracker(store, "bitcoin")
+    assert tracker.resume_from("latest") == "latest"
+
+    tracker.committed(99)
+    tracker.processed(100, "first")
+    tracker.flush()
+
+    tracker = CheckpointTracker(store, "bitcoin")
+    assert tracker.resume_from("latest") == 100
+    assert tracker.pending(99, ["old"]) == []
+    assert tracker.pending(100, ["first", "second"]) == ["second"]
+    assert tracker.pending(101, ["third"]) == ["third"]
+
+    tracker.committed(100)
+    assert CheckpointTracker(store, "bitcoin").resume_from("latest") == 100
+    assert store.load("bitcoin") == Checkpoint(committed_height=100)
+
+
+class CountingStore(FileCheckpointStore):
+    def __init__(self, directory: Path) -> None:
+        super().__init__(directory)
+        self.writes = 0
+
+    def mark_processed(self, key: str, block_height: int, transaction_hashes: Iterable[str]) -> None:
+        self.writes += 1
+        super().mark_processed(key, block_height, transaction_hashes)
+
+
+def test_tracker_batches_writes(tmp_path) -> None:
+    store = CountingStore(tmp_path)
+    clock = FakeClock()
+    tracker = CheckpointTracker(store, "bitcoin", flush_every=3, flush_interval_seconds=10, clock=clock)
+    for transaction_hash in ["first", "second", "third", "fourth"]:
+        tracker.processed(100, transaction_hash)
+
+    assert store.writes == 1
+    assert CheckpointTracker(store, "bitcoin").pending(100, ["third", "fourth"]) == ["fourth"]
+
+    clock.now += 10
+    tracker.processed(100, "fifth")
+    assert store.writes == 2
+
+    tracker.processed(100, "sixth")
+    tracker.committed(100)
+    assert store.writes == 2
+    assert store.load("bitcoin") == Checkpoint(committed_height=100)
+
+
+def test_tracker_flushes_on_new_block(tmp_path) -> None:
+    store = CountingStore(tmp_path)
+    tracker = CheckpointTracker(store, "bitcoin")
+    tracker.processed(100, "first")
+    tracker.processed(101, "second")
+    assert store.load("bitcoin") == Checkpoint(block_height=100, processed={"first"})
+
+
+def test_file_store_ignores_torn_append(tmp_path) -> None:
+    store = FileCheckpointStore(tmp_path)
+    store.commit("bitcoin", 99)
+    store.mark_processed("bitcoin", 100, ["first", "second"])
+    with (tmp_path / "bitcoin.json").open("a") as file:
+        file.write('{"block_height": 100, "proc')
+
+    assert FileCheckpointStore(tmp_path).load("bitcoin") == Checkpoint(
+        committed_height=99, block_height=100, processed={"first", "second"}
+    )
+
+
+def test_file_store_syncs_writes(tmp_path) -> None:
+    store = FileCheckpointStore(tmp_path)
+    with patch("stocra.checkpoint.os.fsync", wraps=os.fsync) as fsync:
+        store.mark_processed("bitcoin", 100, ["first"])
+        assert fsync.call_count == 1
+
+        # the new file and the directory with the replaced entry
+        store.commit("bitcoin", 100)
+        assert fsync.call_count == 3
@@ -0,0 +1,41 @@
+import socket
+from time import monotonic
+from unittest.mock import patch
+
+from stocra.connection_pools import DNSCache, PoolTracker
+
+
+def test_pool_tracker() -> None:
+    tracker = PoolTracker(pool_size=4)
+    tracker.acquired("https://bitcoin.stocra.com/v1.0")
+    tracker.acquired("https://bitcoin.stocra.com/v1.0")
+    tracker.released("https://bitcoin.stocra.com/v1.0")
+    tracker.warmed_up("https://ethereum.stocra.com/v1.0", 2)
+
+    stats = tracker.stats()
+    assert stats["bitcoin.stocra.com"].in_use == 1
+    assert stats["bitcoin.stocra.com"].peak_in_use == 2
+    assert stats["bitcoin.stocra.com"].requests == 2
+    assert stats["bitcoin.stocra.com"].utilisation == 0.25
+    assert stats["ethereum.stocra.com"].warmed_up == 2
+
+
+def test_dns_cache() -> None:
+    results = [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("10.0.0.1", 443))] * 2
+    cache = DNSCache(["*.stocra.com"], ttl=60)
+    with patch("stocra.connection_pools.socket.getaddrinfo", return_value=results) as getaddrinfo:
+        assert cache.resolve("bitcoin.stocra.com", 443) == ["10.0.0.1"]
+        assert cache.resolve("Bitcoin.stocra.com", 443) == ["10.0.0.1"]
+        assert cache.resolve("bitcoin.stocra.com", 443) == ["10.0.0.1"]
+        assert getaddrinfo.call_count == 2
+
+        assert cache.resolve("example.com", 443) == []
+        assert getaddrinfo.call_count == 2
+
+        cache.forget("bitcoin.stocra.com", 443)
+        assert cache.resolve("bitcoin.stocra.com", 443) == ["10.0.0.1"]
+        assert getaddrinfo.call_count == 3
+
+        with patch("stocra.connection_pools.monotonic", return_value=monotonic() + 61):
+            cache.resolve("bitcoin.stocra.com", 443)
+        assert getaddrinfo.call_count == 4
@@ -0,0 +1,32 @@
+import pytest
+
+from stocra.deadline import Deadline, DeadlineExceeded
+from stocra.utils import limit_sleep
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_no_deadline() -> None:
+    assert Deadline.after(None) is None
+    assert limit_sleep(5, None) == 5
+
+
+def test_deadline() -> None:
+    clock = FakeClock()
+    deadline = Deadline(10, clock=clock)
+    assert deadline.request_timeout("blocks/latest", 30) == 10
+    assert deadline.request_timeout("blocks/latest", 2) == 2
+    assert deadline.request_timeout("blocks/latest", None) == 10
+    assert limit_sleep(16, deadline) == 10
+
+    clock.now = 11
+    assert deadline.expired
+    assert deadline.remaining() == 0
+    with pytest.raises(DeadlineExceeded):
+        deadline.check("blocks/latest")
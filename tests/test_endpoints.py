@@ -0,0 +1,75 @@
+import pytest
+
+from stocra.endpoints import EndpointPool, is_failover_status
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_empty_pool() -> None:
+    with pytest.raises(ValueError):
+        EndpointPool([])
+
+
+def test_prefers_faster_endpoint() -> None:
+    clock = FakeClock()
+    pool = EndpointPool(["https://slow", "https://fast"], clock=clock)
+    slow, fast = pool.candidates()
+
+    started_at = pool.started(slow)
+    clock.now += 1
+    pool.succeeded(slow, started_at)
+
+    started_at = pool.started(fast)
+    clock.now += 0.1
+    pool.succeeded(fast, started_at)
+
+    assert [endpoint.url for endpoint in pool.candidates()] == ["https://fast", "https://slow"]
+
+
+def test_in_flight_requests_spread_load() -> None:
+    clock = FakeClock()
+    pool = EndpointPool(["https://first", "https://second"], clock=clock)
+    for endpoint in pool.candidates():
+        started_at = pool.started(endpoint)
+        clock.now += 0.1
+        pool.succeeded(endpoint, started_at)
+
+    busy = pool.candidates()[0]
+    pool.started(busy)
+    assert pool.candidates()[0] is not busy
+
+
+def test_abandoned_request_releases_endpoint() -> None:
+    pool = EndpointPool(["https://first"])
+    endpoint = pool.candidates()[0]
+    pool.started(endpoint)
+    pool.abandoned(endpoint)
+    stats = pool.stats()[0]
+    assert stats.in_flight == 0
+    assert stats.failures == 0
+
+
+def test_ejection_and_recovery() -> None:
+    clock = FakeClock()
+    pool = EndpointPool(["https://broken", "https://mirror"], ejection_threshold=2, ejection_seconds=10, clock=clock)
+    broken = pool.candidates()[0]
+    for _ in range(2):
+        pool.started(broken)
+        pool.failed(broken)
+
+    assert pool.candidates()[-1] is broken
+    assert pool.stats()[0].failures == 2
+
+    clock.now += 11
+    assert not broken.is_ejected(clock.now)
+
+
+@pytest.mark.parametrize("status, expected", [(404, False), (400, False), (429, True), (502, True), (503, True)])
+def test_is_failover_status(status: int, expected: bool) -> None:
+    assert is_failover_status(status) is expected
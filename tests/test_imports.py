@@ -0,0 +1,62 @@
+import subprocess
+import sys
+from typing import List
+
+import pytest
+
+import stocra.ancestry
+import stocra.models
+import stocra.raw
+import stocra.tokens
+
+# optional features and dependencies which must not be imported together with the clients
+DEFERRED_MODULES = [
+    "sqlite3",
+    "tracemalloc",
+    "stocra.ancestry",
+    "stocra.checkpoint",
+    "stocra.conditional",
+    "stocra.connection_pools",
+    "stocra.endpoints",
+    "stocra.monitoring",
+    "stocra.profiling",
+    "stocra.rate_limit",
+    "stocra.raw",
+    "stocra.reorg",
+    "stocra.streaming_json",
+    "stocra.tokens",
+    "stocra.utxo",
+    "stocra.watchlist",
+]
+
+
+def imported_modules(module: str) -> List[str]:
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, {module}; print('\\n'.join(sys.modules))"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.splitlines()
+
+
+@pytest.mark.parametrize(
+    "module, deferred",
+    [
+        ("stocra.models", DEFERRED_MODULES + ["requests", "aiohttp"]),
+        ("stocra.synchronous.client", DEFERRED_MODULES + ["aiohttp"]),
+        ("stocra.asynchronous.client", DEFERRED_MODULES + ["requests"]),
+    ],
+)
+def test_deferred_imports(module: str, deferred: List[str]) -> None:
+    modules = imported_modules(module)
+    assert [deferred_module for deferred_module in deferred if deferred_module in modules] == []
+
+
+def test_lazy_models() -> None:
+    assert stocra.models.RawBlock is stocra.raw.RawBlock
+    assert stocra.models.AncestryEdge is stocra.ancestry.AncestryEdge
+    assert stocra.models.Token is stocra.tokens.Token
+    assert stocra.models.Currency is stocra.tokens.Currency
+    with pytest.raises(AttributeError):
+        stocra.models.Unknown  # pylint: disable=pointless-statement
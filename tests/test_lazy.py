@@ -0,0 +1,41 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from stocra.lazy import LazyBlock, LazyTransaction
+from tests.fixtures import BLOCK_100, SPENDING_TRANSACTION, TRANSACTION_BLOCK_100
+
+
+def test_lazy_transaction() -> None:
+    transaction = LazyTransaction.parse_raw(SPENDING_TRANSACTION.json())
+    assert transaction.hash == SPENDING_TRANSACTION.hash
+    assert transaction.fee == SPENDING_TRANSACTION.fee
+    assert transaction.inputs == SPENDING_TRANSACTION.inputs
+    assert transaction.outputs == SPENDING_TRANSACTION.outputs
+    assert transaction.fee is transaction.fee
+    assert transaction == SPENDING_TRANSACTION
+    assert transaction.to_model() == SPENDING_TRANSACTION
+
+
+def test_lazy_block() -> None:
+    data = json.loads(BLOCK_100.json())
+    del data["transactions"]
+    block = LazyBlock.parse_obj(data)
+    assert (block.height, block.hash, block.timestamp_ms) == (BLOCK_100.height, BLOCK_100.hash, BLOCK_100.timestamp_ms)
+    assert block.transactions == []
+
+
+def test_validation_on_access() -> None:
+    data = json.loads(TRANSACTION_BLOCK_100.json())
+    data["outputs"][0]["amount"]["value"] = "not a number"
+    del data["fee"]
+    transaction = LazyTransaction(data)
+
+    assert transaction.hash == TRANSACTION_BLOCK_100.hash
+    assert transaction.inputs == TRANSACTION_BLOCK_100.inputs
+    with pytest.raises(ValidationError):
+        transaction.outputs
+
+    with pytest.raises(ValidationError):
+        transaction.fee
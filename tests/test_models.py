@@ -2,7 +2,7 @@ from decimal import Decimal
 
 import pytest
 
-from stocra.models import Amount, Transaction
+from stocra.models import Amount, RawBlock, Transaction
 
 
 def test_amount_add() -> None:
@@ -63,3 +63,9 @@ def test_extra_fields() -> None:
     with_extra_field = Amount(value=Decimal("1"), currency_symbol="BTC", new_field="test")
     without_extra_field = Amount(value=Decimal("1"), currency_symbol="BTC")
     assert with_extra_field == without_extra_field
+
+
+def test_raw_block_from_body() -> None:
+    body = b'{"height": 1, "hash": "hash", "timestamp_ms": 1600000000000, "transactions": ["a", "b"]}'
+    block = RawBlock.from_body(body)
+    assert (block.height, block.hash, block.transactions, block.body) == (1, "hash", ["a", "b"], body)
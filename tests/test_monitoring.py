@@ -0,0 +1,122 @@
+from typing import List
+
+import pytest
+
+from stocra.checkpoint import CheckpointTracker, FileCheckpointStore
+from stocra.monitoring import BlockDelivery, BlockStats, StreamMonitor
+from tests.fixtures import BLOCK_100, BLOCK_101
+
+
+class FakeClock:
+    def __init__(self, now: float) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_block_delivered() -> None:
+    clock = FakeClock(BLOCK_100.timestamp_ms / 1_000 + 5)
+    monotonic_clock = FakeClock(10)
+    monitor = StreamMonitor(clock=clock, monotonic_clock=monotonic_clock)
+
+    monitor.block_fetched(BLOCK_100.height)
+    monitor.prefetch_occupancy(1, 4)
+    monotonic_clock.now = 12
+    stats = monitor.block_delivered(BLOCK_100, transactions_fetch_seconds=1.5)
+
+    assert stats == BlockStats(
+        height=BLOCK_100.height,
+        hash=BLOCK_100.hash,
+        lag_seconds=5,
+        tip_to_delivery_seconds=2,
+        transactions_fetch_seconds=1.5,
+        prefetched=1,
+        prefetch_window=4,
+    )
+    snapshot = monitor.snapshot()
+    assert snapshot.blocks == 1
+    assert snapshot.last == stats
+    assert snapshot.average_lag_seconds == 5
+    assert snapshot.average_tip_to_delivery_seconds == 2
+    assert snapshot.average_transactions_fetch_seconds == 1.5
+    assert snapshot.average_prefetch_occupancy == 0.25
+
+
+def test_block_delivered_without_fetch() -> None:
+    monitor = StreamMonitor(clock=FakeClock(BLOCK_100.timestamp_ms / 1_000))
+    stats = monitor.block_delivered(BLOCK_100)
+    assert stats.tip_to_delivery_seconds is None
+    assert stats.transactions_fetch_seconds is None
+    assert monitor.snapshot().average_tip_to_delivery_seconds is None
+
+
+def test_averages() -> None:
+    clock = FakeClock(BLOCK_100.timestamp_ms / 1_000 + 10)
+    monitor = StreamMonitor(smoothing=0.5, clock=clock)
+    monitor.block_delivered(BLOCK_100)
+    clock.now = BLOCK_101.timestamp_ms / 1_000 + 2
+    monitor.block_delivered(BLOCK_101)
+
+    snapshot = monitor.snapshot()
+    assert snapshot.blocks == 2
+    assert snapshot.average_lag_seconds == 6
+    assert snapshot.max_lag_seconds == 10
+
+
+def test_old_fetches_are_pruned() -> None:
+    monitor = StreamMonitor(clock=FakeClock(BLOCK_101.timestamp_ms / 1_000))
+    monitor.block_fetched(BLOCK_100.height)
+    monitor.block_fetched(BLOCK_101.height)
+    monitor.block_delivered(BLOCK_101)
+    assert monitor.block_delivered(BLOCK_100).tip_to_delivery_seconds is None
+
+
+def test_lag_callbacks() -> None:
+    clock = FakeClock(0)
+    lagging: List[int] = []
+    recovered: List[int] = []
+    delivered: List[int] = []
+    monitor = StreamMonitor(
+        lag_threshold_seconds=30,
+        on_block=lambda stats: delivered.append(stats.height),
+        on_lag=lambda stats: lagging.append(stats.height),
+        on_recovered=lambda stats: recovered.append(stats.height),
+        clock=clock,
+    )
+
+    for lag in [10, 60, 90, 5, 1]:
+        clock.now = BLOCK_100.timestamp_ms / 1_000 + lag
+        monitor.block_delivered(BLOCK_100)
+        if lag == 90:
+            assert monitor.snapshot().lagging
+
+    assert delivered == [BLOCK_100.height] * 5
+    assert lagging == [BLOCK_100.height]
+    assert recovered == [BLOCK_100.height]
+    assert not monitor.snapshot().lagging
+
+
+def test_block_delivery(tmp_path) -> None:
+    store = FileCheckpointStore(tmp_path)
+    monitor = StreamMonitor()
+    delivery = BlockDelivery(BLOCK_100, CheckpointTracker(store, "bitcoin", flush_every=1), monitor)
+    assert delivery.pending() == BLOCK_100.transactions
+
+    with delivery.consumed(BLOCK_100.transactions[0]):
+        pass
+
+    assert CheckpointTracker(store, "bitcoin").pending(BLOCK_100.height, BLOCK_100.transactions) == []
+    delivery.finished()
+    assert CheckpointTracker(store, "bitcoin").resume_from("latest") == BLOCK_100.height
+    assert monitor.snapshot().blocks == 1
+
+
+def test_block_delivery_consumer_stopped(tmp_path) -> None:
+    store = FileCheckpointStore(tmp_path)
+    delivery = BlockDelivery(BLOCK_100, CheckpointTracker(store, "bitcoin", flush_every=1), None)
+    with pytest.raises(GeneratorExit):
+        with delivery.consumed(BLOCK_100.transactions[0]):
+            raise GeneratorExit
+
+    assert delivery.pending() == BLOCK_100.transactions
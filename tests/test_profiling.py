@@ -0,0 +1,94 @@
+from typing import AsyncIterable
+
+import pytest
+
+from stocra.profiling import Phase, PhaseStats, Profiler
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_measure() -> None:
+    clock = FakeClock()
+    profiler = Profiler(clock=clock)
+    for seconds in [1, 3]:
+        with profiler.measure(Phase.NETWORK):
+            clock.now += seconds
+
+    with profiler.measure(Phase.DECODE):
+        clock.now += 0.5
+
+    assert profiler.stats() == [
+        PhaseStats(Phase.NETWORK, calls=2, total_seconds=4, max_seconds=3, allocation_samples=0, allocated_bytes=0),
+        PhaseStats(Phase.DECODE, calls=1, total_seconds=0.5, max_seconds=0.5, allocation_samples=0, allocated_bytes=0),
+    ]
+    assert profiler.stats()[0].average_seconds == 2
+    assert profiler.stats()[0].average_allocated_bytes is None
+
+
+def test_measure_failure() -> None:
+    profiler = Profiler()
+    try:
+        with profiler.measure(Phase.NETWORK):
+            raise ValueError("failed")
+    except ValueError:
+        pass
+
+    assert profiler.stats()[0].calls == 1
+
+
+def test_trace_allocations() -> None:
+    profiler = Profiler(trace_allocations=True, allocation_sample_rate=1)
+    try:
+        with profiler.measure(Phase.VALIDATION):
+            allocated = [bytearray(1_000) for _ in range(100)]
+
+        stats = profiler.stats()[0]
+        assert stats.allocation_samples == 1
+        assert stats.allocated_bytes >= 100_000
+        assert len(allocated) == 100
+    finally:
+        profiler.close()
+
+
+def test_profile_consumer() -> None:
+    clock = FakeClock()
+    profiler = Profiler(clock=clock)
+    for _ in profiler.profile_consumer(range(3)):
+        clock.now += 2
+
+    assert profiler.stats()[0].phase == Phase.CONSUMER
+    assert profiler.stats()[0].calls == 3
+    assert profiler.stats()[0].total_seconds == 6
+
+
+@pytest.mark.asyncio
+async def test_profile_async_consumer() -> None:
+    async def items() -> AsyncIterable[int]:
+        for item in range(3):
+            yield item
+
+    profiler = Profiler()
+    assert [item async for item in profiler.profile_async_consumer(items())] == [0, 1, 2]
+    assert profiler.stats()[0].calls == 3
+
+
+def test_report() -> None:
+    clock = FakeClock()
+    profiler = Profiler(clock=clock)
+    with profiler.measure(Phase.NETWORK):
+        clock.now += 3
+
+    profiler.record(Phase.CONSUMER, 1, allocated_bytes=2_048)
+    lines = profiler.report().splitlines()
+    assert lines[0].split()[:2] == ["phase", "calls"]
+    assert lines[1].split() == ["network", "1", "3.000", "3000.00", "3000.00", "75.0%", "-"]
+    assert lines[2].split() == ["consumer", "1", "1.000", "1000.00", "1000.00", "25.0%", "2048"]
+
+    profiler.reset()
+    assert profiler.stats() == []
@@ -0,0 +1,31 @@
+import pytest
+
+from stocra.rate_limit import RateLimiter
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_spacing() -> None:
+    clock = Clock()
+    limiter = RateLimiter(requests_per_second=4, clock=clock)
+    assert [limiter.reserve() for _ in range(3)] == [0.0, 0.25, 0.5]
+
+    clock.now += 1
+    assert limiter.reserve() == 0.0
+
+
+def test_burst() -> None:
+    clock = Clock()
+    limiter = RateLimiter(requests_per_second=2, burst=3, clock=clock)
+    assert [limiter.reserve() for _ in range(4)] == [0.0, 0.0, 0.0, 0.5]
+
+
+def test_invalid_rate() -> None:
+    with pytest.raises(ValueError):
+        RateLimiter(requests_per_second=0)
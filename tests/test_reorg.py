@@ -0,0 +1,106 @@
+from typing import Dict, Optional
+
+import pytest
+
+from stocra.reorg import BlockRollback, RecentBlocks, ReorgTooDeep, ReorgTracker
+
+
+def test_buffer_is_bounded() -> None:
+    recent_blocks = RecentBlocks(depth=3)
+    for height in range(100, 105):
+        recent_blocks.add(height, f"hash_{height}")
+
+    assert len(recent_blocks) == 4
+    assert recent_blocks.heights() == [101, 102, 103, 104]
+
+
+def test_invalid_depth() -> None:
+    with pytest.raises(ValueError):
+        RecentBlocks(depth=0)
+
+
+def test_matches() -> None:
+    recent_blocks = RecentBlocks()
+    recent_blocks.add(100, "hash_100")
+    recent_blocks.add(101, "hash_101")
+    assert recent_blocks.matches({101: "hash_101"})
+    assert recent_blocks.matches({100: "hash_100", 101: "hash_101"})
+    assert not recent_blocks.matches({101: "other_hash_101"})
+    assert not recent_blocks.matches({101: None})
+
+
+def test_rollback() -> None:
+    recent_blocks = RecentBlocks()
+    for height in range(100, 104):
+        recent_blocks.add(height, f"hash_{height}")
+
+    rollback = recent_blocks.rollback({100: "hash_100", 101: "hash_101", 102: "other_hash_102", 103: None})
+    assert rollback == BlockRollback(height=102, blocks=[(102, "hash_102"), (103, "hash_103")])
+    assert recent_blocks.heights() == [100, 101]
+
+
+def test_rollback_nothing_replaced() -> None:
+    recent_blocks = RecentBlocks()
+    recent_blocks.add(100, "hash_100")
+    assert recent_blocks.rollback({100: "hash_100"}) is None
+    assert recent_blocks.heights() == [100]
+
+
+def test_rollback_all_delivered_blocks() -> None:
+    recent_blocks = RecentBlocks()
+    recent_blocks.add(100, "hash_100")
+    rollback = recent_blocks.rollback({100: "other_hash_100"})
+    assert rollback == BlockRollback(height=100, blocks=[(100, "hash_100")])
+    assert len(recent_blocks) == 0
+
+
+def test_rollback_full_depth() -> None:
+    recent_blocks = RecentBlocks(depth=2)
+    for height in range(100, 103):
+        recent_blocks.add(height, f"hash_{height}")
+
+    rollback = recent_blocks.rollback({100: "hash_100", 101: "other_hash_101", 102: "other_hash_102"})
+    assert rollback == BlockRollback(height=101, blocks=[(101, "hash_101"), (102, "hash_102")])
+
+
+def test_rollback_too_deep() -> None:
+    recent_blocks = RecentBlocks(depth=2)
+    for height in range(100, 104):
+        recent_blocks.add(height, f"hash_{height}")
+
+    with pytest.raises(ReorgTooDeep):
+        recent_blocks.rollback({101: "other_hash_101", 102: "other_hash_102", 103: "other_hash_103"})
+
+
+def test_tracker_verifies_tip_while_waiting() -> None:
+    reorg = ReorgTracker()
+    reorg.delivered(100, "hash_100")
+    reorg.delivered(101, "hash_101")
+    assert reorg.next_height == 102
+    assert reorg.heights_to_verify() == [100, 101]
+    assert reorg.verified({100: "hash_100", 101: "hash_101"}) is None
+    assert reorg.heights_to_verify() == [101]
+
+    reorg.delivered(102, "hash_102")
+    assert reorg.heights_to_verify() == [100, 101, 102]
+
+
+def test_tracker_rolls_back_replaced_tip() -> None:
+    reorg = ReorgTracker()
+    for height in range(100, 103):
+        reorg.delivered(height, f"hash_{height}")
+
+    assert reorg.verified({height: f"hash_{height}" for height in range(100, 103)}) is None
+    hashes: Dict[int, Optional[str]] = {102: None}
+    assert reorg.heights_to_roll_back(hashes) == [100, 101]
+
+    hashes.update({100: "hash_100", 101: "other_hash_101"})
+    rollback = reorg.verified(hashes)
+    assert rollback == BlockRollback(height=101, blocks=[(101, "hash_101"), (102, "hash_102")])
+    assert reorg.next_height == 101
+
+
+def test_tracker_nothing_to_roll_back() -> None:
+    reorg = ReorgTracker()
+    reorg.delivered(100, "hash_100")
+    assert reorg.heights_to_roll_back({100: "hash_100"}) == []
@@ -0,0 +1,80 @@
+import json
+from typing import Any, List, Tuple
+
+import pytest
+
+from stocra.streaming_json import (
+    IncrementalObjectParser,
+    TransactionParser,
+    iter_block_transaction_hashes,
+)
+from tests.fixtures import BLOCK_100, SPENDING_TRANSACTION, TRANSACTION_BLOCK_100
+
+DOCUMENT = {
+    "height": 100,
+    "hash": 'escaped \\" quote, "colon": and [brackets]',
+    "transactions": ["hash_1", 'hash_"2"]', "hash_3"],
+    "nested": {"transactions": [1, 2], "items": [{"key": ":,"}, None]},
+    "outputs": [],
+    "fee": {"value": "0.1", "currency_symbol": "BTC"},
+}
+
+
+def chunked(body: bytes, size: int) -> List[bytes]:
+    return [body[start : start + size] for start in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 1_000_000])
+def test_incremental_object_parser(chunk_size: int) -> None:
+    parser = IncrementalObjectParser(["transactions", "outputs"])
+    items: List[Tuple[str, Any]] = []
+    for chunk in chunked(json.dumps(DOCUMENT, indent=2).encode(), chunk_size):
+        items.extend(parser.feed(chunk))
+
+    assert items == [("transactions", transaction_hash) for transaction_hash in DOCUMENT["transactions"]]
+    assert parser.close() == {key: value for key, value in DOCUMENT.items() if key not in ["transactions", "outputs"]}
+
+
+def test_items_are_not_kept() -> None:
+    parser = IncrementalObjectParser(["transactions"])
+    assert parser.feed(b'{"transactions": ["hash_1", "hash_2", "hash_') == [
+        ("transactions", "hash_1"),
+        ("transactions", "hash_2"),
+    ]
+    for _ in range(1_000):
+        parser.feed(b'3", "hash_4", "hash_')
+
+    assert len(parser._buffer) < 20  # pylint: disable=protected-access
+
+
+def test_incomplete_object() -> None:
+    parser = IncrementalObjectParser(["transactions"])
+    parser.feed(b'{"transactions": ["hash_1"')
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_not_an_object() -> None:
+    with pytest.raises(ValueError):
+        IncrementalObjectParser(["transactions"]).feed(b'["hash_1"]')
+
+
+def test_data_after_object() -> None:
+    parser = IncrementalObjectParser(["transactions"])
+    parser.feed(b'{"height": 1}\n')
+    with pytest.raises(ValueError):
+        parser.feed(b"{}")
+
+
+@pytest.mark.parametrize("transaction", [TRANSACTION_BLOCK_100, SPENDING_TRANSACTION])
+def test_transaction_parser(transaction) -> None:
+    parser = TransactionParser()
+    for chunk in chunked(transaction.json().encode(), 5):
+        parser.feed(chunk)
+
+    assert parser.close() == transaction
+
+
+def test_iter_block_transaction_hashes() -> None:
+    hashes = iter_block_transaction_hashes(chunked(BLOCK_100.json().encode(), 3))
+    assert list(hashes) == BLOCK_100.transactions
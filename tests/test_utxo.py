@@ -0,0 +1,54 @@
+from stocra.models import Input, TransactionPointer
+from stocra.utxo import UtxoIndex
+from tests.fixtures import (
+    SPENDING_TRANSACTION,
+    TRANSACTION_BLOCK_100,
+    TRANSACTION_BLOCK_101,
+)
+
+
+def test_resolve_inputs() -> None:
+    index = UtxoIndex()
+    index.add_transaction(TRANSACTION_BLOCK_100)
+    assert index.missing_parents([SPENDING_TRANSACTION, TRANSACTION_BLOCK_100]) == {TRANSACTION_BLOCK_101.hash}
+
+    resolved = index.resolve(SPENDING_TRANSACTION)
+    assert resolved.inputs[0] == Input(
+        address=TRANSACTION_BLOCK_100.outputs[0].address,
+        amount=TRANSACTION_BLOCK_100.outputs[0].amount,
+        transaction_pointer=SPENDING_TRANSACTION.inputs[0].transaction_pointer,
+    )
+    assert resolved.inputs[1] == SPENDING_TRANSACTION.inputs[1]
+    assert resolved.outputs == SPENDING_TRANSACTION.outputs
+
+
+def test_unknown_output_index() -> None:
+    index = UtxoIndex()
+    index.add_transaction(TRANSACTION_BLOCK_100)
+    assert index.get(TRANSACTION_BLOCK_100.hash, 0) == TRANSACTION_BLOCK_100.outputs[0]
+    assert index.get(TRANSACTION_BLOCK_100.hash, 1) is None
+
+
+def test_eviction_of_least_recently_used() -> None:
+    index = UtxoIndex(max_size=2)
+    index.add_transaction(TRANSACTION_BLOCK_100)
+    index.add_transaction(TRANSACTION_BLOCK_101)
+    index.get(TRANSACTION_BLOCK_100.hash, 0)
+    index.add_transaction(SPENDING_TRANSACTION)
+
+    assert len(index) == 2
+    assert index.get(TRANSACTION_BLOCK_101.hash, 0) is None
+    assert index.get(TRANSACTION_BLOCK_100.hash, 0) == TRANSACTION_BLOCK_100.outputs[0]
+
+
+def test_spill_to_disk(tmp_path) -> None:
+    index = UtxoIndex(max_size=1, spill_path=tmp_path / "utxo.sqlite")
+    index.add_transaction(TRANSACTION_BLOCK_100)
+    index.add_transaction(TRANSACTION_BLOCK_101)
+
+    assert len(index) == 1
+    assert index.get(TRANSACTION_BLOCK_100.hash, 0) == TRANSACTION_BLOCK_100.outputs[0]
+    assert index.missing_parents([SPENDING_TRANSACTION]) == set()
+    pointer = TransactionPointer(transaction_hash=TRANSACTION_BLOCK_100.hash, output_index=0)
+    assert index.resolve(SPENDING_TRANSACTION).inputs[0].transaction_pointer == pointer
+    index.close()
@@ -0,0 +1,30 @@
+from stocra.watchlist import Watchlist
+from tests.fixtures import SPENDING_TRANSACTION, TRANSACTION_BLOCK_100
+
+
+def test_matches_input_and_output_addresses() -> None:
+    body = TRANSACTION_BLOCK_100.json().encode()
+    assert Watchlist(["test_address_input"]).matches(body)
+    assert Watchlist(["test_address_output"]).matches(body)
+    assert not Watchlist(["test_address"]).matches(body)
+    assert not Watchlist(["test_transaction_hash_block_100"]).matches(body)
+
+
+def test_pointer_only_inputs() -> None:
+    body = SPENDING_TRANSACTION.json().encode()
+    assert Watchlist(["test_address_spending"]).matches(body)
+    assert not Watchlist(["test_address_input"]).matches(body)
+
+
+def test_update() -> None:
+    watchlist = Watchlist(["first"])
+    watchlist.add(["second", "third"])
+    watchlist.remove(["first"])
+    assert "first" not in watchlist
+    assert len(watchlist) == 2
+
+    watchlist.replace(["fourth"])
+    assert list(watchlist.matches(address.encode()) for address in ['"address": "fourth"', '"address":"third"']) == [
+        True,
+        False,
+    ]